@@ -0,0 +1,131 @@
+"""
+Generates synthetic QR code images to benchmark reading them. The corpus is generated from a seed, so the same
+arguments always give the same images (and runs of different revisions can be compared).
+Requires the qrcode package, which only the benchmarks depend on
+"""
+import itertools
+import random
+import string
+from collections import namedtuple
+from io import BytesIO
+
+import numpy
+import PIL.Image
+import qrcode
+import qrcode.util
+
+__author__ = 'ewino'
+
+EC_LEVELS = {
+    'L': qrcode.constants.ERROR_CORRECT_L,
+    'M': qrcode.constants.ERROR_CORRECT_M,
+    'Q': qrcode.constants.ERROR_CORRECT_Q,
+    'H': qrcode.constants.ERROR_CORRECT_H,
+}
+
+# the default axes of the corpus. See generate_corpus
+VERSIONS = tuple(range(1, 41))
+MASKS = tuple(range(8))
+MODULE_SIZES = (2, 3, 5, 8)
+# the standard deviation of the gaussian noise added to the pixels' shades (0-255)
+NOISE_LEVELS = (0, 30)
+# None for lossless (PNG) images
+JPEG_QUALITIES = (None, 90, 60)
+# how much of the code's capacity the payload fills
+FILL_RATIO = 0.9
+# the quiet zone around the code, in blocks
+BORDER = 4
+
+# A single image of the corpus: its parameters, the expected payload and the encoded image file
+Case = namedtuple('Case', 'version ec_level mask module_size noise jpeg_quality payload image_file')
+
+
+def case_name(case):
+    """
+    :param Case case: A case of the corpus
+    :rtype: str
+    """
+    return 'v{0}-{1}-mask{2}-{3}px-noise{4}-{5}'.format(
+        case.version, case.ec_level, case.mask, case.module_size, case.noise,
+        'png' if case.jpeg_quality is None else 'jpeg{0}'.format(case.jpeg_quality))
+
+
+def generate_corpus(versions=VERSIONS, ec_levels=tuple(EC_LEVELS), masks=MASKS, module_sizes=MODULE_SIZES,
+                    noise_levels=NOISE_LEVELS, jpeg_qualities=JPEG_QUALITIES, full=False, seed=0):
+    """
+    Generates the cases of the corpus. Every version is generated in every error correction level, and by default the
+    values of the other axes (masks, module sizes, noise levels and JPEG qualities) are picked at random for each, so
+    they're all covered without multiplying the size of the corpus
+    :param collections.Iterable[int] versions: The versions to generate (1-40)
+    :param collections.Iterable[str] ec_levels: The error correction levels to generate ('L', 'M', 'Q' or 'H')
+    :param collections.Iterable[int] masks: The masks to generate (0-7)
+    :param collections.Iterable[int] module_sizes: The widths of the blocks, in pixels
+    :param collections.Iterable[int] noise_levels: The standard deviations of the noise added to the images
+    :param collections.Iterable[int] jpeg_qualities: The JPEG qualities to save the images in (None for PNG)
+    :param bool full: Whether to generate every combination of all the axes instead (which is a lot of images)
+    :param int seed: The seed of the payloads and the noise
+    :rtype: collections.Iterator[Case]
+    """
+    rng = random.Random(seed)
+    noise_rng = numpy.random.RandomState(seed)
+    axes = [list(masks), list(module_sizes), list(noise_levels), list(jpeg_qualities)]
+    for version, ec_level in itertools.product(versions, ec_levels):
+        if full:
+            combinations = itertools.product(*axes)
+        else:
+            combinations = [tuple(rng.choice(axis) for axis in axes)]
+        for mask, module_size, noise, jpeg_quality in combinations:
+            payload = _get_payload(rng, version, ec_level)
+            image = _draw_code(payload, version, ec_level, mask, module_size)
+            if noise:
+                image = _add_noise(noise_rng, image, noise)
+            yield Case(version, ec_level, mask, module_size, noise, jpeg_quality, payload,
+                       _encode(image, jpeg_quality))
+
+
+def _get_payload(rng, version, ec_level):
+    """
+    :return: Random text, filling FILL_RATIO of the capacity of a bytes message of the given version and level
+    :rtype: str
+    """
+    capacity_bits = qrcode.util.BIT_LIMIT_TABLE[EC_LEVELS[ec_level]][version]
+    # the mode indicator, and the length's bits
+    capacity_bits -= 4 + (8 if version < 10 else 16)
+    length = max(int(capacity_bits // 8 * FILL_RATIO), 1)
+    return ''.join(rng.choice(string.ascii_letters + string.digits + ' ') for _ in range(length))
+
+
+def _draw_code(payload, version, ec_level, mask, module_size):
+    """
+    :return: A gray-scale image of the code
+    :rtype: numpy.ndarray
+    """
+    code = qrcode.QRCode(version=version, error_correction=EC_LEVELS[ec_level], border=BORDER, mask_pattern=mask)
+    # a single bytes segment, so the payload fits the capacity it was sized by
+    code.add_data(qrcode.util.QRData(payload.encode('ascii'), mode=qrcode.util.MODE_8BIT_BYTE))
+    code.make(fit=False)
+    modules = numpy.array(code.get_matrix(), dtype=numpy.uint8)
+    pixels = numpy.where(modules, 0, 255).astype(numpy.uint8)
+    return numpy.kron(pixels, numpy.ones((module_size, module_size), dtype=numpy.uint8))
+
+
+def _add_noise(rng, pixels, deviation):
+    """
+    :rtype: numpy.ndarray
+    """
+    noisy = pixels + rng.normal(0, deviation, pixels.shape)
+    return numpy.clip(noisy, 0, 255).astype(numpy.uint8)
+
+
+def _encode(pixels, jpeg_quality):
+    """
+    :return: The image's file, so reading it includes loading it
+    :rtype: bytes
+    """
+    output = BytesIO()
+    image = PIL.Image.fromarray(pixels)
+    if jpeg_quality is None:
+        image.save(output, 'PNG')
+    else:
+        image.save(output, 'JPEG', quality=jpeg_quality)
+    return output.getvalue()
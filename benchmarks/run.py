@@ -0,0 +1,289 @@
+"""
+Benchmarks reading QR codes over a synthetic corpus (see benchmarks.corpus), and compares the results to a baseline.
+Run it from the repository's root:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --baseline results.json  # exits with 1 if anything got worse than the tolerance
+
+The corpus is generated before timing anything, so only the reads are timed: loading the image file, reading the
+code and decoding it (without parsing the payload). Peak memory is measured in a separate pass, as tracing the
+allocations slows the reads down
+"""
+from __future__ import print_function, division
+
+import argparse
+import json
+import platform
+import sys
+import time
+from collections import OrderedDict
+from io import BytesIO
+from timeit import default_timer
+
+import numpy
+
+import qreader
+from qreader.instrumentation import STAGES
+from benchmarks.corpus import generate_corpus, case_name, EC_LEVELS, VERSIONS, MASKS, MODULE_SIZES, NOISE_LEVELS, \
+    JPEG_QUALITIES
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+__author__ = 'ewino'
+
+# the version groups the results are broken down by (the versions whose codes' lengths take the same amount of bits)
+VERSION_GROUPS = ((1, 9), (10, 26), (27, 40))
+
+# the metrics compared to the baseline, and whether higher values are better
+COMPARED_METRICS = (
+    ('images_per_sec', True),
+    ('latency_p50_ms', False),
+    ('latency_p99_ms', False),
+    ('peak_memory_kb', False),
+)
+
+
+def run_benchmark(cases, repeat=3, measure_memory=True):
+    """
+    :param list[benchmarks.corpus.Case] cases: The corpus to read
+    :param int repeat: The amount of times to read each case. Its fastest read is the one counted
+    :param bool measure_memory: Whether to measure the peak memory of each read, in a separate pass
+    :return: The results of each case, by its name
+    :rtype: collections.OrderedDict
+    """
+    # the first read imports and builds lazily what reads need, so it isn't counted
+    _read_case(cases[0])
+    results = OrderedDict()
+    for case in cases:
+        runs = [_read_case(case) for _ in range(repeat)]
+        seconds, stats, success = min(runs, key=lambda run: run[0])
+        results[case_name(case)] = {
+            'case': case,
+            'seconds': seconds,
+            'success': success,
+            'failed_stage': stats.failed_stage,
+            'timings': stats.timings,
+            'counters': stats.counters,
+        }
+    if measure_memory and tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            for case in cases:
+                _reset_peak()
+                _read_case(case)
+                results[case_name(case)]['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+    return results
+
+
+def _read_case(case):
+    """
+    :param benchmarks.corpus.Case case: The case to read
+    :return: The time the read took, its stats and whether it read the expected payload
+    :rtype: (float, qreader.ReadStats, bool)
+    """
+    stats = qreader.ReadStats()
+    start = default_timer()
+    try:
+        success = qreader.read(BytesIO(case.image_file), parse=False, stats=stats) == case.payload
+    except Exception:
+        success = False
+    return default_timer() - start, stats, success
+
+
+def _reset_peak():
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    else:  # before Python 3.9, clearing the traces resets the peak as well
+        tracemalloc.clear_traces()
+
+
+def summarize(results):
+    """
+    :param list[dict] results: The results of the cases to summarize (see run_benchmark)
+    :return: The throughput, latencies, mean stage timings, peak memory and failures of the cases
+    :rtype: dict
+    """
+    seconds = numpy.array([result['seconds'] for result in results])
+    summary = OrderedDict([
+        ('images', len(results)),
+        ('failures', sum(1 for result in results if not result['success'])),
+        ('images_per_sec', len(results) / seconds.sum() if seconds.sum() else None),
+        ('latency_p50_ms', numpy.percentile(seconds, 50) * 1000),
+        ('latency_p99_ms', numpy.percentile(seconds, 99) * 1000),
+        ('stages_mean_ms', OrderedDict(
+            (stage, sum(result['timings'].get(stage, 0) for result in results) / len(results) * 1000)
+            for stage in STAGES)),
+    ])
+    memory = [result['peak_memory_kb'] for result in results if 'peak_memory_kb' in result]
+    if memory:
+        summary['peak_memory_kb'] = max(memory)
+    return summary
+
+
+def _get_breakdowns(results):
+    """
+    :return: The summaries of the results, grouped by each of the corpus' axes
+    :rtype: dict
+    """
+    axes = OrderedDict([
+        ('version', lambda case: next(group for group in VERSION_GROUPS if group[0] <= case.version <= group[1])),
+        ('ec_level', lambda case: case.ec_level),
+        ('mask', lambda case: case.mask),
+        ('module_size', lambda case: case.module_size),
+        ('noise', lambda case: case.noise),
+        ('jpeg_quality', lambda case: case.jpeg_quality),
+    ])
+    breakdowns = OrderedDict()
+    for axis, get_group in axes.items():
+        groups = {}
+        for result in results:
+            groups.setdefault(get_group(result['case']), []).append(result)
+        # PNG images (without a JPEG quality) first
+        breakdowns[axis] = OrderedDict((_get_group_name(group), summarize(groups[group]))
+                                       for group in sorted(groups, key=lambda group: (group is not None, group)))
+    return breakdowns
+
+
+def _get_group_name(group):
+    """
+    :param int|str|tuple|None group: A value of one of the corpus' axes, or a range of versions
+    :rtype: str
+    """
+    if group is None:
+        return 'png'
+    if isinstance(group, tuple):
+        return '{0}-{1}'.format(*group)
+    return str(group)
+
+
+def compare(summary, baseline, tolerance):
+    """
+    :param dict summary: The summary of this run
+    :param dict baseline: The summary of the baseline run
+    :param float tolerance: The relative change allowed before a metric counts as a regression (e.g. 0.1 for 10%)
+    :return: The relative change of each compared metric, and the metrics which regressed beyond the tolerance
+    :rtype: (dict, list[str])
+    """
+    changes = OrderedDict()
+    regressions = []
+    for metric, higher_is_better in COMPARED_METRICS:
+        old, new = baseline.get(metric), summary.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        changes[metric] = change
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(metric)
+    if summary['failures'] > baseline['failures']:
+        regressions.append('failures')
+    return changes, regressions
+
+
+def _print_summary(summary):
+    print('{0} images, {1} failures'.format(summary['images'], summary['failures']))
+    print('{0:.1f} images/sec, p50 {1:.2f}ms, p99 {2:.2f}ms{3}'.format(
+        summary['images_per_sec'] or 0, summary['latency_p50_ms'], summary['latency_p99_ms'],
+        ', peak memory {0:.0f}KB'.format(summary['peak_memory_kb']) if 'peak_memory_kb' in summary else ''))
+
+
+def _print_report(report):
+    _print_summary(report['summary'])
+    print('mean time per stage: ' + ', '.join('{0} {1:.2f}ms'.format(stage, ms)
+                                              for stage, ms in report['summary']['stages_mean_ms'].items()))
+    for axis, groups in report['breakdowns'].items():
+        print('by {0}:'.format(axis))
+        for group, summary in groups.items():
+            print('  {0}: {1:.1f} images/sec, p50 {2:.2f}ms, {3} failures'.format(
+                group, summary['images_per_sec'] or 0, summary['latency_p50_ms'], summary['failures']))
+    for name, failure in report['failures'].items():
+        print('failed: {0} (at {1})'.format(name, failure or 'the payload'))
+
+
+def _parse_list(cast):
+    return lambda text: [cast(item) for item in text.split(',')]
+
+
+def _parse_quality(text):
+    return None if text.lower() in ('none', 'png') else int(text)
+
+
+def _get_arg_parser():
+    parser = argparse.ArgumentParser(description='Benchmarks reading QR codes over a synthetic corpus')
+    parser.add_argument('--versions', type=_parse_list(int), default=list(VERSIONS),
+                        help='comma separated versions to generate (default: 1-40)')
+    parser.add_argument('--ec-levels', type=_parse_list(str), default=sorted(EC_LEVELS),
+                        help='comma separated error correction levels to generate (default: all)')
+    parser.add_argument('--masks', type=_parse_list(int), default=list(MASKS))
+    parser.add_argument('--module-sizes', type=_parse_list(int), default=list(MODULE_SIZES))
+    parser.add_argument('--noise-levels', type=_parse_list(int), default=list(NOISE_LEVELS))
+    parser.add_argument('--jpeg-qualities', type=_parse_list(_parse_quality), default=list(JPEG_QUALITIES),
+                        help='comma separated JPEG qualities, "png" for lossless images')
+    parser.add_argument('--full', action='store_true',
+                        help='generate every combination of the axes, instead of a case per version and level')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='reads of each case (its fastest is counted)')
+    parser.add_argument('--no-memory', action='store_true', help="don't measure the peak memory")
+    parser.add_argument('--output', help='the path to write the results to, as JSON')
+    parser.add_argument('--baseline', help='the path of results to compare to')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='the relative change counted as a regression (default: 0.1)')
+    return parser
+
+
+def main(argv=None):
+    args = _get_arg_parser().parse_args(argv)
+    corpus_args = OrderedDict([
+        ('versions', args.versions), ('ec_levels', args.ec_levels), ('masks', args.masks),
+        ('module_sizes', args.module_sizes), ('noise_levels', args.noise_levels),
+        ('jpeg_qualities', args.jpeg_qualities), ('full', args.full), ('seed', args.seed),
+    ])
+    cases = list(generate_corpus(**corpus_args))
+    print('generated {0} images'.format(len(cases)))
+    results = list(run_benchmark(cases, args.repeat, not args.no_memory).values())
+
+    report = OrderedDict([
+        ('meta', OrderedDict([
+            ('time', time.strftime('%Y-%m-%dT%H:%M:%S')),
+            ('python', platform.python_version()),
+            ('numpy', numpy.__version__),
+            ('platform', platform.platform()),
+            ('corpus', corpus_args),
+            ('repeat', args.repeat),
+            ('max_rss_kb', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None),
+        ])),
+        ('summary', summarize(results)),
+        ('breakdowns', _get_breakdowns(results)),
+        ('failures', OrderedDict((case_name(result['case']), result['failed_stage'])
+                                 for result in results if not result['success'])),
+    ])
+    _print_report(report)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline['meta']['corpus'] != json.loads(json.dumps(corpus_args)):
+            print('warning: the baseline was run over a different corpus')
+        changes, regressions = compare(report['summary'], baseline['summary'], args.tolerance)
+        print('compared to the baseline: ' + ', '.join('{0} {1:+.1%}'.format(metric, change)
+                                                       for metric, change in changes.items()))
+        if regressions:
+            print('regressed beyond {0:.0%}: {1}'.format(args.tolerance, ', '.join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
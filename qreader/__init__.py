@@ -1,4 +1,6 @@
-from qreader.api import read
+from qreader.api import read, read_with_info, read_all, read_many, read_array, read_matrix
+from qreader.instrumentation import ReadStats
+from qreader.stream import FrameStreamReader
+from qreader.structured_append import StructuredAppendBuffer
 
 __author__ = 'ewino'
-
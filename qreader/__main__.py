@@ -0,0 +1,7 @@
+import sys
+
+from qreader.cli import main
+
+__author__ = 'ewino'
+
+sys.exit(main())
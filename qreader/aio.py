@@ -0,0 +1,194 @@
+"""
+Coroutines for reading QR codes without blocking an asyncio event loop. Loading the images and reading the codes is
+done in an executor, and only a bounded amount of reads is submitted to it at once - when it's full, the coroutines
+wait for a free slot instead of queueing more work (so a busy service slows its callers down rather than piling up
+images in memory). Requires Python 3.6+
+"""
+import asyncio
+import functools
+import threading
+import weakref
+from collections import deque
+from multiprocessing import cpu_count
+
+from qreader import api
+from qreader.binarization import global_threshold
+
+__author__ = 'ewino'
+
+__all__ = ['AsyncReader', 'read', 'read_many']
+
+_default_reader = None
+_default_reader_lock = threading.Lock()
+
+
+class AsyncReader(object):
+    """
+    Reads QR codes in an executor, with no more than max_pending reads submitted to it at once.
+    Can be shared by any amount of coroutines (and event loops). Should be closed when done with, or used as a context
+    manager.
+    """
+
+    def __init__(self, workers=None, executor='thread', max_pending=None):
+        """
+        :param int workers: The amount of workers to read with. Defaults to the amount of CPUs
+        :param str executor: 'thread' to read in a thread pool (the default), or 'process' to read in a process pool
+            (which reads in parallel, but only accepts picklable sources, e.g. paths and PIL images)
+        :param int max_pending: The amount of reads that can be submitted to the executor at once (running or waiting
+            for a worker). Defaults to twice the amount of workers
+        """
+        if executor not in api.EXECUTORS:
+            raise ValueError('executor should be one of: {0:s}'.format(', '.join(sorted(api.EXECUTORS))))
+        self.workers = workers or cpu_count()
+        self.max_pending = max_pending or self.workers * 2
+        self._executor_type = executor
+        self._executor = None
+        self._lock = threading.Lock()
+        # asyncio's semaphores can only be waited on in the loop they were first waited on in, so there's one per loop
+        self._slots = weakref.WeakKeyDictionary()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self, wait=True):
+        """
+        Shuts the executor down. Reading again starts a new one
+        :param bool wait: Whether to wait for the submitted reads to finish
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait)
+
+    async def read(self, image_or_path, draft_module_size=None, binarizer=global_threshold, parse=True):
+        """
+        Reads a QR code's data, like qreader.read. Waits for a free slot if max_pending reads are already submitted.
+        Cancelling it while it waits for a slot or for a worker drops the read, but a read that has already started
+        runs to its end (its result is just thrown away)
+        :param str|PIL.Image.Image|file|BufferedIOBase image_or_path: The source containing the QR code.
+        :param int draft_module_size: See qreader.read
+        :param binarizer: See qreader.read
+        :param bool parse: See qreader.read
+        :return: The data encoded in the QR code.
+        :rtype: str|unicode|int|object
+        """
+        loop = asyncio.get_event_loop()
+        read = functools.partial(api.read, image_or_path, draft_module_size, binarizer, parse)
+        async with self._get_slots(loop):
+            return await loop.run_in_executor(self._get_executor(), read)
+
+    async def read_many(self, sources, ordered=True, draft_module_size=None, binarizer=global_threshold, parse=True):
+        """
+        Reads the QR code data from many sources concurrently, like qreader.read_many. Only max_pending sources are
+        read ahead, so the sources can be a lazy (and long) iterable, or an asynchronous one.
+        Closing the generator (or cancelling the task iterating it) cancels the reads still pending
+        :param collections.Iterable|collections.AsyncIterable sources: The sources to read
+        :param bool ordered: Whether to return the results in the order of the sources, or as soon as they're done
+        :param int draft_module_size: See qreader.read
+        :param binarizer: See qreader.read
+        :param bool parse: See qreader.read
+        :return: An asynchronous generator of (source, data or exception) tuples
+        :rtype: collections.AsyncIterator[tuple]
+        """
+        pending = deque()
+        try:
+            async for source in _iterate(sources):
+                pending.append((source, asyncio.ensure_future(self.read(source, draft_module_size, binarizer, parse))))
+                while len(pending) >= self.max_pending:
+                    yield await _pop_result(pending, ordered)
+            while pending:
+                yield await _pop_result(pending, ordered)
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    def _get_executor(self):
+        """
+        :rtype: concurrent.futures.Executor
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = api.EXECUTORS[self._executor_type](self.workers)
+            return self._executor
+
+    def _get_slots(self, loop):
+        """
+        :param asyncio.AbstractEventLoop loop: The running event loop
+        :rtype: asyncio.Semaphore
+        """
+        with self._lock:
+            if loop not in self._slots:
+                self._slots[loop] = asyncio.Semaphore(self.max_pending)
+            return self._slots[loop]
+
+
+async def _iterate(sources):
+    """
+    :param collections.Iterable|collections.AsyncIterable sources: The sources to read
+    :rtype: collections.AsyncIterator
+    """
+    if hasattr(sources, '__aiter__'):
+        async for source in sources:
+            yield source
+    else:
+        for source in sources:
+            yield source
+
+
+async def _pop_result(pending, ordered):
+    """
+    Waits for a pending read to finish, and returns its result
+    :param deque[tuple[object, asyncio.Future]] pending: The sources and tasks of the pending reads
+    :param bool ordered: Whether to wait for the first read, or return whichever is done first
+    :rtype: tuple
+    """
+    if ordered:
+        await asyncio.wait([pending[0][1]])
+    else:
+        await asyncio.wait([task for _, task in pending], return_when=asyncio.FIRST_COMPLETED)
+    source, task = next(item for item in pending if item[1].done())
+    pending.remove((source, task))
+    error = task.exception()
+    return source, (error if error is not None else task.result())
+
+
+def _get_default_reader():
+    """
+    :rtype: AsyncReader
+    """
+    global _default_reader
+    with _default_reader_lock:
+        if _default_reader is None:
+            _default_reader = AsyncReader()
+        return _default_reader
+
+
+async def read(image_or_path, draft_module_size=None, binarizer=global_threshold, parse=True, reader=None):
+    """
+    Reads a QR code's data without blocking the event loop. See AsyncReader.read
+    :param str|PIL.Image.Image|file|BufferedIOBase image_or_path: The source containing the QR code.
+    :param int draft_module_size: See qreader.read
+    :param binarizer: See qreader.read
+    :param bool parse: See qreader.read
+    :param AsyncReader reader: The reader to read with. Defaults to a shared one, reading in a thread per CPU
+    :rtype: str|unicode|int|object
+    """
+    return await (reader or _get_default_reader()).read(image_or_path, draft_module_size, binarizer, parse)
+
+
+def read_many(sources, ordered=True, draft_module_size=None, binarizer=global_threshold, parse=True, reader=None):
+    """
+    Reads the QR code data from many sources without blocking the event loop. See AsyncReader.read_many
+    :param collections.Iterable|collections.AsyncIterable sources: The sources to read
+    :param bool ordered: Whether to return the results in the order of the sources, or as soon as they're done
+    :param int draft_module_size: See qreader.read
+    :param binarizer: See qreader.read
+    :param bool parse: See qreader.read
+    :param AsyncReader reader: The reader to read with. Defaults to a shared one, reading in a thread per CPU
+    :return: An asynchronous generator of (source, data or exception) tuples
+    :rtype: collections.AsyncIterator[tuple]
+    """
+    return (reader or _get_default_reader()).read_many(sources, ordered, draft_module_size, binarizer, parse)
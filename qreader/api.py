@@ -1,34 +1,266 @@
+import functools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from io import BufferedIOBase
+from multiprocessing import cpu_count
 
 import six
 import PIL.Image
 
+from qreader.binarization import global_threshold
 from qreader.decoder import QRDecoder
-from qreader.scanner import ImageScanner
+from qreader.exceptions import QrReadingException, QrFormatError
+from qreader.instrumentation import NO_STATS
+from qreader.scanner import ImageScanner, ArrayScanner, MatrixScanner
 
 __author__ = 'ewino'
 
-__all__ = ['read']
+__all__ = ['read', 'read_with_info', 'read_all', 'read_many', 'read_array', 'read_matrix']
 
+EXECUTORS = {
+    'process': ProcessPoolExecutor,
+    'thread': ThreadPoolExecutor,
+}
 
-def read(image_or_path):
+# the reduced scales JPEG images can be decoded in, largest reduction first
+DRAFT_SCALES = (8, 4, 2)
+
+
+def read(image_or_path, draft_module_size=None, binarizer=global_threshold, parse=True, stats=None):
     """
     Accepts either a path to a file, a PIL image, or a file-like object and reads a QR code data from it.
     :param str|PIL.Image.Image|file|BufferedIOBase image_or_path: The source containing the QR code.
+    :param int draft_module_size: If given, JPEG files are loaded in reduced resolution and gray-scale, which is much
+        faster for large photos. The resolution is picked so the code's blocks are at least this many pixels wide.
+        Falls back to the full resolution if the code can't be read that way. Ignored for PIL images, which are
+        already loaded.
+    :param binarizer: The function telling black pixels from white ones. For images that are too light, too dark or
+        unevenly lit, use qreader.binarization.adaptive_threshold
+    :param bool parse: Whether to parse payloads of known formats (e.g. vCards or WiFi networks), or return them as
+        text. See qreader.payloads
+    :param qreader.instrumentation.ReadStats stats: Records the time spent in each stage of the read, counts the work
+        done, and tells where the read failed (if it did). Nothing is recorded by default
+    :return: The data encoded in the QR code.
+    :rtype: str|unicode|int|object
+    """
+    return read_with_info(image_or_path, draft_module_size, binarizer, parse, stats)[0]
+
+
+def read_with_info(image_or_path, draft_module_size=None, binarizer=global_threshold, parse=True, stats=None):
+    """
+    Reads a QR code's data like `read`, along with the code's info (its version, error correction level, mask...)
+    :param str|PIL.Image.Image|file|BufferedIOBase image_or_path: The source containing the QR code.
+    :param int draft_module_size: See `read`
+    :param binarizer: See `read`
+    :param bool parse: See `read`
+    :param qreader.instrumentation.ReadStats stats: See `read`
+    :return: The data encoded in the QR code, and the code's info
+    :rtype: (str|unicode|int|object, qreader.scanner.QRCodeInfo)
+    """
+    stats = stats if stats is not None else NO_STATS
+    with stats.read():
+        image = None
+        if draft_module_size and not isinstance(image_or_path, PIL.Image.Image):
+            scanner, image = _get_draft_scanner(image_or_path, draft_module_size, binarizer, stats)
+            if scanner:
+                try:
+                    return _decode(scanner, parse), scanner.info
+                except (QrReadingException, QrFormatError):
+                    stats.count('draft_misses')
+            if image is None:
+                _rewind(image_or_path)
+        if image is None:
+            with stats.stage('load'):
+                image = _open_image(image_or_path)
+        scanner = ImageScanner(image, binarizer=binarizer, stats=stats)
+        return _decode(scanner, parse), scanner.info
+
+
+def _decode(scanner, parse):
+    """
+    Reads the scanner's code and decodes its data
+    :param qreader.scanner.Scanner scanner: The code's scanner
+    :param bool parse: Whether to parse payloads of known formats
+    :rtype: str|unicode|int|object
+    """
+    # the code is read first, so reading it isn't timed as decoding
+    scanner.read()
+    with scanner.stats.stage('decode'):
+        return QRDecoder(scanner, parse).get_first()
+
+
+def _get_draft_scanner(path_or_file, module_size, binarizer=global_threshold, stats=NO_STATS):
+    """
+    Opens a JPEG image in the smallest scale in which the QR code's blocks are at least module_size pixels wide.
+    The code is first looked for in the smallest scale possible, to see how large its blocks are.
+    :param str|file|BufferedIOBase path_or_file: The source containing the QR code.
+    :param int module_size: The minimal width of a block, in pixels
+    :param binarizer: The function telling black pixels from white ones
+    :param qreader.instrumentation.ReadStats stats: Records the time spent reading the code
+    :return: A scanner of the reduced image, or None if it's not a JPEG, or the code wasn't found or needs the full
+        resolution to be read. Along with it, the image as opened if it's not a JPEG (so it's read without opening it
+        again), or None
+    :rtype: (ImageScanner, PIL.Image.Image)
+    """
+    with stats.stage('load'):
+        image = _open_image(path_or_file)
+    if image.format != 'JPEG':
+        return None, image
+    full_width, full_height = image.size
+    image.draft('L', (full_width // DRAFT_SCALES[0], full_height // DRAFT_SCALES[0]))
+    scanner = ImageScanner(image, binarizer=binarizer, stats=stats)
+    try:
+        scanner.read_info()
+    except (QrReadingException, QrFormatError):
+        return None, None
+    # the actual scale may be smaller than requested, for sizes which don't divide by it
+    full_module_size = scanner.info.block_size[0] * float(full_width) / image.width
+
+    for scale in DRAFT_SCALES:
+        if full_module_size / scale >= module_size:
+            if scale != DRAFT_SCALES[0]:
+                _rewind(path_or_file)
+                with stats.stage('load'):
+                    image = _open_image(path_or_file)
+                    image.draft('L', (full_width // scale, full_height // scale))
+                scanner = ImageScanner(image, binarizer=binarizer, stats=stats)
+            return scanner, None
+    return None, None
+
+
+def _rewind(path_or_file):
+    if hasattr(path_or_file, 'seek'):
+        path_or_file.seek(0)
+
+
+def read_all(image_or_path, binarizer=global_threshold, parse=True, stats=None):
+    """
+    Accepts either a path to a file, a PIL image, or a file-like object and reads the data of every QR code in it.
+    :param str|PIL.Image.Image|file|BufferedIOBase image_or_path: The source containing the QR codes.
+    :param binarizer: The function telling black pixels from white ones. See `read`
+    :param bool parse: Whether to parse payloads of known formats. See `read`
+    :param qreader.instrumentation.ReadStats stats: Records the read of all the codes. See `read`
+    :raise QrReadingException: in case none of the codes could be read
+    :return: The data encoded in each of the QR codes, in reading order (top to bottom, left to right)
+    :rtype: list
+    """
+    stats = stats if stats is not None else NO_STATS
+    results = []
+    error = None
+    with stats.read():
+        with stats.stage('load'):
+            image = _open_image(image_or_path)
+        scanner = ImageScanner(image, binarizer=binarizer, stats=stats)
+        with stats.stage('locate'):
+            scanners = scanner.find_codes()
+        for scanner in scanners:
+            try:
+                results.append(_decode(scanner, parse))
+            except (QrReadingException, QrFormatError) as e:
+                # could be a false detection, so we just move on to the next one
+                error = error or e
+        if error and not results:
+            raise error
+    return results
+
+
+def read_array(array, shape=None, binarizer=global_threshold, parse=True, stats=None):
+    """
+    Reads a QR code's data from an image's pixels, bypassing PIL. The pixels aren't copied where possible
+    :param array: The pixels, indexed by [y, x]: a numpy array, or any object supporting the buffer protocol (e.g. a
+        memoryview, or bytes along with their shape). See qreader.scanner.ArrayScanner for the pixel formats
+    :param tuple[int, int] shape: The height and width of the image, for flat buffers (e.g. bytes)
+    :param binarizer: The function telling black pixels from white ones (see `read`), or None if the pixels are already
+        binarized (1 for black, 0 for white)
+    :param bool parse: Whether to parse payloads of known formats. See `read`
+    :param qreader.instrumentation.ReadStats stats: Records the read. See `read`
     :return: The data encoded in the QR code.
-    :rtype: str|unicode|int|qreader.vcard.vCard
+    :rtype: str|unicode|int|object
+    """
+    stats = stats if stats is not None else NO_STATS
+    with stats.read():
+        return _decode(ArrayScanner(array, shape, binarizer=binarizer, stats=stats), parse)
+
+
+def read_matrix(matrix, parse=True, stats=None):
+    """
+    Reads a QR code's data from its blocks, e.g. as told apart by another detector
+    :param numpy.ndarray|list matrix: A size x size matrix of the code's blocks, indexed by [y, x], with 1 for black
+        blocks and 0 for white ones
+    :param bool parse: Whether to parse payloads of known formats. See `read`
+    :param qreader.instrumentation.ReadStats stats: Records the read. See `read`
+    :return: The data encoded in the QR code.
+    :rtype: str|unicode|int|object
+    """
+    stats = stats if stats is not None else NO_STATS
+    with stats.read():
+        return _decode(MatrixScanner(matrix, stats=stats), parse)
+
+
+def _open_image(image_or_path):
+    """
+    :param str|PIL.Image.Image|file|BufferedIOBase image_or_path: The source containing the image.
+    :rtype: PIL.Image.Image
     """
     if isinstance(image_or_path, (six.string_types + (BufferedIOBase,))) or \
             (six.PY2 and isinstance(image_or_path, file)):
         image_or_path = PIL.Image.open(image_or_path)
     if isinstance(image_or_path, PIL.Image.Image):
-        data = ImageScanner(image_or_path)
-        return QRDecoder(data).get_first()
-        # result = QRDecoder(data).get_all()
-        # if len(result) == 0:
-        #     return None
-        # elif len(result) == 1:
-        #     return result[0]
-        # else:
-        #     return result
+        return image_or_path
     raise TypeError('parameter should be a PIL image object, a file-like object, or a path to an image file')
+
+
+def read_many(sources, workers=None, executor='process', ordered=True, parse=True, reader=None):
+    """
+    Reads the QR code data from many sources in parallel. A failure doesn't stop the reading of the other sources,
+    the exception raised while reading a source is returned instead of its data.
+    Only a few sources are read ahead, so the sources can be a lazy (and long) iterable, and closing the generator
+    stops the reading (the reads already running are waited for)
+    :param collections.Iterable sources: The sources to read. Each can be anything `read` accepts, but when reading
+        in processes they must also be picklable (e.g. paths or PIL images, but not open files)
+    :param int workers: The amount of workers to read with. Defaults to the amount of CPUs
+    :param str executor: 'process' to read in a process pool (the default, since reading is CPU-bound) or 'thread'
+    :param bool ordered: Whether to return the results in the order of the sources, or as soon as they're done
+    :param bool parse: Whether to parse payloads of known formats. See `read`
+    :param reader: The function reading each source, called with the source alone. Must be picklable when reading in
+        processes (e.g. a module-level function, or a functools.partial of one). Defaults to `read`
+    :return: A generator of (source, data or exception) tuples
+    :rtype: collections.Iterator[tuple]
+    """
+    if executor not in EXECUTORS:
+        raise ValueError('executor should be one of: {0:s}'.format(', '.join(sorted(EXECUTORS))))
+    workers = workers or cpu_count()
+    reader = reader or functools.partial(read, parse=parse)
+    pending = deque()
+    with EXECUTORS[executor](workers) as pool:
+        try:
+            for source in sources:
+                pending.append((source, pool.submit(reader, source)))
+                for result in _pop_results(pending, ordered, workers * 2):
+                    yield result
+            for result in _pop_results(pending, ordered, 0):
+                yield result
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def _pop_results(pending, ordered, max_pending):
+    """
+    Waits for pending reads to finish until no more than max_pending are left, and returns their results
+    :param deque[tuple[object, concurrent.futures.Future]] pending: The sources and futures of the pending reads
+    :param bool ordered: Whether to wait for the reads in order, or return whichever are done first
+    :param int max_pending: The amount of reads that can be left pending
+    :rtype: collections.Iterator[tuple]
+    """
+    while len(pending) > max_pending:
+        if ordered:
+            done = [pending.popleft()]
+        else:
+            done_futures = wait([future for _, future in pending], return_when=FIRST_COMPLETED).done
+            done = [item for item in pending if item[1] in done_futures]
+            for item in done:
+                pending.remove(item)
+        for source, future in done:
+            error = future.exception()  # waits for the read to finish
+            yield source, (error if error is not None else future.result())
@@ -0,0 +1,110 @@
+import numpy
+
+__author__ = 'ewino'
+
+# Binarizers turn a gray-scale image to a bitmap. Each receives a height x width array of shades (0-255) and returns
+# an array of the same shape, with 1 for black pixels and 0 for white ones
+
+# how far under the average around it (in standard deviations) a pixel must be to be considered black
+DEVIATION_BIAS = 0.2
+
+
+def global_threshold(shades, threshold=128):
+    """
+    Marks every pixel darker than a fixed threshold as black. Fast, but only fit for evenly lit, high contrast images.
+    :param numpy.ndarray shades: The image's shades, indexed by [y, x]
+    :param int threshold: The shade under which pixels are considered black
+    :rtype: numpy.ndarray
+    """
+    return (shades < threshold).astype(numpy.uint8)
+
+
+def otsu_binarize(shades):
+    """
+    Marks every pixel darker than the threshold found for the whole image (by Otsu's method) as black. Fit for evenly
+    lit images which are too light or too dark for a fixed threshold
+    :param numpy.ndarray shades: The image's shades, indexed by [y, x]
+    :rtype: numpy.ndarray
+    """
+    return global_threshold(shades, get_otsu_threshold(shades))
+
+
+def get_otsu_threshold(shades):
+    """
+    Finds the shade best separating the image's pixels to two groups (dark and light), by Otsu's method
+    :param numpy.ndarray shades: The image's shades, indexed by [y, x]
+    :rtype: int
+    """
+    histogram = numpy.bincount(shades.ravel(), minlength=256).astype(numpy.float64)
+    weights = numpy.cumsum(histogram)  # the amount of pixels darker than each shade (including it)
+    sums = numpy.cumsum(histogram * numpy.arange(256))
+    total, total_sum = weights[-1], sums[-1]
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        dark_means = sums / weights
+        light_means = (total_sum - sums) / (total - weights)
+        variances = numpy.nan_to_num(weights * (total - weights) * (dark_means - light_means) ** 2)
+    # pixels darker than the threshold are black, so it's one above the last dark shade
+    return int(numpy.nanargmax(variances)) + 1
+
+
+def adaptive_threshold(shades, window=None, min_contrast=10):
+    """
+    Marks every pixel which is darker than the average of the pixels around it (by a bit) as black. That keeps working
+    for images that are too light, too dark or unevenly lit. Where there's too little contrast around a pixel to tell
+    (e.g. inside a large dark area), it's compared to the average of a window 4 times as large, and if that doesn't
+    help either, to a threshold found for the whole image.
+    The averages are taken from integral images, so it runs in linear time no matter how large the window is.
+    :param numpy.ndarray shades: The image's shades, indexed by [y, x]
+    :param int window: The width of the square around each pixel to average. Should be a few times the size of a
+        block. Defaults to an eighth of the image's larger side
+    :param int min_contrast: The standard deviation of the shades around a pixel under which it's considered too
+        low to tell black from white
+    :rtype: numpy.ndarray
+    """
+    height, width = shades.shape
+    if window is None:
+        window = max(height, width) // 8
+    integrals = get_integral_image(shades), get_integral_image(shades.astype(numpy.int64) ** 2)
+
+    thresholds = numpy.full(shades.shape, get_otsu_threshold(shades), dtype=numpy.float64)
+    for radius in (max(window, 2) * 2, max(window // 2, 1)):  # the larger window first, so the smaller overrides it
+        means, variances = _get_window_stats(integrals, radius)
+        # leaning a bit towards black keeps light pixels at the edge of a shadow from turning black
+        local_thresholds = means - numpy.sqrt(numpy.maximum(variances, 0)) * DEVIATION_BIAS
+        thresholds = numpy.where(variances >= min_contrast ** 2, local_thresholds, thresholds)
+    return (shades < thresholds).astype(numpy.uint8)
+
+
+def get_integral_image(values):
+    """
+    :param numpy.ndarray values: A height x width array
+    :return: A (height + 1) x (width + 1) array, where [y, x] is the sum of all the values above and to the left of it
+    :rtype: numpy.ndarray
+    """
+    height, width = values.shape
+    integral = numpy.zeros((height + 1, width + 1), dtype=numpy.int64)
+    integral[1:, 1:] = values.cumsum(axis=0, dtype=numpy.int64).cumsum(axis=1)
+    return integral
+
+
+def _get_window_stats(integrals, radius):
+    """
+    Calculates the mean and variance of the shades in the square window around each pixel
+    :param tuple[numpy.ndarray, numpy.ndarray] integrals: The integral images of the shades and of their squares
+    :param int radius: The distance from each pixel to its window's edges
+    :return: The means and variances, indexed by [y, x]
+    :rtype: tuple[numpy.ndarray, numpy.ndarray]
+    """
+    height, width = integrals[0].shape[0] - 1, integrals[0].shape[1] - 1
+    # the windows are cut short at the image's edges
+    tops = numpy.clip(numpy.arange(height) - radius, 0, height)
+    bottoms = numpy.clip(numpy.arange(height) + radius + 1, 0, height)
+    lefts = numpy.clip(numpy.arange(width) - radius, 0, width)
+    rights = numpy.clip(numpy.arange(width) + radius + 1, 0, width)
+    counts = ((bottoms - tops)[:, None] * (rights - lefts)[None, :]).astype(numpy.float64)
+
+    sums, squares_sums = [integral[numpy.ix_(bottoms, rights)] - integral[numpy.ix_(tops, rights)] -
+                          integral[numpy.ix_(bottoms, lefts)] + integral[numpy.ix_(tops, lefts)]
+                          for integral in integrals]
+    means = sums / counts
+    return means, squares_sums / counts - means ** 2
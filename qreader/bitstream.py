@@ -0,0 +1,68 @@
+import binascii
+
+from qreader.exceptions import QrCorruptError
+
+__author__ = 'ewino'
+
+# the amount of bytes turned to a number at once, for reading the fields in them
+WINDOW_BYTES = 32
+
+
+class BitStream(object):
+    """ Reads fields of any length from a packed buffer of bits, most significant bit first """
+
+    def __init__(self, data):
+        """
+        :param bytes|bytearray data: The buffer to read the bits from
+        """
+        self.data = bytes(data)
+        self.length = len(self.data) * 8
+        self.position = 0
+        # a few bytes of the buffer around the position, as a number, so fields are read with a shift and a mask of a
+        # small number (rather than of the whole buffer) and the bytes are turned to a number once per window
+        self._window_start = self._window_end = 0  # in bits
+        self._window = 0
+
+    @property
+    def remaining(self):
+        """ The amount of bits left to read
+        :rtype: int
+        """
+        return self.length - self.position
+
+    def reset(self):
+        self.position = 0
+
+    def read_int(self, amount_of_bits):
+        """
+        Reads the next bits as an unsigned integer
+        :param int amount_of_bits: The amount of bits to read
+        :raise QrCorruptError: in case there aren't enough bits left
+        :rtype: int
+        """
+        end = self.position + amount_of_bits
+        if end > self.length:
+            raise QrCorruptError('QR data ended unexpectedly')
+        if self.position < self._window_start or end > self._window_end:
+            first_byte = self.position // 8
+            window_bytes = self.data[first_byte:max(first_byte + WINDOW_BYTES, (end + 7) // 8)]
+            self._window = int(binascii.hexlify(window_bytes), 16) if window_bytes else 0
+            self._window_start, self._window_end = first_byte * 8, (first_byte + len(window_bytes)) * 8
+        self.position = end
+        return (self._window >> (self._window_end - end)) & ((1 << amount_of_bits) - 1)
+
+    def read_bytes(self, amount):
+        """
+        Reads the next bits as bytes
+        :param int amount: The amount of bytes to read
+        :raise QrCorruptError: in case there aren't enough bits left
+        :rtype: bytes
+        """
+        if self.position % 8 == 0:
+            start = self.position // 8
+            if start + amount > len(self.data):
+                raise QrCorruptError('QR data ended unexpectedly')
+            self.position += amount * 8
+            return self.data[start:start + amount]
+        value = self.read_int(amount * 8)
+        return binascii.unhexlify('{0:0{1:d}x}'.format(value, amount * 2))
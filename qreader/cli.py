@@ -0,0 +1,290 @@
+"""
+The qreader command: reads the QR codes in image files, in a pool of workers, and writes a JSON line per image:
+
+    qreader photos/ 'scans/*.jpg' code.png
+    find /mnt/scans -name '*.png' | qreader --workers 8 > results.jsonl
+
+A line holds the image's path, the code's payload (as text, or a number for numeric codes), version, error correction
+level and mask, and the seconds the read took. An image that couldn't be read gets the error's type and message (and
+the stage the read failed at) instead. The command exits with 1 if any image couldn't be read
+"""
+from __future__ import print_function, division
+
+import argparse
+import functools
+import glob
+import json
+import os
+import sys
+from timeit import default_timer
+
+import PIL.Image
+
+from qreader import api
+from qreader.binarization import global_threshold, otsu_binarize, adaptive_threshold
+from qreader.instrumentation import ReadStats
+from qreader.structured_append import StructuredAppendPart
+from qreader.utils import bytes_to_text
+
+__author__ = 'ewino'
+
+__all__ = ['main', 'read_file', 'read_files', 'iter_paths']
+
+BINARIZERS = {
+    'global': global_threshold,
+    'otsu': otsu_binarize,
+    'adaptive': adaptive_threshold,
+}
+
+EC_LEVEL_NAMES = 'LMQH'
+
+# the least seconds between updates of the progress line
+PROGRESS_INTERVAL = 0.1
+
+
+def read_file(path, draft_module_size=None, binarizer='global'):
+    """
+    Reads the QR code in an image file. Never raises - a failure is returned as the result
+    :param str path: The image's path
+    :param int draft_module_size: See qreader.read
+    :param str binarizer: The name of the binarizer to read with (see BINARIZERS)
+    :return: The result of the read, as simple types (e.g. for JSON)
+    :rtype: dict
+    """
+    stats = ReadStats()
+    start = default_timer()
+    try:
+        data, info = api.read_with_info(path, draft_module_size, BINARIZERS[binarizer], parse=False, stats=stats)
+    except Exception as e:
+        return {
+            'path': path,
+            'error': type(e).__name__,
+            'message': str(e),
+            'failed_stage': stats.failed_stage,
+            'seconds': default_timer() - start,
+        }
+    result = {
+        'path': path,
+        'payload': data,
+        'version': info.version,
+        'ec_level': EC_LEVEL_NAMES[info.error_correction_level],
+        'mask': info.mask_id,
+        'seconds': default_timer() - start,
+    }
+    if isinstance(data, StructuredAppendPart):
+        result['payload'] = _part_to_text(data)
+        result['structured_append'] = {'index': data.index, 'total': data.total, 'parity': data.parity}
+    return result
+
+
+def _part_to_text(part):
+    """
+    :param StructuredAppendPart part: A part of a message split between several codes
+    :return: The part's data, as text. Bytes are decoded by the part's charset, although a character may be split
+        between parts (see qreader.structured_append.join_parts)
+    :rtype: str|unicode
+    """
+    return u''.join(_chunk_to_text(chunk, part.charset) for chunk in
+                    (part.data if isinstance(part.data, tuple) else (part.data,)))
+
+
+def _chunk_to_text(chunk, charset):
+    """
+    :param str|unicode|bytes chunk: The text, or bytes, of some of a part's segments
+    :param str charset: The character set declared for the part's bytes, if any
+    :rtype: str|unicode
+    """
+    if not isinstance(chunk, bytes):
+        return chunk
+    if charset:
+        return chunk.decode(charset, 'replace')
+    return bytes_to_text(chunk)
+
+
+def iter_paths(sources, recursive=False):
+    """
+    Expands the sources given to the command to the paths of the images to read
+    :param collections.Iterable[str] sources: Paths of files or directories, or glob patterns
+    :param bool recursive: Whether to read the images in the directories' subdirectories as well
+    :rtype: collections.Iterator[str]
+    """
+    for source in sources:
+        if os.path.isdir(source):
+            for path in _iter_directory(source, recursive):
+                yield path
+        elif glob.has_magic(source):
+            for path in sorted(glob.glob(source)):
+                if os.path.isdir(path):
+                    for dir_path in _iter_directory(path, recursive):
+                        yield dir_path
+                else:
+                    yield path
+        else:
+            # a missing file is still read, so it gets its error line
+            yield source
+
+
+def _iter_directory(directory, recursive):
+    """
+    :return: The paths of the images in the directory (by their extension)
+    :rtype: collections.Iterator[str]
+    """
+    extensions = _get_image_extensions()
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in extensions:
+                yield os.path.join(root, name)
+        if not recursive:
+            break
+
+
+def _get_image_extensions():
+    """
+    :return: The extensions of the image formats PIL can open
+    :rtype: set[str]
+    """
+    PIL.Image.init()
+    return set(extension for extension, image_format in PIL.Image.registered_extensions().items()
+               if image_format in PIL.Image.OPEN)
+
+
+def read_files(paths, workers=None, executor='process', draft_module_size=None, binarizer='global'):
+    """
+    Reads the QR codes in image files in parallel, yielding the results as they're done. Only a few files are read
+    ahead, so the paths can be a lazy iterable, and closing the generator stops the reading (see qreader.read_many)
+    :param collections.Iterable[str] paths: The paths of the images
+    :param int workers: The amount of workers to read with. Defaults to the amount of CPUs
+    :param str executor: 'process' to read in a process pool, or 'thread'
+    :param int draft_module_size: See qreader.read
+    :param str binarizer: The name of the binarizer to read with (see BINARIZERS)
+    :return: A generator of the results of read_file
+    :rtype: collections.Iterator[dict]
+    """
+    reader = functools.partial(read_file, draft_module_size=draft_module_size, binarizer=binarizer)
+    for _, result in api.read_many(paths, workers, executor, ordered=False, reader=reader):
+        # read_file returns its failures, so anything raised is the pool's
+        if isinstance(result, Exception):
+            raise result
+        yield result
+
+
+class _Progress(object):
+    """
+    A line on stderr, telling how many images were read (rewritten as the reading goes). The total is left out when
+    it isn't known in advance (e.g. when the paths are read from stdin as they come)
+    """
+
+    def __init__(self, total=None, stream=None):
+        self.total = total
+        self.stream = stream or sys.stderr
+        self.done = 0
+        self.failed = 0
+        self._start = default_timer()
+        self._last_shown = None
+        self._shown_done = 0
+
+    def add(self, result):
+        self.done += 1
+        if 'error' in result:
+            self.failed += 1
+        now = default_timer()
+        if self._last_shown is None or now - self._last_shown >= PROGRESS_INTERVAL or self.done == self.total:
+            self._show(now)
+
+    def _show(self, now):
+        self._last_shown = now
+        self._shown_done = self.done
+        rate = self.done / (now - self._start) if now > self._start else 0
+        done = self.done if self.total is None else '{0}/{1}'.format(self.done, self.total)
+        self.stream.write('\r{0} images, {1} failed, {2:.1f} images/sec'.format(done, self.failed, rate))
+        self.stream.flush()
+
+    def close(self):
+        if self._last_shown is not None:
+            if self._shown_done != self.done:
+                self._show(default_timer())
+            self.stream.write('\n')
+            self.stream.flush()
+
+
+def _iter_sources(sources):
+    """
+    :param list[str] sources: The sources given to the command, where "-" stands for the paths on stdin
+    :return: The sources, with the paths on stdin (one per line) read as they come
+    :rtype: collections.Iterator[str]
+    """
+    for source in sources:
+        if source == '-':
+            for line in sys.stdin:
+                if line.strip():
+                    yield line.strip()
+        else:
+            yield source
+
+
+def _get_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog='qreader', description='Reads the QR codes in image files, and writes a JSON line per image.')
+    parser.add_argument('sources', nargs='*', metavar='SOURCE',
+                        help='image files, directories or glob patterns. Reads the paths from stdin (one per line) if '
+                             'none are given, or for "-"')
+    parser.add_argument('-r', '--recursive', action='store_true', help="read the directories' subdirectories too")
+    parser.add_argument('-w', '--workers', type=int, help='the amount of workers (default: the amount of CPUs)')
+    parser.add_argument('--executor', choices=sorted(api.EXECUTORS), default='process',
+                        help='read in a pool of processes (the default) or threads')
+    failures = parser.add_mutually_exclusive_group()
+    failures.add_argument('--fail-fast', dest='fail_fast', action='store_true',
+                          help="stop at the first image that can't be read")
+    failures.add_argument('--continue', dest='fail_fast', action='store_false',
+                          help="keep reading after images that can't be read (the default)")
+    parser.set_defaults(fail_fast=False)
+    progress = parser.add_mutually_exclusive_group()
+    progress.add_argument('--progress', dest='progress', action='store_true', default=None,
+                          help='show the progress on stderr (the default when it is a terminal)')
+    progress.add_argument('--no-progress', dest='progress', action='store_false')
+    parser.add_argument('--draft-module-size', type=int,
+                        help='load JPEG images in reduced resolution, keeping blocks at least this many pixels wide')
+    parser.add_argument('--binarizer', choices=sorted(BINARIZERS), default='global',
+                        help='how to tell black pixels from white ones (default: global)')
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs the qreader command
+    :param list[str] argv: The command's arguments. Defaults to sys.argv
+    :return: The exit code: 0 if all the images were read, or 1 if any couldn't be
+    :rtype: int
+    """
+    args = _get_arg_parser().parse_args(argv)
+    sources = args.sources or ['-']
+    # the paths are read as they're listed, so the first results come out before a long listing is done
+    paths = iter_paths(_iter_sources(sources), args.recursive)
+
+    show_progress = args.progress if args.progress is not None else sys.stderr.isatty()
+    progress = None
+    if show_progress:
+        # the total is only known in advance when the paths aren't read from stdin
+        if '-' in sources:
+            progress = _Progress()
+        else:
+            paths = list(paths)
+            progress = _Progress(len(paths))
+    exit_code = 0
+    results = read_files(paths, args.workers, args.executor, args.draft_module_size, args.binarizer)
+    try:
+        for result in results:
+            print(json.dumps(result, sort_keys=True))
+            sys.stdout.flush()
+            if progress:
+                progress.add(result)
+            if 'error' in result:
+                exit_code = 1
+                if args.fail_fast:
+                    break
+    finally:
+        results.close()
+        if progress:
+            progress.close()
+    return exit_code
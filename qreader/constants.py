@@ -13,6 +13,7 @@ MODE_BYTES = 4
 MODE_KANJI = 8
 MODE_ECI = 7
 MODE_STRUCTURED_APPEND = 3
+MODE_TERMINATOR = 0
 
 # Encoding mode sizes.
 MODE_SIZE_SMALL = {
@@ -1,92 +1,204 @@
 from qreader.constants import MODE_NUMBER, MODE_ALPHA_NUM, ALPHANUM_CHARS, MODE_BYTES, MODE_KANJI, MODE_ECI, \
-    MODE_STRUCTURED_APPEND
-from qreader.exceptions import IllegalQrMessageModeId
-from qreader.spec import bits_for_length
-from qreader.utils import ints_to_bytes
-from qreader.vcard import vCard
+    MODE_STRUCTURED_APPEND, MODE_TERMINATOR
+from qreader.exceptions import IllegalQrMessageModeId, IllegalQrEciDesignator
+from qreader.payloads import parse_payload
+from qreader.spec import bits_for_length, get_eci_codec
+from qreader.structured_append import StructuredAppendPart
+from qreader.utils import ints_to_bytes, bytes_to_text
 
 __author__ = 'ewino'
 
 
 class QRDecoder(object):
 
-    def __init__(self, scanner):
+    def __init__(self, scanner, parse=True):
+        """
+        :param Scanner scanner: The scanner of the code
+        :param bool parse: Whether to parse payloads of known formats (e.g. vCards). See qreader.payloads
+        """
         self.scanner = scanner
+        self.parse = parse
+        # the codec of the character set declared by an ECI designator, for the bytes messages following it
+        self._codec = None
 
     @property
     def version(self):
         return self.scanner.info.version
 
+    @property
+    def stream(self):
+        """ :rtype: qreader.bitstream.BitStream """
+        return self.scanner.stream
+
     def get_first(self):
-        return self._decode_next_message()
+        """
+        Decodes the code's message: all of its segments, joined. A message of a single (non-empty) numeric segment is
+        returned as a number, and a payload of a known format (e.g. a vCard) is parsed, unless parsing is turned off.
+        If the code holds a part of a message split between several codes (structured append), the part is returned
+        (see qreader.structured_append)
+        :rtype: str|unicode|int|object|qreader.structured_append.StructuredAppendPart
+        """
+        header = None
+        segments = []  # the (mode, value) of each data segment. bytes are decoded as they're read, by the ECI in effect
+        for mode, value, _ in self._iter_raw_segments():
+            if mode == MODE_STRUCTURED_APPEND:
+                header = value
+            elif mode == MODE_BYTES and header is None:
+                segments.append((mode, self._bytes_to_text(value)))
+            elif mode != MODE_ECI:
+                segments.append((mode, value))
+
+        if header is not None:
+            return StructuredAppendPart(*header, data=self._join_part_data(segments),
+                                        charset=self._codec and self._codec.name)
+        if len(segments) == 1 and segments[0][0] == MODE_NUMBER and segments[0][1]:
+            return int(segments[0][1])
+        message = u''.join(value for _, value in segments)
+        return parse_payload(message) if self.parse else message
 
     def __iter__(self):
-        yield self._decode_next_message()
+        """
+        Iterates over the values of the code's data segments (see iter_segments). Numeric segments are their digits, as
+        text, so their leading zeros are kept
+        """
+        for mode, value, _ in self.iter_segments():
+            if mode not in (MODE_ECI, MODE_STRUCTURED_APPEND):
+                yield value
 
     def get_all(self):
+        """
+        :return: The values of the code's data segments (see __iter__)
+        :rtype: list[str|unicode]
+        """
         return list(self)
 
-    def _decode_next_message(self):
-        mode = self.scanner.read_int(4)
-        return self._decode_message(mode)
-
-    def _decode_message(self, mode):
-        if mode == MODE_NUMBER:
-            message = self._decode_numeric_message()
-        elif mode == MODE_ALPHA_NUM:
-            message = self._decode_alpha_num_message()
-        elif mode == MODE_BYTES:
-            message = self._decode_bytes_message()
-        elif mode == MODE_KANJI:
-            message = self._decode_kanji_message()
-        elif mode == MODE_STRUCTURED_APPEND:
-            raise NotImplementedError('Structured append encoding not implemented yet')
-        elif mode == MODE_ECI:
-            raise NotImplementedError('Extended Channel Interpretation encoding not implemented yet')
-        else:
-            raise IllegalQrMessageModeId(mode)
-        return message
+    def iter_segments(self):
+        """
+        Decodes the code's segments one by one, so reading can stop once the segments needed are read (e.g. just the
+        first one, to tell a URL's scheme).
+        The values of numeric segments are their digits (as text), and the values of alphanumeric, bytes and kanji
+        segments are their text. ECI designators are yielded as their assignment number, and structured append headers
+        as (index, amount of parts, parity) tuples
+        :return: A generator of (mode, value, bit_offset) tuples, bit_offset being where the segment starts in the data
+        :rtype: collections.Iterator[tuple]
+        """
+        for mode, value, bit_offset in self._iter_raw_segments():
+            if mode == MODE_BYTES:
+                value = self._bytes_to_text(value)
+            yield mode, value, bit_offset
+
+    def _iter_raw_segments(self):
+        """
+        Reads the code's segments from the start of its data, until the terminator (or the end of the data).
+        Like iter_segments, but the values of bytes segments are their bytes
+        :rtype: collections.Iterator[tuple]
+        """
+        stream = self.stream
+        stream.reset()
+        self._codec = None
+        # the terminator (4 zero bits) is cut short, or left out, when the data fills the code
+        while stream.remaining >= 4:
+            bit_offset = stream.position
+            mode = stream.read_int(4)
+            if mode == MODE_TERMINATOR:
+                return
+            if mode == MODE_NUMBER:
+                value = self._decode_numeric_message()
+            elif mode == MODE_ALPHA_NUM:
+                value = self._decode_alpha_num_message()
+            elif mode == MODE_BYTES:
+                value = stream.read_bytes(stream.read_int(bits_for_length(self.version, MODE_BYTES)))
+            elif mode == MODE_KANJI:
+                value = self._decode_kanji_message()
+            elif mode == MODE_ECI:
+                value = self._read_eci_designator()
+                self._codec = get_eci_codec(value)
+            elif mode == MODE_STRUCTURED_APPEND and bit_offset == 0:
+                value = stream.read_int(4), stream.read_int(4) + 1, stream.read_int(8)
+            else:
+                raise IllegalQrMessageModeId(mode)
+            yield mode, value, bit_offset
+
+    def _bytes_to_text(self, raw):
+        """
+        Decodes a bytes segment, by the character set declared by the last ECI designator (if any)
+        :param bytes raw: The segment's bytes
+        :rtype: str|unicode
+        """
+        if self._codec is not None:
+            try:
+                return self._codec.decode(raw)[0]
+            except UnicodeDecodeError:
+                pass  # a wrong character set was declared, so it's guessed just like when none is
+        return bytes_to_text(raw)
+
+    @staticmethod
+    def _join_part_data(segments):
+        """
+        Joins the segments of a structured append part. The parts are joined before they're interpreted, so bytes are
+        kept as they are (a character's bytes may be split between parts): a part of bytes segments only is kept as
+        bytes, and a part mixing bytes with other modes as the values of its segments
+        :param list[tuple[int, str|bytes]] segments: The (mode, value) of each of the part's data segments
+        :rtype: str|unicode|bytes|tuple
+        """
+        if segments and all(mode == MODE_BYTES for mode, _ in segments):
+            return b''.join(value for _, value in segments)
+        if any(mode == MODE_BYTES for mode, _ in segments):
+            return tuple(value for _, value in segments)
+        return u''.join(value for _, value in segments)
+
+    def _read_eci_designator(self):
+        """
+        Reads an ECI assignment number, which takes 1-3 bytes. The first byte's leading bits tell how many:
+        0xxxxxxx for 0-127, 10xxxxxx xxxxxxxx for up to 16383 and 110xxxxx xxxxxxxx xxxxxxxx for up to 999999
+        :raise IllegalQrEciDesignator: in case the first byte doesn't start with any of these
+        :rtype: int
+        """
+        first_byte = self.stream.read_int(8)
+        if not first_byte & 0x80:
+            return first_byte
+        if first_byte & 0xc0 == 0x80:
+            return ((first_byte & 0x3f) << 8) + self.stream.read_int(8)
+        if first_byte & 0xe0 == 0xc0:
+            return ((first_byte & 0x1f) << 16) + self.stream.read_int(16)
+        raise IllegalQrEciDesignator(first_byte)
 
     def _decode_numeric_message(self):
-        char_count = self.scanner.read_int(bits_for_length(self.version, MODE_NUMBER))
+        """
+        :return: The digits, as text (so leading zeros are kept)
+        :rtype: str
+        """
+        stream = self.stream
+        char_count = stream.read_int(bits_for_length(self.version, MODE_NUMBER))
         val = 0
         triples, rest = divmod(char_count, 3)
         for _ in range(triples):
-            val = val * 1000 + self.scanner.read_int(10)
+            val = val * 1000 + stream.read_int(10)
         if rest == 2:
-            val = val * 100 + self.scanner.read_int(7)
+            val = val * 100 + stream.read_int(7)
         elif rest == 1:
-            val = val * 10 + self.scanner.read_int(4)
+            val = val * 10 + stream.read_int(4)
 
-        return val
+        return '{0:0{1:d}d}'.format(val, char_count) if char_count else ''
 
     def _decode_alpha_num_message(self):
-        char_count = self.scanner.read_int(bits_for_length(self.version, MODE_ALPHA_NUM))
+        stream = self.stream
+        char_count = stream.read_int(bits_for_length(self.version, MODE_ALPHA_NUM))
         val = ''
         doubles, has_single = divmod(char_count, 2)
         for _ in range(doubles):
-            double = self.scanner.read_int(11)
+            double = stream.read_int(11)
             val += ALPHANUM_CHARS[double // 45] + ALPHANUM_CHARS[double % 45]
         if has_single:
-            val += ALPHANUM_CHARS[self.scanner.read_int(6)]
-        return val
-
-    def _decode_bytes_message(self):
-        char_count = self.scanner.read_int(bits_for_length(self.version, MODE_BYTES))
-        raw = ints_to_bytes(self.scanner.read_int(8) for _ in range(char_count))
-        try:
-            val = raw.decode('utf-8')
-        except UnicodeDecodeError:
-            val = raw.decode('iso-8859-1')
-        if val.startswith('BEGIN:VCARD\n'):
-            return vCard.from_text(val)
+            val += ALPHANUM_CHARS[stream.read_int(6)]
         return val
 
     def _decode_kanji_message(self):
-        char_count = self.scanner.read_int(bits_for_length(self.version, MODE_KANJI))
+        stream = self.stream
+        char_count = stream.read_int(bits_for_length(self.version, MODE_KANJI))
         nums = []
         for _ in range(char_count):
-            mashed = self.scanner.read_int(13)
+            mashed = stream.read_int(13)
             num = ((mashed // 0xC0) << 8) + mashed % 0xC0
             num += 0x8140 if num < 0x1F00 else 0xC140
             nums.extend(divmod(num, 2 ** 8))
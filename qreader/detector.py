@@ -0,0 +1,251 @@
+import math
+from collections import namedtuple, defaultdict
+from itertools import combinations
+
+import numpy
+
+__author__ = 'ewino'
+
+# The center of a position pattern, in pixels, and the size of its blocks (the pattern is 7 blocks wide)
+FinderPattern = namedtuple('FinderPattern', 'x y module_size')
+
+# crossing a position pattern through its center gives dark-light-dark-light-dark runs in these proportions
+FINDER_PATTERN_RATIOS = numpy.array([1, 1, 3, 1, 1])
+
+# how far the corner of a position patterns triple can be from a right angle (as the cosine of the angle)
+MAX_CORNER_COSINE = 0.15
+# how much the two sides of a position patterns triple can differ in length (relative to the longer one)
+MAX_SIDES_DIFF = 0.2
+# how much the block sizes of the position patterns in a triple can differ (as the ratio between them)
+MAX_MODULE_SIZE_RATIO = 1.5
+
+
+def find_finder_patterns(bitmap):
+    """
+    Finds the position patterns in a bitmap, by looking for rows and columns crossing them in a 1:1:3:1:1 ratio.
+    Any line through a pattern's center crosses it in that ratio, so the diagonals are checked too, to tell the
+    patterns from the blocks which happen to look like them from two sides (common in large codes)
+    :param numpy.ndarray bitmap: A height x width array of BLACK/WHITE pixels, indexed by [y, x]
+    :return: The position patterns found
+    :rtype: list[FinderPattern]
+    """
+    rows_clusters = _cluster_candidates(_find_ratio_crossings(bitmap))
+    columns_clusters = _cluster_candidates((x, y, size) for y, x, size in _find_ratio_crossings(bitmap.T))
+    columns_cells = defaultdict(lambda: defaultdict(list))
+    for index, (col_x, col_y, col_size) in enumerate(columns_clusters):
+        exponent, cell = _get_cell(col_x, col_y, col_size)
+        columns_cells[exponent][cell].append(index)
+
+    patterns = []
+    for row_x, row_y, row_size in rows_clusters:
+        # a column cluster matching the row cluster has blocks less than 1.5 times as large, so it's within
+        # _get_cell's reach from its size
+        for index in sorted(_iter_cells_around(columns_cells, row_x, row_y)):
+            col_x, col_y, col_size = columns_clusters[index]
+            size = (row_size + col_size) / 2
+            if abs(row_x - col_x) < size and abs(row_y - col_y) < size and \
+                    max(row_size, col_size) < min(row_size, col_size) * MAX_MODULE_SIZE_RATIO and \
+                    _crosses_diagonally(bitmap, row_x, col_y, size):
+                # the rows crossing the pattern tell where its center is horizontally, and the columns vertically
+                patterns.append(FinderPattern(row_x, col_y, size))
+                break
+    return patterns
+
+
+def group_finder_patterns(patterns):
+    """
+    Groups position patterns to triples which could be the corners of a QR code: patterns with blocks of about the
+    same size, forming an isosceles right triangle. Each pattern is only used in one triple.
+    :param list[FinderPattern] patterns: The position patterns to group
+    :return: The triples found as (top-left, top-right, bottom-left) tuples, the best fitting ones first
+    :rtype: list[tuple[FinderPattern, FinderPattern, FinderPattern]]
+    """
+    candidates = []
+    for triple in combinations(patterns, 3):
+        sizes = [pattern.module_size for pattern in triple]
+        if max(sizes) > min(sizes) * MAX_MODULE_SIZE_RATIO:
+            continue
+        # try each of the patterns as the corner at the right angle
+        fits = [fit for fit in (_score_corner(triple[i], triple[i - 1], triple[i - 2]) for i in range(3)) if fit]
+        if not fits:
+            continue
+        score, corner, first, second = min(fits, key=lambda fit: fit[0])
+        # in an upright code, going from the top-right pattern to the bottom-left one turns clockwise
+        if (first.x - corner.x) * (second.y - corner.y) - (first.y - corner.y) * (second.x - corner.x) < 0:
+            first, second = second, first
+        candidates.append((score, (corner, first, second)))
+
+    candidates.sort(key=lambda candidate: candidate[0])
+    used = set()
+    triples = []
+    for _, triple in candidates:
+        if not used.intersection(triple):
+            used.update(triple)
+            triples.append(triple)
+    return triples
+
+
+def get_code_region(triple, margin=1):
+    """
+    Returns the part of the image containing the QR code whose position patterns are given
+    :param tuple[FinderPattern, FinderPattern, FinderPattern] triple: The top-left, top-right and bottom-left patterns
+    :param int margin: The amount of blocks to add around the code
+    :return: The region's left, top, right and bottom pixels
+    :rtype: tuple[int, int, int, int]
+    """
+    top_left, top_right, bottom_left = triple
+    xs = (top_left.x, top_right.x, bottom_left.x, top_right.x + bottom_left.x - top_left.x)
+    ys = (top_left.y, top_right.y, bottom_left.y, top_right.y + bottom_left.y - top_left.y)
+    # the patterns' centers are 3.5 blocks from the code's edges
+    padding = (3.5 + margin) * max(pattern.module_size for pattern in triple)
+    return (int(min(xs) - padding), int(min(ys) - padding),
+            int(max(xs) + padding), int(max(ys) + padding))
+
+
+def _find_ratio_crossings(bitmap):
+    """
+    Finds the places where the bitmap's rows cross a position pattern (or something looking like one)
+    :param numpy.ndarray bitmap: A height x width array of BLACK/WHITE pixels, indexed by [y, x]
+    :return: The center x, center y and block size of every crossing
+    :rtype: list[tuple[float, float, float]]
+    """
+    height, width = bitmap.shape
+    if not height or not width:
+        return []
+    # pad every row with white pixels so runs can't continue from one row to the next
+    padded = numpy.zeros((height, width + 2), dtype=numpy.int8)
+    padded[:, 1:-1] = bitmap
+    pixels = padded.ravel()
+    starts = numpy.union1d(numpy.flatnonzero(numpy.diff(pixels)) + 1, numpy.arange(height) * (width + 2))
+    lengths = numpy.diff(numpy.append(starts, len(pixels)))
+    rows = starts // (width + 2)
+
+    windows = len(starts) - 4
+    if windows <= 0:
+        return []
+    runs = numpy.stack([lengths[i:windows + i] for i in range(5)], axis=1)
+    module_sizes = runs.sum(axis=1) / 7.0
+    expected = module_sizes[:, None] * FINDER_PATTERN_RATIOS
+    matches = (pixels[starts[:windows]] == 1) & (rows[:windows] == rows[4:]) & \
+        numpy.all(numpy.abs(runs - expected) < expected / 2, axis=1)
+
+    indexes = numpy.flatnonzero(matches)
+    center_runs = indexes + 2
+    xs = starts[center_runs] - rows[center_runs] * (width + 2) - 1 + lengths[center_runs] / 2.0
+    ys = rows[center_runs] + 0.5
+    return list(zip(xs.tolist(), ys.tolist(), module_sizes[indexes].tolist()))
+
+
+def _crosses_diagonally(bitmap, x, y, module_size):
+    """
+    Checks whether both diagonals through a point cross a position pattern centered on it
+    :param numpy.ndarray bitmap: A height x width array of BLACK/WHITE pixels, indexed by [y, x]
+    :param float x: The x of the pattern's center
+    :param float y: The y of the pattern's center
+    :param float module_size: The size of the pattern's blocks, as seen from the rows and columns crossing it
+    :rtype: bool
+    """
+    height, width = bitmap.shape
+    # a diagonal crosses 7 * sqrt(2) blocks of a straight pattern, and less than that of a rotated one
+    reach = int(module_size * 6) + 1
+    steps = numpy.arange(-reach, reach + 1)
+    for direction in (1, -1):
+        xs, ys = int(x) + steps, int(y) + steps * direction
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        pixels = numpy.zeros(len(steps), dtype=numpy.int8)
+        pixels[inside] = bitmap[ys[inside], xs[inside]]
+        starts = numpy.append(0, numpy.flatnonzero(numpy.diff(pixels)) + 1)
+        lengths = numpy.diff(numpy.append(starts, len(pixels)))
+        center = numpy.searchsorted(starts, reach, side='right') - 1
+        # the pattern's runs around the center, which are all bounded by other runs
+        if not pixels[reach] or center < 3 or center + 3 >= len(starts):
+            return False
+        runs = lengths[center - 2:center + 3]
+        expected = runs.sum() / 7.0 * FINDER_PATTERN_RATIOS
+        if not numpy.all(numpy.abs(runs - expected) < expected / 2):
+            return False
+    return True
+
+
+def _cluster_candidates(candidates):
+    """
+    Merges crossings of the same pattern (neighbouring rows crossing it at about the same place). Each crossing joins
+    the first cluster it's near to, which is looked up by the cells around it rather than among all the clusters
+    :param collections.Iterable[tuple[float, float, float]] candidates: The x, y and block size of every crossing
+    :return: The average x, y and block size of every cluster of crossings
+    :rtype: list[tuple[float, float, float]]
+    """
+    clusters = []  # each is [sum of xs, sum of ys, sum of sizes, count]
+    cells = defaultdict(lambda: defaultdict(list))  # the indexes of the clusters, by the cells of their averages
+    for x, y, size in candidates:
+        index = None
+        for cluster_index in _iter_cells_around(cells, x, y):
+            sum_x, sum_y, sum_size, count = clusters[cluster_index]
+            cluster_size = sum_size / count
+            if abs(sum_x / count - x) < cluster_size and abs(sum_y / count - y) < cluster_size * 2 and \
+                    (index is None or cluster_index < index):
+                index = cluster_index
+        if index is None:
+            clusters.append([x, y, size, 1])
+            exponent, cell = _get_cell(x, y, size)
+            cells[exponent][cell].append(len(clusters) - 1)
+            continue
+        cluster = clusters[index]
+        old_cell = _get_cell(cluster[0] / cluster[3], cluster[1] / cluster[3], cluster[2] / cluster[3])
+        cluster[0] += x
+        cluster[1] += y
+        cluster[2] += size
+        cluster[3] += 1
+        new_cell = _get_cell(cluster[0] / cluster[3], cluster[1] / cluster[3], cluster[2] / cluster[3])
+        if new_cell != old_cell:
+            cells[old_cell[0]][old_cell[1]].remove(index)
+            cells[new_cell[0]][new_cell[1]].append(index)
+    return [(sum_x / count, sum_y / count, sum_size / count) for sum_x, sum_y, sum_size, count in clusters]
+
+
+def _get_cell(x, y, size):
+    """
+    Buckets a cluster by its size and place. Clusters of about the same size (up to the same power of 2) are bucketed
+    by cells twice as wide as the largest of them, so everything up to twice their size away is in the cells around
+    :return: The power of 2 the size is under, and the cell's column and row
+    :rtype: tuple[int, tuple[int, int]]
+    """
+    exponent = math.frexp(size)[1]
+    width = 2.0 ** (exponent + 1)
+    return exponent, (int(math.floor(x / width)), int(math.floor(y / width)))
+
+
+def _iter_cells_around(cells, x, y):
+    """
+    :param dict[int, dict[tuple[int, int], list[int]]] cells: The indexes of clusters, by their cells (see _get_cell)
+    :return: The indexes of the clusters in the cells around a point, of every size
+    :rtype: collections.Iterator[int]
+    """
+    for exponent, sized_cells in cells.items():
+        width = 2.0 ** (exponent + 1)
+        column, row = int(math.floor(x / width)), int(math.floor(y / width))
+        for cell_row in (row - 1, row, row + 1):
+            for cell_column in (column - 1, column, column + 1):
+                for index in sized_cells.get((cell_column, cell_row), ()):
+                    yield index
+
+
+def _score_corner(corner, first, second):
+    """
+    Checks how well three patterns fit as the corners of a QR code, given which of them is at the right angle
+    :return: The score (lower is better) and the patterns, or None if they don't fit at all
+    :rtype: tuple
+    """
+    first_side = (first.x - corner.x, first.y - corner.y)
+    second_side = (second.x - corner.x, second.y - corner.y)
+    first_len = (first_side[0] ** 2 + first_side[1] ** 2) ** 0.5
+    second_len = (second_side[0] ** 2 + second_side[1] ** 2) ** 0.5
+    module_size = (corner.module_size + first.module_size + second.module_size) / 3
+    # the centers of the patterns are at least 14 blocks apart (in version 1 codes)
+    if min(first_len, second_len) < module_size * 10:
+        return None
+    cosine = abs(first_side[0] * second_side[0] + first_side[1] * second_side[1]) / (first_len * second_len)
+    sides_diff = abs(first_len - second_len) / max(first_len, second_len)
+    if cosine > MAX_CORNER_COSINE or sides_diff > MAX_SIDES_DIFF:
+        return None
+    return cosine + sides_diff, corner, first, second
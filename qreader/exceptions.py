@@ -22,9 +22,26 @@ class QrFormatError(Exception):
 class IllegalQrMessageModeId(QrFormatError):
     def __init__(self, mode_id):
         super(IllegalQrMessageModeId, self).__init__('Unknown mode ID: {0!r:s}'.format(mode_id, ))
+        self.mode_id = mode_id
+
+    def __reduce__(self):  # so it survives being passed between processes
+        return self.__class__, (self.mode_id,)
 
 
 class IllegalQrVersionError(QrFormatError):
     def __init__(self, version):
         super(IllegalQrVersionError, self).__init__(
             'Illegal QR version: {0!r:s} (should be integer between 1-40)'.format(version, ))
+        self.version = version
+
+    def __reduce__(self):
+        return self.__class__, (self.version,)
+
+
+class IllegalQrEciDesignator(QrFormatError):
+    def __init__(self, first_byte):
+        super(IllegalQrEciDesignator, self).__init__('Illegal ECI designator: {0:#010b}'.format(first_byte))
+        self.first_byte = first_byte
+
+    def __reduce__(self):
+        return self.__class__, (self.first_byte,)
@@ -0,0 +1,236 @@
+import numpy
+
+from qreader.spec import get_alignment_centers, size_by_version
+
+__author__ = 'ewino'
+
+# The geometry of a QR code in an image is described by a transform: a 3x3 matrix taking the code's block coordinates
+# (x, y, where block [x, y] spans x..x+1 and y..y+1) to pixel coordinates (where pixel [x, y] spans x..x+1 and y..y+1).
+# Fitting it to the code's patterns keeps the blocks' fractional sizes, rotation and perspective
+
+# the blocks of an alignment pattern: a black center, in a white ring, in a black ring
+ALIGNMENT_PATTERN = numpy.array([
+    [1, 1, 1, 1, 1],
+    [1, 0, 0, 0, 1],
+    [1, 0, 1, 0, 1],
+    [1, 0, 0, 0, 1],
+    [1, 1, 1, 1, 1],
+], dtype=numpy.uint8)
+# the least amount of the alignment pattern's blocks which have to be seen for it to be found
+MIN_ALIGNMENT_MATCHES = 24
+# how far from where it's expected the first alignment pattern is looked for, in blocks. the next ones are looked for
+# in half that distance, as by then their places are known much better
+ALIGNMENT_SEARCH_RADIUS = 4
+# how much the code's size, as counted on its timing patterns, can differ from the size estimated by the distance
+# between its position patterns (relative to the estimate)
+MAX_TIMING_SIZE_DIFF = 0.15
+
+
+def get_transform(blocks, pixels):
+    """
+    Fits the transform taking block coordinates to pixel coordinates, by points whose place in both is known.
+    Three points fit an affine transform (fractional block sizes, rotation and skew), four or more also fit
+    perspective (by least squares, if there are more than four).
+    :param list[tuple[float, float]] blocks: The block coordinates of the points
+    :param list[tuple[float, float]] pixels: The pixel coordinates of the same points
+    :return: The transform, as a 3x3 matrix
+    :rtype: numpy.ndarray
+    """
+    blocks = numpy.asarray(blocks, dtype=numpy.float64)
+    pixels = numpy.asarray(pixels, dtype=numpy.float64)
+    transform = numpy.eye(3)
+    if len(blocks) == 3:
+        sources = numpy.column_stack([blocks, numpy.ones(3)])
+        transform[:2, :] = numpy.linalg.solve(sources, pixels).T
+        return transform
+
+    # x' = (h0*x + h1*y + h2) / (h6*x + h7*y + 1), and the same for y' with h3-h5
+    xs, ys = blocks[:, 0], blocks[:, 1]
+    ones, zeros = numpy.ones(len(blocks)), numpy.zeros(len(blocks))
+    equations = numpy.concatenate([
+        numpy.column_stack([xs, ys, ones, zeros, zeros, zeros, -xs * pixels[:, 0], -ys * pixels[:, 0]]),
+        numpy.column_stack([zeros, zeros, zeros, xs, ys, ones, -xs * pixels[:, 1], -ys * pixels[:, 1]]),
+    ])
+    solution = numpy.linalg.lstsq(equations, numpy.concatenate([pixels[:, 0], pixels[:, 1]]), rcond=None)[0]
+    return numpy.append(solution, 1).reshape(3, 3)
+
+
+def project(transform, xs, ys):
+    """
+    Takes block coordinates to pixel coordinates
+    :param numpy.ndarray transform: The code's transform. See get_transform
+    :param numpy.ndarray|float xs: The blocks' x coordinates
+    :param numpy.ndarray|float ys: The blocks' y coordinates
+    :return: The pixels' x and y coordinates
+    :rtype: tuple[numpy.ndarray, numpy.ndarray]
+    """
+    xs, ys = numpy.asarray(xs, dtype=numpy.float64), numpy.asarray(ys, dtype=numpy.float64)
+    scales = transform[2, 0] * xs + transform[2, 1] * ys + transform[2, 2]
+    return ((transform[0, 0] * xs + transform[0, 1] * ys + transform[0, 2]) / scales,
+            (transform[1, 0] * xs + transform[1, 1] * ys + transform[1, 2]) / scales)
+
+
+def get_block_vectors(transform, x, y):
+    """
+    Returns the pixel offsets of moving one block right and one block down from a given block
+    :param numpy.ndarray transform: The code's transform. See get_transform
+    :param float x: The block's x coordinate
+    :param float y: The block's y coordinate
+    :rtype: tuple[numpy.ndarray, numpy.ndarray]
+    """
+    pixel_xs, pixel_ys = project(transform, [x, x + 1, x], [y, y, y + 1])
+    return (numpy.array([pixel_xs[1] - pixel_xs[0], pixel_ys[1] - pixel_ys[0]]),
+            numpy.array([pixel_xs[2] - pixel_xs[0], pixel_ys[2] - pixel_ys[0]]))
+
+
+def fit_grid(bitmap, finder_patterns, size=None):
+    """
+    Finds the size and the transform of the QR code whose position patterns are given. The transform is first fit to
+    the position patterns, and then refined by every alignment pattern which can be found
+    :param numpy.ndarray bitmap: A height x width array of BLACK/WHITE pixels, indexed by [y, x]
+    :param tuple[qreader.detector.FinderPattern] finder_patterns: The top-left, top-right and bottom-left patterns
+    :param int size: The code's size (in blocks), if it's known (e.g. from its version info). Estimated by default
+    :return: The code's size (in blocks) and transform
+    :rtype: tuple[int, numpy.ndarray]
+    """
+    if size is None:
+        size = estimate_size(bitmap, finder_patterns)
+    blocks = [(3.5, 3.5), (size - 3.5, 3.5), (3.5, size - 3.5)]
+    pixels = [(pattern.x, pattern.y) for pattern in finder_patterns]
+    transform = fit_position_patterns(finder_patterns, size)
+
+    radius = ALIGNMENT_SEARCH_RADIUS
+    # the bottom-right pattern first, as it's the farthest from the position patterns
+    for x, y in sorted(get_alignment_centers((size - 17) // 4), key=lambda center: -sum(center)):
+        found = find_alignment_pattern(bitmap, transform, x + 0.5, y + 0.5, radius)
+        if found:
+            blocks.append((x + 0.5, y + 0.5))
+            pixels.append(found)
+            transform = get_transform(blocks, pixels)
+            radius = ALIGNMENT_SEARCH_RADIUS / 2.0
+    return size, transform
+
+
+def fit_position_patterns(finder_patterns, size):
+    """
+    Fits a transform to the position patterns alone. It's only accurate around them (e.g. for the version info), as
+    it doesn't account for the code's perspective
+    :param tuple[qreader.detector.FinderPattern] finder_patterns: The top-left, top-right and bottom-left patterns
+    :param int size: The code's size, in blocks
+    :rtype: numpy.ndarray
+    """
+    blocks = [(3.5, 3.5), (size - 3.5, 3.5), (3.5, size - 3.5)]
+    return get_transform(blocks, [(pattern.x, pattern.y) for pattern in finder_patterns])
+
+
+def estimate_size(bitmap, finder_patterns):
+    """
+    Estimates the size of a QR code (in blocks) by the distance between its position patterns, and tries to count it
+    exactly on its timing patterns
+    :param numpy.ndarray bitmap: A height x width array of BLACK/WHITE pixels, indexed by [y, x]
+    :param tuple[qreader.detector.FinderPattern] finder_patterns: The top-left, top-right and bottom-left patterns
+    :return: The size of the code (always a legal one)
+    :rtype: int
+    """
+    top_left, top_right, bottom_left = [numpy.array([pattern.x, pattern.y]) for pattern in finder_patterns]
+    distance = (numpy.linalg.norm(top_right - top_left) + numpy.linalg.norm(bottom_left - top_left)) / 2
+    # the patterns' block sizes were measured along the image's rows and columns, which cross the patterns of a rotated
+    # code diagonally (so they're longer than the blocks' actual sides)
+    cosine, sine = numpy.abs(top_right - top_left) / numpy.linalg.norm(top_right - top_left)
+    block_size = sum(pattern.module_size for pattern in finder_patterns) / 3.0 * max(cosine, sine)
+    # the patterns' centers are 3.5 blocks away from the code's edges
+    estimate = distance / block_size + 7
+
+    for start, end, across in ((top_left, top_right, bottom_left), (top_left, bottom_left, top_right)):
+        # the timing patterns run 3 blocks away from the centers of the position patterns
+        offset = (across - top_left) / numpy.linalg.norm(across - top_left) * 3 * block_size
+        runs = _count_runs(bitmap, start + offset, end + offset, block_size)
+        # the line crosses the 7 black blocks at each end as single runs, and every block between them as a run
+        size = runs + 12 if runs else 0
+        if size % 4 == 1 and abs(size - estimate) <= estimate * MAX_TIMING_SIZE_DIFF and 21 <= size <= 177:
+            return size
+    version = int(round((estimate - 17) / 4.0))
+    return size_by_version(min(max(version, 1), 40))
+
+
+def _count_runs(bitmap, start, end, block_size):
+    """
+    Counts the runs of black and white pixels on the line between two points
+    :return: The amount of runs, or 0 if the line doesn't start and end on black pixels
+    :rtype: int
+    """
+    samples_count = int(numpy.linalg.norm(end - start) / block_size * 4) + 1
+    xs = numpy.linspace(start[0], end[0], samples_count)
+    ys = numpy.linspace(start[1], end[1], samples_count)
+    pixels = _get_pixels(bitmap, xs, ys)
+    if not pixels[0] or not pixels[-1]:
+        return 0
+    return int(numpy.count_nonzero(numpy.diff(pixels))) + 1
+
+
+def find_alignment_pattern(bitmap, transform, x, y, radius=ALIGNMENT_SEARCH_RADIUS):
+    """
+    Looks for an alignment pattern around the place the transform expects it to be
+    :param numpy.ndarray bitmap: A height x width array of BLACK/WHITE pixels, indexed by [y, x]
+    :param numpy.ndarray transform: The code's transform as known so far. See get_transform
+    :param float x: The x of the pattern's center, in blocks
+    :param float y: The y of the pattern's center, in blocks
+    :param float radius: How far from where it's expected to look for the pattern, in blocks
+    :return: The x, y of the pattern's center in pixels, or None if it wasn't found
+    :rtype: tuple[float, float]
+    """
+    center_x, center_y = project(transform, x, y)
+    right, down = get_block_vectors(transform, x, y)
+    block_size = max(numpy.linalg.norm(right), numpy.linalg.norm(down))
+    # no need to try every pixel when the blocks are large, but then the pattern's center block is searched again
+    # pixel by pixel, as the center is the middle of all the places the pattern matches at
+    step = max(int(block_size / 4), 1)
+    found = _match_alignment_pattern(bitmap, center_x, center_y, right, down, int(numpy.ceil(radius * block_size)),
+                                     step)
+    if found and step > 1:
+        found = _match_alignment_pattern(bitmap, found[0], found[1], right, down, int(numpy.ceil(block_size)), 1)
+    return found
+
+
+def _match_alignment_pattern(bitmap, center_x, center_y, right, down, reach, step):
+    """
+    Matches an alignment pattern around a point
+    :param numpy.ndarray bitmap: A height x width array of BLACK/WHITE pixels, indexed by [y, x]
+    :param float center_x: The x of the point, in pixels
+    :param float center_y: The y of the point, in pixels
+    :param numpy.ndarray right: The pixel offset of moving one block right
+    :param numpy.ndarray down: The pixel offset of moving one block down
+    :param int reach: How far from the point to try matching the pattern, in pixels
+    :param int step: The distance between the places to try matching the pattern at, in pixels
+    :return: The x, y of the pattern's center in pixels, or None if it doesn't match anywhere
+    :rtype: tuple[float, float]
+    """
+    offsets = numpy.arange(-reach, reach + 1, step)
+    # the candidates are the centers of pixels, so a pattern centered between pixels isn't found half a pixel off
+    candidates_xs, candidates_ys = numpy.meshgrid(numpy.floor(center_x) + 0.5 + offsets,
+                                                  numpy.floor(center_y) + 0.5 + offsets)
+
+    # the centers of the pattern's blocks, around each candidate
+    block_ys, block_xs = numpy.mgrid[-2:3, -2:3]
+    pattern_xs = (block_xs * right[0] + block_ys * down[0]).ravel()
+    pattern_ys = (block_xs * right[1] + block_ys * down[1]).ravel()
+    pixels = _get_pixels(bitmap, candidates_xs[:, :, None] + pattern_xs, candidates_ys[:, :, None] + pattern_ys)
+    matches = (pixels == ALIGNMENT_PATTERN.ravel()).sum(axis=2)
+
+    best = matches.max()
+    if best < MIN_ALIGNMENT_MATCHES:
+        return None
+    # all the candidates near the center fit equally well, so the center is the middle of them
+    best_candidates = matches == best
+    return float(candidates_xs[best_candidates].mean()), float(candidates_ys[best_candidates].mean())
+
+
+def _get_pixels(bitmap, xs, ys):
+    """
+    :return: The bitmap's pixels at the given coordinates. Pixels out of the bitmap are considered white
+    :rtype: numpy.ndarray
+    """
+    height, width = bitmap.shape
+    xs, ys = numpy.floor(xs).astype(numpy.intp), numpy.floor(ys).astype(numpy.intp)
+    inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    return numpy.where(inside, bitmap[numpy.clip(ys, 0, height - 1), numpy.clip(xs, 0, width - 1)], 0)
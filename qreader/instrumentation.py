@@ -0,0 +1,155 @@
+from timeit import default_timer
+
+__author__ = 'ewino'
+
+__all__ = ['ReadStats', 'NO_STATS']
+
+# The stages of reading a code, as timed by ReadStats:
+# 'load' - opening the image and converting it to gray-scale (PIL loads images lazily, so that's when it's decoded)
+# 'binarize' - telling black pixels from white ones
+# 'locate' - finding the code's position patterns (or edges), size and transform
+# 'sample' - telling the color of every block
+# 'format_info' - reading (and correcting) the format info
+# 'data' - reading the data bits and correcting them with their error correction codewords
+# 'decode' - decoding the data to a message (and parsing it)
+# 'total' - the whole read
+STAGES = ('load', 'binarize', 'locate', 'sample', 'format_info', 'data', 'decode', 'total')
+
+
+class ReadStats(object):
+    """
+    Records where the time of reading codes goes: the time spent in each stage (see STAGES), and counters of the work
+    done along the way:
+    'reads' - the reads recorded
+    'pixels_sampled' - the pixels looked at to tell the colors of the blocks
+    'bits_read' - the data bits read from the codes
+    'corrected_format_info' - format info samples which had to be corrected
+    'corrected_codewords' - data codewords corrected by their error correction codewords
+    'mirror_retries' - codes read again mirrored, after reading them as they are failed
+    'hint_misses' - codes which weren't where their hint said, and were looked for from scratch
+    'draft_misses' - images which were read again in full resolution, after reading their draft failed
+    A read which fails tells the stage it failed at, and the exception it failed with.
+    Pass one to qreader.read (and the like) to record a read. It keeps adding up the timings and counters of all the
+    reads it's passed to (so it shouldn't be shared between threads), while the failure is only of the last one
+    """
+
+    enabled = True
+
+    def __init__(self):
+        # the seconds spent in each stage, by its name
+        self.timings = {}
+        # the counters, by name
+        self.counters = {}
+        # the stage the last read failed at and the exception it failed with, or None if it succeeded
+        self.failed_stage = None
+        self.error = None
+
+    def stage(self, name):
+        """
+        :param str name: The stage's name. See STAGES
+        :return: A context manager timing the stage, and recording the failure if it raises
+        """
+        return _Stage(self, name)
+
+    def read(self):
+        """
+        :return: A context manager recording a whole read. Exceptions raised (and handled) by stages inside it are
+            forgotten if the read succeeds after all
+        """
+        return _Read(self)
+
+    def count(self, name, amount=1):
+        """
+        :param str name: The counter's name
+        :param int amount: The amount to add to the counter
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name, seconds):
+        """
+        Records the time a stage took. Can be overridden to export it to a metrics system as well
+        :param str name: The stage's name
+        :param float seconds: The time it took
+        """
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def to_dict(self):
+        """
+        :return: The timings, the counters and the failure (the stage's name and the exception's type name), as
+            simple types (e.g. for JSON)
+        :rtype: dict
+        """
+        return {
+            'timings': dict(self.timings),
+            'counters': dict(self.counters),
+            'failed_stage': self.failed_stage,
+            'error': type(self.error).__name__ if self.error is not None else None,
+        }
+
+
+class _NoStats(object):
+    """ Records nothing, at as little cost as possible. Used when reading without a ReadStats """
+
+    enabled = False
+
+    def stage(self, name):
+        return _NO_STAGE
+
+    def read(self):
+        return _NO_STAGE
+
+    def count(self, name, amount=1):
+        pass
+
+
+class _NoStage(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+class _Stage(object):
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stats.add_time(self.name, default_timer() - self.start)
+        # the innermost stage an exception is raised through is the one it was raised at
+        if exc_type is not None and (exc_val is None or exc_val is not self.stats.error):
+            self.stats.failed_stage = self.name
+            self.stats.error = exc_val if exc_val is not None else exc_type()
+        return False
+
+
+class _Read(_Stage):
+    __slots__ = ()
+
+    def __init__(self, stats):
+        super(_Read, self).__init__(stats, 'total')
+
+    def __enter__(self):
+        self.stats.count('reads')
+        self.stats.failed_stage = None
+        self.stats.error = None
+        return super(_Read, self).__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            # the read recovered from whatever failed along the way (e.g. by reading the code mirrored)
+            self.stats.failed_stage = None
+            self.stats.error = None
+        return super(_Read, self).__exit__(exc_type, exc_val, exc_tb)
+
+
+_NO_STAGE = _NoStage()
+NO_STATS = _NoStats()
@@ -0,0 +1,91 @@
+import importlib
+import re
+import threading
+
+__author__ = 'ewino'
+
+__all__ = ['parse_payload', 'register_parser', 'unregister_parser', 'get_parser']
+
+# Many QR codes hold structured payloads (contacts, WiFi networks, locations, payments...), each starting with a prefix
+# telling its type, e.g. "WIFI:" or "BEGIN:VCARD". A payload's parser is picked by that prefix: the text before the
+# first colon (or line break, for payloads whose first line is the prefix), case-insensitive.
+# A parser is a function receiving the payload's text and returning the parsed payload. If the text turns out not to
+# be what the parser expects (e.g. a "BEGIN:VCALENDAR" for the vCard parser), it raises ValueError and the text is
+# returned as is
+
+# the prefix of a payload. longer prefixes aren't looked for, so a text without one isn't scanned to its end
+_PREFIX_PATTERN = re.compile(r'([^:\r\n]{1,16})[:\r\n]')
+
+# the parsers by their (upper-case) prefix. the built-in parsers are given by the path they're imported from
+# ('module:function'), so only the ones which are used are ever imported
+_parsers = {
+    'BEGIN': 'qreader.vcard:vCard.from_text',
+    'MECARD': 'qreader.payloads.mecard:parse_mecard',
+    'WIFI': 'qreader.payloads.wifi:parse_wifi',
+    'GEO': 'qreader.payloads.geo:parse_geo',
+    'SMSTO': 'qreader.payloads.sms:parse_smsto',
+    'BCD': 'qreader.payloads.epc:parse_epc',
+}
+_parsers_lock = threading.Lock()
+
+
+def parse_payload(text):
+    """
+    Parses a QR code's message by the parser registered for its prefix
+    :param str|unicode text: The message
+    :return: The parsed payload, or the text itself if it has no parser (or the parser rejected it)
+    """
+    match = _PREFIX_PATTERN.match(text)
+    parser = get_parser(match.group(1)) if match else None
+    if parser is None:
+        return text
+    try:
+        return parser(text)
+    except ValueError:
+        return text
+
+
+def get_parser(prefix):
+    """
+    :param str prefix: A payload prefix (case-insensitive)
+    :return: The parser registered for the prefix (imported if needed), or None if there's none
+    """
+    prefix = prefix.upper()
+    parser = _parsers.get(prefix)
+    if parser is None or callable(parser):
+        return parser
+    with _parsers_lock:
+        parser = _parsers.get(prefix)
+        if parser is not None and not callable(parser):
+            parser = _parsers[prefix] = _import_parser(parser)
+        return parser
+
+
+def register_parser(prefix, parser):
+    """
+    Registers a parser for the payloads starting with a prefix, replacing the parser registered for it (if any)
+    :param str prefix: The payload prefix, without the colon (case-insensitive)
+    :param parser: The parser, or the path to import it from ('module:function')
+    """
+    with _parsers_lock:
+        _parsers[prefix.upper()] = parser
+
+
+def unregister_parser(prefix):
+    """
+    Stops parsing the payloads starting with a prefix (they're read as text)
+    :param str prefix: The payload prefix, without the colon (case-insensitive)
+    """
+    with _parsers_lock:
+        _parsers.pop(prefix.upper(), None)
+
+
+def _import_parser(path):
+    """
+    :param str path: The path to a parser: 'module:function' or 'module:Class.method'
+    """
+    module_name, attr_path = path.split(':', 1)
+    parser = importlib.import_module(module_name)
+    for attr in attr_path.split('.'):
+        parser = getattr(parser, attr)
+    return parser
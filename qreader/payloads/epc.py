@@ -0,0 +1,41 @@
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+__author__ = 'ewino'
+
+__all__ = ['EpcPayment', 'parse_epc']
+
+# a SEPA credit transfer by the EPC QR code guidelines (EPC069-12), also known as a "GiroCode". the payload is made of
+# lines: BCD, the version, the character set, SCT, and then the payment's details (the last ones may be left out)
+EpcPayment = namedtuple('EpcPayment', 'version bic name iban currency amount purpose reference text information')
+
+# the lines of the payment's details, from the 5th line on
+_DETAILS_COUNT = 8
+
+
+def parse_epc(text):
+    """
+    :param str|unicode text: The payload, starting with a BCD line
+    :raise ValueError: in case the payload isn't a SEPA credit transfer, or lacks the beneficiary's name or IBAN
+    :rtype: EpcPayment
+    """
+    lines = text.splitlines()
+    if len(lines) < 7 or lines[0] != 'BCD' or lines[3] != 'SCT':
+        raise ValueError('Not an EPC payment payload')
+    version = lines[1]
+    if version not in ('001', '002'):
+        raise ValueError('Unknown EPC payment version: {0:s}'.format(version))
+    bic, name, iban, amount, purpose, reference, remittance_text, information = \
+        [line.strip() or None for line in lines[4:4 + _DETAILS_COUNT]] + [None] * (_DETAILS_COUNT - len(lines[4:]))
+    if not name or not iban or (version == '001' and not bic):
+        raise ValueError('EPC payment lacks its beneficiary')
+
+    currency = None
+    if amount:
+        currency, amount = amount[:3], amount[3:]
+        try:
+            amount = Decimal(amount)
+        except InvalidOperation:
+            raise ValueError('Not a valid EPC payment amount: {0:s}'.format(amount))
+    return EpcPayment(int(version), bic, name, iban.replace(' ', ''), currency, amount, purpose, reference,
+                      remittance_text, information)
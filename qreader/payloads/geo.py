@@ -0,0 +1,32 @@
+from collections import namedtuple
+
+from six.moves.urllib.parse import unquote_plus
+
+__author__ = 'ewino'
+
+__all__ = ['GeoLocation', 'parse_geo']
+
+# a location (RFC 5870), e.g. geo:37.786971,-122.399677 . the altitude is None if not given, and the query is the
+# search text some apps add to it (geo:0,0?q=Eiffel+Tower), or None
+GeoLocation = namedtuple('GeoLocation', 'latitude longitude altitude query')
+
+
+def parse_geo(text):
+    """
+    :param str|unicode text: The payload, starting with geo:
+    :raise ValueError: in case the payload isn't a location
+    :rtype: GeoLocation
+    """
+    if text[:4].lower() != 'geo:':
+        raise ValueError('Not a geo payload')
+    location, _, query = text[4:].strip().partition('?')
+    # the parameters after the coordinates (e.g. ;u=35 for the uncertainty) aren't kept
+    coordinates = [float(coordinate) for coordinate in location.split(';', 1)[0].split(',')]
+    if len(coordinates) not in (2, 3):
+        raise ValueError('Not a valid location: {0:s}'.format(location))
+    search = None
+    for param in query.split('&') if query else ():
+        key, _, value = param.partition('=')
+        if key == 'q':
+            search = unquote_plus(value)
+    return GeoLocation(coordinates[0], coordinates[1], coordinates[2] if len(coordinates) == 3 else None, search)
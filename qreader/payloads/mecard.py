@@ -0,0 +1,117 @@
+import re
+
+__author__ = 'ewino'
+
+__all__ = ['MeCard', 'parse_mecard', 'parse_fields', 'split_escaped', 'unescape']
+
+# MeCard (and the formats based on it, like WIFI:) separate fields with ';', keys from values with ':' and components
+# of values with ','. a backslash escapes any of these (and itself)
+_ESCAPE_PATTERN = re.compile(r'\\(.)')
+
+
+class MeCard(object):
+    """ A contact in the MeCard format, e.g. MECARD:N:Doe,John;TEL:13035551212;EMAIL:john@example.com;; """
+    __slots__ = ('name', 'reading', 'phones', 'videophones', 'emails', 'note', 'bday', 'address', 'urls', 'nickname',
+                 'extras')
+
+    def __init__(self):
+        self.name = None  # the last and first names, if separated by a comma
+        self.reading = None  # the name's pronunciation (SOUND), for names written in kanji
+        self.phones = []
+        self.videophones = []
+        self.emails = []
+        self.note = None
+        self.bday = None  # as written (YYYYMMDD)
+        self.address = None  # PO box, room, street, city, state, zip code and country (if separated by commas)
+        self.urls = []
+        self.nickname = None
+        # the fields this implementation doesn't support, by key. each has a list of values
+        self.extras = {}
+
+
+# the MeCard fields by key: the card's field, whether it has several values, and whether it's split to components
+_FIELDS = {
+    'N': ('name', False, True),
+    'SOUND': ('reading', False, True),
+    'TEL': ('phones', True, False),
+    'TEL-AV': ('videophones', True, False),
+    'EMAIL': ('emails', True, False),
+    'NOTE': ('note', False, False),
+    'BDAY': ('bday', False, False),
+    'ADR': ('address', False, True),
+    'URL': ('urls', True, False),
+    'NICKNAME': ('nickname', False, False),
+}
+
+
+def parse_mecard(text):
+    """
+    :param str|unicode text: The payload, starting with MECARD:
+    :raise ValueError: in case the payload isn't a MeCard
+    :rtype: MeCard
+    """
+    card = MeCard()
+    for key, value in parse_fields(text, 'MECARD'):
+        field, is_list, has_components = _FIELDS.get(key, (None, True, False))
+        components = [unescape(component) for component in split_escaped(value, ',')]
+        value = tuple(components) if has_components and len(components) > 1 else unescape(value)
+        if field is None:
+            card.extras.setdefault(key, []).append(value)
+        elif is_list:
+            getattr(card, field).append(value)
+        else:
+            setattr(card, field, value)
+    return card
+
+
+def parse_fields(text, prefix):
+    """
+    Splits a MeCard-like payload (e.g. MECARD:N:Doe,John;TEL:123;;) to its fields
+    :param str|unicode text: The payload
+    :param str prefix: The payload's prefix, without the colon (case-insensitive)
+    :raise ValueError: in case the payload doesn't start with the prefix, or a field has no key
+    :return: The (key, value) of each field, in order. The values are still escaped, so they can be split further
+    :rtype: list[tuple[str, str]]
+    """
+    if text[:len(prefix) + 1].upper() != prefix.upper() + ':':
+        raise ValueError('Not a {0:s} payload'.format(prefix))
+    fields = []
+    for field in split_escaped(text[len(prefix) + 1:].rstrip('\r\n'), ';'):
+        if not field:
+            continue  # the payload ends with an empty field
+        key_value = split_escaped(field, ':', 1)
+        if len(key_value) != 2:
+            raise ValueError('Not a valid {0:s} field: {1:s}'.format(prefix, field))
+        fields.append((key_value[0].upper(), key_value[1]))
+    return fields
+
+
+def split_escaped(text, separator, max_splits=-1):
+    """
+    Splits a text by a separator, except where it's escaped by a backslash. The parts are kept escaped
+    :param str|unicode text: The text
+    :param str separator: A single character
+    :param int max_splits: The maximal amount of splits to do, or -1 for no limit
+    :rtype: list[str|unicode]
+    """
+    parts = []
+    start = 0
+    escaped = False
+    for i, char in enumerate(text):
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == separator and max_splits != len(parts):
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def unescape(text):
+    """
+    :param str|unicode text: A value with escaped characters
+    :rtype: str|unicode
+    """
+    return _ESCAPE_PATTERN.sub(r'\1', text)
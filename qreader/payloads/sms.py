@@ -0,0 +1,23 @@
+from collections import namedtuple
+
+__author__ = 'ewino'
+
+__all__ = ['SmsMessage', 'parse_smsto']
+
+# a text message to send, e.g. SMSTO:+15551234567:See you soon . the message is empty if not given
+SmsMessage = namedtuple('SmsMessage', 'number message')
+
+
+def parse_smsto(text):
+    """
+    :param str|unicode text: The payload, starting with SMSTO:
+    :raise ValueError: in case the payload isn't a text message, or has no number
+    :rtype: SmsMessage
+    """
+    if text[:6].upper() != 'SMSTO:':
+        raise ValueError('Not an SMSTO payload')
+    # the message may hold colons of its own
+    number, _, message = text[6:].partition(':')
+    if not number.strip():
+        raise ValueError('Text message has no number')
+    return SmsMessage(number.strip(), message)
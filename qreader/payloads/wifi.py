@@ -0,0 +1,26 @@
+from collections import namedtuple
+
+from qreader.payloads.mecard import parse_fields, unescape
+
+__author__ = 'ewino'
+
+__all__ = ['WifiNetwork', 'parse_wifi']
+
+# a WiFi network's login details, e.g. WIFI:T:WPA;S:mynetwork;P:mypass;; . the security is WEP, WPA (or any of its
+# variants) or None for an open network
+WifiNetwork = namedtuple('WifiNetwork', 'ssid password security hidden')
+
+
+def parse_wifi(text):
+    """
+    :param str|unicode text: The payload, starting with WIFI:
+    :raise ValueError: in case the payload isn't a WiFi network, or has no SSID
+    :rtype: WifiNetwork
+    """
+    fields = dict((key, unescape(value)) for key, value in parse_fields(text, 'WIFI'))
+    if not fields.get('S'):
+        raise ValueError('WiFi network has no SSID')
+    security = fields.get('T') or None
+    if security and security.lower() == 'nopass':
+        security = None
+    return WifiNetwork(fields['S'], fields.get('P') or None, security, fields.get('H', '').lower() == 'true')
@@ -1,21 +1,123 @@
-from collections import Iterator
+import copy
+import math
+import threading
+from six.moves.collections_abc import Iterator
+
+import numpy
 
 from qreader import tuples
-from qreader.exceptions import QrImageRecognitionException
-from qreader.spec import get_mask_func, FORMAT_INFO_MASK, get_dead_zones, ec_level_from_format_info_code
-from qreader.validation import validate_format_info, validate_data
+from qreader.binarization import global_threshold, get_integral_image
+from qreader.bitstream import BitStream
+from qreader.detector import find_finder_patterns, group_finder_patterns, get_code_region
+from qreader.exceptions import QrImageRecognitionException, QrCorruptError, QrReadingException, \
+    IllegalQrVersionError
+from qreader.instrumentation import NO_STATS
+from qreader.geometry import fit_grid, fit_position_patterns, estimate_size, project, get_block_vectors, \
+    MAX_TIMING_SIZE_DIFF
+from qreader.spec import get_mask_func, FORMAT_INFO_MASK, get_dead_zones, ec_level_from_format_info_code, \
+    size_by_version, MIN_VERSION_INFO_VERSION
+from qreader.validation import validate_format_info, validate_data, validate_version_info, format_info_check
 
 __author__ = 'ewino'
 
 WHITE = 0
 BLACK = 1
 
+# How to tell the color of a block:
+# 'corner' - by the pixel at its top-left corner. The fastest, but a single stray pixel can flip the block
+# 'center' - by the majority of the pixels around its center. Holds up to blurred and compressed (e.g. JPEG) images
+SAMPLING_MODES = ('corner', 'center')
+# the part of the block's width (and height), around its center, whose pixels vote on its color
+CENTER_SAMPLE_RATIO = 0.5
+
+# the data blocks' positions by version. see get_data_positions
+_data_positions = {}
+# the data blocks' mask bits by version and mask ID. see get_data_mask
+_data_masks = {}
+# codes can be read in several threads at once, so the caches are filled under a lock (reentrant, as filling the masks
+# cache fills the positions cache too). reading them doesn't need it, as an entry is only added once it's complete
+_caches_lock = threading.RLock()
+
+
+def get_data_positions(version):
+    """
+    Returns the coordinates of the data blocks in a QR code of the given version, in the order they should be read.
+    The placement only depends on the version, so it's calculated once per version and cached.
+    :param int version: The QR version (1-40)
+    :return: Two read-only arrays, of the x and the y coordinates of the data blocks
+    :rtype: tuple[numpy.ndarray, numpy.ndarray]
+    """
+    if version not in _data_positions:
+        with _caches_lock:
+            if version not in _data_positions:
+                positions = numpy.array(list(QrZigZagIterator(size_by_version(version), get_dead_zones(version))))
+                xs, ys = positions[:, 0].copy(), positions[:, 1].copy()
+                xs.flags.writeable = False
+                ys.flags.writeable = False
+                _data_positions[version] = xs, ys
+    return _data_positions[version]
+
+
+def get_data_mask(version, mask_id):
+    """
+    Returns the mask bits of the data blocks in a QR code of the given version, in the order of get_data_positions.
+    Calculated once per version and mask ID and cached, so unmasking the data is a single XOR.
+    :param int version: The QR version (1-40)
+    :param int mask_id: The mask ID (0-7)
+    :return: A read-only array of the mask bits (0 or 1)
+    :rtype: numpy.ndarray
+    """
+    key = (version, mask_id)
+    if key not in _data_masks:
+        with _caches_lock:
+            if key not in _data_masks:
+                xs, ys = get_data_positions(version)
+                mask = get_mask_func(mask_id)(ys, xs).astype(numpy.uint8)
+                mask.flags.writeable = False
+                _data_masks[key] = mask
+    return _data_masks[key]
+
+
+def get_version_info_positions(size):
+    """
+    Returns the coordinates of the blocks of the version info, which codes of version 7 and up have two copies of: to
+    the left of the top-right position pattern, and above the bottom-left one (the same blocks, transposed)
+    :param int size: The code's size, in blocks
+    :return: The x and the y coordinates of the 18 blocks of the top-right copy, from its least significant bit,
+        followed by the 18 of the bottom-left copy
+    :rtype: tuple[numpy.ndarray, numpy.ndarray]
+    """
+    bits = numpy.arange(18)
+    near_edge, along_edge = bits // 3, bits % 3 + size - 11
+    return numpy.concatenate([along_edge, near_edge]), numpy.concatenate([near_edge, along_edge])
+
+
+def _decode_version_info(bits, both_copies=False):
+    """
+    :param numpy.ndarray bits: The bits of the blocks at get_version_info_positions
+    :param bool both_copies: Whether both copies must be read, and tell the same version
+    :return: The version, or None if the copies are too corrupt to read (or disagree)
+    :rtype: int
+    """
+    weights = 1 << numpy.arange(18)
+    samples = int(numpy.dot(bits[:18], weights)), int(numpy.dot(bits[18:], weights))
+    try:
+        if both_copies:
+            first, second = [validate_version_info(sample) for sample in samples]
+            return first if first == second else None
+        return validate_version_info(*samples)
+    except QrCorruptError:
+        return None
+
 
 class Scanner(object):
-    def __init__(self):
-        self._current_index = -1
-        self._data_len = 0
+    def __init__(self, stats=None):
+        """
+        :param qreader.instrumentation.ReadStats stats: Records the time spent reading the code, and the work done
+        """
+        self.stats = stats if stats is not None else NO_STATS
         self._info = None
+        self._stream = None
         self.data = None
         self._was_read = False
 
@@ -28,12 +130,27 @@ class Scanner(object):
             self.read()
         return self._info
 
+    @property
+    def stream(self):
+        """ The bit stream of the QR code's data codewords. Reads the code on access if needed.
+        :rtype: qreader.bitstream.BitStream
+        """
+        if not self._was_read:
+            self.read()
+        return self._stream
+
     def read(self):
         self._was_read = True
-        self.read_info()
-        self.data = validate_data(self._read_all_data(), self.info.version, self.info.error_correction_level)
-        self._data_len = len(self.data)
-        self.reset()
+        if self._info is None:
+            self.read_info()
+        self._read_data()
+
+    def _read_data(self):
+        with self.stats.stage('data'):
+            bits = self._read_all_data()
+            self.stats.count('bits_read', len(bits))
+            self.data = bytes(validate_data(bits, self.info.version, self.info.error_correction_level, self.stats))
+        self._stream = BitStream(self.data)
 
     def read_info(self):
         raise NotImplementedError()
@@ -44,25 +161,18 @@ class Scanner(object):
     # Iteration methods #
 
     def reset(self):
-        self._current_index = -1
+        self.stream.reset()
 
     def read_bit(self):
-        if not self._was_read:
-            self.read()
-        self._current_index += 1
-        if self._current_index >= self._data_len:
-            self._current_index = self._data_len
+        if not self.stream.remaining:
             raise StopIteration()
-        return self.data[self._current_index]
+        return self.stream.read_int(1)
 
     def read_int(self, amount_of_bits):
-        if not self._was_read:
-            self.read()
-        val = 0
-        bits = [self.read_bit() for _ in range(amount_of_bits)]
-        for bit in bits:
-            val = (val << 1) + bit
-        return val
+        return self.stream.read_int(amount_of_bits)
+
+    def read_bytes(self, amount):
+        return self.stream.read_bytes(amount)
 
     def __iter__(self):
         while True:
@@ -72,37 +182,347 @@ class Scanner(object):
                 return
 
 
-class ImageScanner(Scanner):
-    def __init__(self, image):
+class MatrixScanner(Scanner):
+    def __init__(self, matrix, stats=None):
         """
-        :type image: PIL.Image.Image
-        :return:
+        Reads a code whose blocks were already told apart (e.g. by another detector)
+        :param numpy.ndarray|list matrix: A size x size matrix of the code's blocks, indexed by [y, x], with BLACK for
+            black blocks and WHITE for white ones (or True and False). Arrays of these types aren't copied
+        :param qreader.instrumentation.ReadStats stats: Records the time spent reading the code, and the work done
         """
-        super(ImageScanner, self).__init__()
-        self.image = image.convert('LA')  # gray-scale it baby!
+        super(MatrixScanner, self).__init__(stats)
+        self.grid = _to_bits(numpy.asarray(matrix))
+        if self.grid.ndim != 2 or self.grid.shape[0] != self.grid.shape[1]:
+            raise ValueError('The matrix should be square, not {0!r}'.format(self.grid.shape))
         self.mask = None
 
+    def read_info(self):
+        size = self.grid.shape[0]
+        if size < 21 or size > 177 or (size - 17) % 4:
+            raise IllegalQrVersionError((size - 17) / 4.0)
+        info = QRCodeInfo()
+        info.size = size
+        info.version = (size - 17) // 4
+        info.canvas = (0, 0, size - 1, size - 1)
+        info.block_size = (1.0, 1.0)
+        self._info = info
+        try:
+            if info.version >= MIN_VERSION_INFO_VERSION:
+                xs, ys = get_version_info_positions(size)
+                version = _decode_version_info(self.grid[ys, xs])
+                if version is not None and version != info.version:
+                    raise QrCorruptError("The code's version info ({0:d}) doesn't match its size ({1:d})".format(
+                        version, size))
+            self._read_grid_info()
+        except Exception:
+            # the info wasn't read after all
+            self._info = None
+            raise
+        return info
+
+    def _read_grid_info(self):
+        """ Reads the format info and the mask from the sampled grid, reading the code mirrored if it has to """
+        try:
+            self._read_format_info()
+        except QrCorruptError:
+            self.stats.count('mirror_retries')
+            self._mirror()
+            self._read_format_info()
+        self.mask = self.get_mask()
+
+    def read(self):
+        try:
+            super(MatrixScanner, self).read()
+        except QrCorruptError as e:
+            if self._info is None:
+                raise
+            # the format info of a mirrored code can pass for a valid one (or the other way around), but its data won't
+            self.stats.count('mirror_retries')
+            try:
+                self._mirror()
+                self._read_format_info()
+                self.mask = self.get_mask()
+                self._read_data()
+            except QrCorruptError:
+                raise e
+
+    def _mirror(self):
+        """
+        Switches between reading the code as is and reading it mirrored. A code seen from behind (e.g. through glass)
+        has its position patterns in the same corners, but its blocks are transposed. Transposing the grid's indexes
+        doesn't copy anything
+        """
+        self.grid = self.grid.T
+        self._info.mirrored = not self._info.mirrored
+
     def get_mask(self):
-        mask_func = get_mask_func(self.info.mask_id)
-        return {(x, y): 1 if mask_func(y, x) else 0 for x in range(self.info.size) for y in range(self.info.size)}
-    
+        return get_data_mask(self._info.version, self._info.mask_id)
+
+    def _read_format_info(self):
+        with self.stats.stage('format_info'):
+            source_1 = (self._get_straight_bits((8, -7), 7, 'd') << 8) + self._get_straight_bits((-1, 8), 8, 'l')
+            source_2 = (self._get_straight_bits((7, 8), 8, 'l', (1,)) << 8) + \
+                self._get_straight_bits((8, 0), 9, 'd', (6,))
+            samples = source_1 ^ FORMAT_INFO_MASK, source_2 ^ FORMAT_INFO_MASK
+            if self.stats.enabled:
+                self.stats.count('corrected_format_info', sum(1 for sample in samples if format_info_check(sample)))
+            format_info = validate_format_info(*samples)
+        self._info.error_correction_level = ec_level_from_format_info_code(format_info >> 3)
+        self._info.mask_id = format_info & 0b111
+
+    def _read_all_data(self):
+        xs, ys = get_data_positions(self._info.version)
+        return (self.grid[ys, xs] ^ self.mask).tolist()
+
+    def _get_bit(self, coords):
+        x, y = coords
+        # negative coordinates are counted from the bottom/right edge, just like the grid's indexing
+        return int(self.grid[y, x])
+
+    def _get_straight_bits(self, start, length, direction, skip=()):
+        """
+        Reads several bits from the specified coordinates
+        :param tuple[int] start: The x, y of the start position
+        :param int length: the amount of bits to read
+        :param str direction: d(own) or l(eft)
+        :param tuple skip: the indexes to skip. they will still be counted on for the length
+        :return: The bits read as an integer
+        :rtype: int
+        """
+        result = 0
+        counted = 0
+        step = (0, 1) if direction == 'd' else (-1, 0)
+        for i in range(length):
+            if i in skip:
+                start = tuples.add(start, step)
+                continue
+            result += self._get_bit(start) << counted
+            counted += 1
+            start = tuples.add(start, step)
+        return result
+
+
+class ArrayScanner(MatrixScanner):
+    def __init__(self, array, shape=None, region=None, binarizer=global_threshold, sampling='center', hint=None,
+                 stats=None):
+        """
+        Reads a code from an image's pixels, without copying them where possible
+        :param array: The image's pixels, indexed by [y, x]: a numpy array, or any object supporting the buffer protocol
+            (e.g. a memoryview, or bytes along with their shape). Either gray-scale shades (0-255), RGB or RGBA pixels
+            (which are converted to gray-scale), or, if there's no binarizer, BLACK/WHITE pixels (or True/False)
+        :param tuple[int, int] shape: The height and width of the image, for flat buffers (e.g. bytes)
+        :param tuple[int, int, int, int] region: The left, top, right and bottom pixels of the part of the image
+            containing the QR code. Defaults to the whole image
+        :param binarizer: The function telling black pixels from white ones (see qreader.binarization), or None if the
+            pixels are already black and white
+        :param str sampling: How to tell the color of each block. One of SAMPLING_MODES
+        :param QRCodeInfo hint: The info of a code read from a similar image (e.g. the previous frame of a video). The
+            code is first read where the hint says it is, and only looked for if it can't be read there
+        :param qreader.instrumentation.ReadStats stats: Records the time spent reading the code, and the work done
+        """
+        Scanner.__init__(self, stats)
+        if sampling not in SAMPLING_MODES:
+            raise ValueError('Unknown sampling mode {0!r} (expected one of {1:s})'.format(
+                sampling, ', '.join(SAMPLING_MODES)))
+        self.binarizer = binarizer
+        self.sampling = sampling
+        with self.stats.stage('binarize'):
+            self.bitmap = self._get_bitmap(_to_array(array, shape))
+        self._integral = None
+        self.region = (0, 0, self.bitmap.shape[1] - 1, self.bitmap.shape[0] - 1)
+        if region:
+            self.region = self._clip_region(region)
+        self.grid = None
+        self.mask = None
+        self.hint = hint
+        self._finder_patterns = None
+
+    def _get_bitmap(self, pixels):
+        """
+        Converts the pixels to an array of BLACK/WHITE pixels, so they won't have to be queried one by one
+        :param numpy.ndarray pixels: The image's pixels, indexed by [y, x]
+        :return: A height x width array of the image's pixels, indexed by [y, x]
+        :rtype: numpy.ndarray
+        """
+        if pixels.ndim == 3:
+            pixels = _to_shades(pixels)
+        elif pixels.ndim != 2:
+            raise ValueError('Expected a height x width (x channels) array of pixels, got {0:d} dimensions'.format(
+                pixels.ndim))
+        if self.binarizer is None:
+            return _to_bits(pixels)
+        return self.binarizer(pixels)
+
+    def _clip_region(self, region):
+        height, width = self.bitmap.shape
+        left, top, right, bottom = region
+        return max(left, 0), max(top, 0), min(right, width - 1), min(bottom, height - 1)
+
+    def find_codes(self):
+        """
+        Finds all the QR codes in the scanned region by their position patterns
+        :return: A scanner for each code found, in reading order, all sharing this scanner's bitmap. If none were found,
+            just this scanner (which expects a single code filling its region)
+        :rtype: list[ArrayScanner]
+        """
+        left, top, right, bottom = self.region
+        patterns = [pattern._replace(x=pattern.x + left, y=pattern.y + top)
+                    for pattern in find_finder_patterns(self.bitmap[top:bottom + 1, left:right + 1])]
+        codes = [(self._clip_region(get_code_region(triple)), triple) for triple in group_finder_patterns(patterns)]
+        codes.sort(key=lambda code: (code[0][1], code[0][0]))
+        if not codes:
+            return [self]
+        return [self._for_region(region, triple) for region, triple in codes]
+
+    def _for_region(self, region, finder_patterns=None):
+        scanner = copy.copy(self)
+        Scanner.__init__(scanner, self.stats)
+        scanner.region = region
+        scanner.grid = None
+        scanner.mask = None
+        scanner.hint = None
+        scanner._finder_patterns = finder_patterns
+        return scanner
+
     def read_info(self):
+        if self.hint is not None:
+            try:
+                return self._read_info(self.hint.size, self.hint.transform, self.hint.mirrored)
+            except QrReadingException:
+                # the code has moved (or changed) too much since the hint was taken
+                self.stats.count('hint_misses')
+                self.hint = None
+        with self.stats.stage('locate'):
+            size, transform = self._fit_grid()
+        return self._read_info(size, transform)
+
+    def _read_info(self, size, transform, mirrored=False):
+        """
+        Reads the code's meta info, given its geometry
+        :param int size: The code's size, in blocks
+        :param numpy.ndarray transform: The code's transform. See qreader.geometry
+        :param bool mirrored: Whether the transform is of the code seen mirrored
+        :rtype: QRCodeInfo
+        """
         info = QRCodeInfo()
-        info.canvas = self.get_image_borders()
-        info.block_size = self.get_block_size(info.canvas[:2])
-        info.size = int((info.canvas[2] - (info.canvas[0]) + 1) / info.block_size[0])
+        info.size, info.transform, info.mirrored = size, transform, mirrored
         info.version = (info.size - 17) // 4
+        # the bounding box of the code's corners, and the size of the blocks at its center
+        xs, ys = project(transform, [0, size, 0, size], [0, 0, size, size])
+        info.canvas = (int(numpy.rint(xs.min())), int(numpy.rint(ys.min())),
+                       int(numpy.rint(xs.max())) - 1, int(numpy.rint(ys.max())) - 1)
+        info.block_size = tuple(float(numpy.linalg.norm(vector))
+                                for vector in get_block_vectors(transform, size / 2.0, size / 2.0))
         self._info = info
-        self._read_format_info()
-        self.mask = self.get_mask()
+        try:
+            self.grid = self._sample_grid()
+            info.rotation = self._get_rotation()
+            self._read_grid_info()
+        except Exception:
+            # the info wasn't read after all
+            self._info = None
+            raise
         return info
-    
-    def _get_pixel(self, coords):
+
+    def read(self):
         try:
-            shade, alpha = self.image.getpixel(coords)
-            return BLACK if shade < 128 and alpha > 0 else WHITE
-        except IndexError:
-            return WHITE
+            super(ArrayScanner, self).read()
+        except QrCorruptError:
+            if self._info is None or self.hint is None:
+                raise
+            # the code has changed since the hint was taken, so it's looked for from scratch
+            self.stats.count('hint_misses')
+            self.hint = None
+            self._info = None
+            return self.read()
+
+    def _mirror(self):
+        super(ArrayScanner, self)._mirror()
+        # the transform's indexes are transposed along with the grid's
+        self._info.transform = self._info.transform[:, [1, 0, 2]]
+        self._info.rotation = self._get_rotation()
+
+    def _get_rotation(self):
+        """
+        :return: The angle of the code's rows, in degrees clockwise from the image's rows
+        :rtype: float
+        """
+        right = get_block_vectors(self._info.transform, self._info.size / 2.0, self._info.size / 2.0)[0]
+        return math.degrees(math.atan2(right[1], right[0])) % 360
+
+    def _fit_grid(self):
+        """
+        Finds the code's size and its transform (see qreader.geometry) by its position and alignment patterns.
+        If the position patterns can't be found, falls back to looking for the code's edges from the region's corners
+        :return: The code's size (in blocks) and transform
+        :rtype: tuple[int, numpy.ndarray]
+        """
+        left, top, right, bottom = self.region
+        finder_patterns = self._finder_patterns
+        if not finder_patterns:
+            patterns = find_finder_patterns(self.bitmap[top:bottom + 1, left:right + 1])
+            triples = group_finder_patterns(patterns)
+            finder_patterns = [pattern._replace(x=pattern.x + left, y=pattern.y + top)
+                               for pattern in triples[0]] if triples else None
+        if finder_patterns:
+            region_bitmap = self.bitmap[top:bottom + 1, left:right + 1]
+            region_patterns = [pattern._replace(x=pattern.x - left, y=pattern.y - top) for pattern in finder_patterns]
+            # the transform was fit in the region's pixels
+            to_image = numpy.array([[1, 0, left], [0, 1, top], [0, 0, 1]])
+            size = self._check_size(estimate_size(region_bitmap, region_patterns), finder_patterns)
+            size, transform = fit_grid(region_bitmap, region_patterns, size)
+            return size, numpy.dot(to_image, transform)
+
+        canvas = self.get_image_borders()
+        block_width, block_height = self.get_block_size(canvas[:2])
+        if not block_width or not block_height:
+            raise QrImageRecognitionException("Couldn't find the size of the blocks")
+        size = int((canvas[2] - canvas[0] + 1) / block_width)
+        width, height = canvas[2] - canvas[0] + 1, canvas[3] - canvas[1] + 1
+        return size, numpy.array([[float(width) / size, 0, canvas[0]], [0, float(height) / size, canvas[1]], [0, 0, 1]])
+
+    def _check_size(self, size, finder_patterns):
+        """
+        Cross-checks the code's estimated size with its version info (which codes of version 7 and up have). A wrong
+        size puts the version info blocks in the wrong place, so the sizes around the estimate are checked in turn, and
+        the first whose version info tells that very size is taken
+        :param int size: The code's size, as estimated by its position patterns
+        :param list[qreader.detector.FinderPattern] finder_patterns: The top-left, top-right and bottom-left patterns
+        :return: The code's size. The estimate, if none of the sizes is confirmed by the version info
+        :rtype: int
+        """
+        for candidate in (size, size - 4, size + 4):
+            if candidate > size_by_version(40) or abs(candidate - size) > size * MAX_TIMING_SIZE_DIFF:
+                continue
+            # other sizes than the estimate need both version info copies to agree, or random blocks could pass for one
+            version = self._read_version_info(candidate, fit_position_patterns(finder_patterns, candidate),
+                                              both_copies=candidate != size)
+            if version is not None and size_by_version(version) == candidate:
+                return candidate
+        return size
+
+    def _read_version_info(self, size, transform, both_copies=False):
+        """
+        Reads the version from the code's version info blocks. They're next to the top-right and bottom-left position
+        patterns, so a transform fit to the patterns alone finds them
+        :param int size: The code's size, in blocks
+        :param numpy.ndarray transform: The transform fit to the position patterns for that size
+        :param bool both_copies: Whether both copies of the version info must be read (and agree), or just one
+        :return: The version, or None if the code is too small to have version info, or it's too corrupt to read
+        :rtype: int
+        """
+        if size < size_by_version(MIN_VERSION_INFO_VERSION):
+            return None
+        block_size = tuple(float(numpy.linalg.norm(vector)) for vector in get_block_vectors(transform, size - 10, 3))
+        xs, ys = get_version_info_positions(size)
+        return _decode_version_info(self._sample_blocks(transform, block_size, xs, ys), both_copies)
+
+    def _get_pixel(self, coords):
+        x, y = coords
+        left, top, right, bottom = self.region
+        if left <= x <= right and top <= y <= bottom:
+            return int(self.bitmap[y, x])
+        return WHITE
 
     def get_image_borders(self):
         def get_corner_pixel(canvas_corner, vector, max_distance):
@@ -115,10 +535,11 @@ class ImageScanner(Scanner):
                 "Couldn't find one of the edges ({0:s}-{1:s})".format(('top', 'bottom')[vector[1] == -1],
                                                                       ('left', 'right')[vector[0] == -1]))
 
-        max_dist = min(self.image.width, self.image.height)
-        min_x, min_y = get_corner_pixel((0, 0), (1, 1), max_dist)
-        max_x, max_x_y = get_corner_pixel((self.image.width - 1, 0), (-1, 1), max_dist)
-        max_y_x, max_y = get_corner_pixel((0, self.image.height - 1), (1, -1), max_dist)
+        left, top, right, bottom = self.region
+        max_dist = min(right - left, bottom - top) + 1
+        min_x, min_y = get_corner_pixel((left, top), (1, 1), max_dist)
+        max_x, max_x_y = get_corner_pixel((right, top), (-1, 1), max_dist)
+        max_y_x, max_y = get_corner_pixel((left, bottom), (1, -1), max_dist)
         if max_x_y != min_y:
             raise QrImageRecognitionException('Top-left position pattern not aligned with the top-right one')
         if max_y_x != min_x:
@@ -135,58 +556,145 @@ class ImageScanner(Scanner):
         pattern_size = 7
 
         left, top = img_start
+        right, bottom = self.region[2:]
         block_height, block_width = None, None
-        for i in range(1, (self.image.width - left) // pattern_size):
+        for i in range(1, (right + 1 - left) // pattern_size):
             if self._get_pixel((left + i * pattern_size, top)) == WHITE:
                 block_width = i
                 break
-        for i in range(1, (self.image.height - top) // pattern_size):
+        for i in range(1, (bottom + 1 - top) // pattern_size):
             if self._get_pixel((left, top + i * pattern_size)) == WHITE:
                 block_height = i
                 break
         return block_width, block_height
 
-    def _read_format_info(self):
-        source_1 = (self._get_straight_bits((8, -7), 7, 'd') << 8) + self._get_straight_bits((-1, 8), 8, 'l')
-        source_2 = (self._get_straight_bits((7, 8), 8, 'l', (1,)) << 8) + self._get_straight_bits((8, 0), 9, 'd', (6,))
-
-        format_info = validate_format_info(source_1 ^ FORMAT_INFO_MASK, source_2 ^ FORMAT_INFO_MASK)
-        self.info.error_correction_level = ec_level_from_format_info_code(format_info >> 3)
-        self.info.mask_id = format_info & 0b111
-
-    def _read_all_data(self):
-        pos_iterator = QrZigZagIterator(self.info.size, get_dead_zones(self.info.version))
-        return [self._get_bit(pos) ^ self.mask[pos] for pos in pos_iterator]
-
-    def _get_bit(self, coords):
-        x, y = coords
-        if x < 0:
-            x += self.info.size
-        if y < 0:
-            y += self.info.size
-        return self._get_pixel(tuples.add(self.info.canvas[:2], tuples.multiply((x, y), self.info.block_size)))
+    def _sample_grid(self):
+        """
+        Samples the pixels of all the blocks from the bitmap at once.
+        :return: A size x size array of the blocks' bits, indexed by [y, x]
+        :rtype: numpy.ndarray
+        """
+        with self.stats.stage('sample'):
+            xs, ys = numpy.meshgrid(numpy.arange(self._info.size), numpy.arange(self._info.size))
+            return self._sample_blocks(self._info.transform, self._info.block_size, xs, ys)
 
-    def _get_straight_bits(self, start, length, direction, skip=()):
+    def _sample_blocks(self, transform, block_size, xs, ys):
         """
-        Reads several bits from the specified coordinates
-        :param tuple[int] start: The x, y of the start position
-        :param int length: the amount of bits to read
-        :param str direction: d(own) or l(eft)
-        :param tuple skip: the indexes to skip. they will still be counted on for the length
-        :return: The bits read as an integer
-        :rtype: int
+        Samples the pixels of the given blocks from the bitmap at once (see SAMPLING_MODES).
+        Blocks falling outside of the scanned region are considered white.
+        :param numpy.ndarray transform: The code's transform. See qreader.geometry
+        :param tuple[float, float] block_size: The width and height of the blocks, in pixels
+        :param numpy.ndarray xs: The blocks' x coordinates
+        :param numpy.ndarray ys: The blocks' y coordinates
+        :return: The blocks' bits, in the shape of their coordinates
+        :rtype: numpy.ndarray
         """
-        result = 0
-        counted = 0
-        step = (0, 1) if direction == 'd' else (-1, 0)
-        for i in range(length):
-            if i in skip:
-                start = tuples.add(start, step)
-                continue
-            result += self._get_bit(start) << counted
-            counted += 1
-            start = tuples.add(start, step)
-        return result
+        if self.sampling == 'corner':
+            return self._sample_corners(transform, xs, ys)
+        return self._sample_centers(transform, block_size, xs, ys)
+
+    def _sample_corners(self, transform, xs, ys):
+        left, top, right, bottom = self.region
+        # the first pixel starting in the block (the corner itself, if it falls between pixels)
+        xs, ys = [numpy.rint(coords).astype(numpy.intp) for coords in project(transform, xs, ys)]
+        grid = self.bitmap[numpy.clip(ys, top, bottom), numpy.clip(xs, left, right)]
+        inside = (left <= xs) & (xs <= right) & (top <= ys) & (ys <= bottom)
+        self.stats.count('pixels_sampled', xs.size)
+        return numpy.where(inside, grid, WHITE).astype(numpy.uint8)
+
+    def _sample_centers(self, transform, block_size, xs, ys):
+        """
+        Counts the black pixels in a box around every block's center (sized by CENTER_SAMPLE_RATIO) using the bitmap's
+        integral image, so all the boxes are counted at once, whatever their size.
+        """
+        if self._integral is None:
+            self._integral = get_integral_image(self.bitmap)
+        left, top, right, bottom = self.region
+        centers_x, centers_y = project(transform, xs + 0.5, ys + 0.5)
+        half_width, half_height = numpy.asarray(block_size, dtype=numpy.float64) * CENTER_SAMPLE_RATIO / 2
+        # the boxes' first pixels and the ones right after them. a box has at least one pixel, even for tiny blocks
+        starts_x, ends_x = numpy.floor(centers_x - half_width), numpy.floor(centers_x + half_width) + 1
+        starts_y, ends_y = numpy.floor(centers_y - half_height), numpy.floor(centers_y + half_height) + 1
+        areas = (ends_x - starts_x) * (ends_y - starts_y)
+        if self.stats.enabled:
+            self.stats.count('pixels_sampled', int(areas.sum()))
+        # only pixels within the region are counted as black, the rest are just counted in the box's area (as white)
+        starts_x, ends_x = [numpy.clip(xs, left, right + 1).astype(numpy.intp) for xs in (starts_x, ends_x)]
+        starts_y, ends_y = [numpy.clip(ys, top, bottom + 1).astype(numpy.intp) for ys in (starts_y, ends_y)]
+        integral = self._integral
+        blacks = integral[ends_y, ends_x] - integral[starts_y, ends_x] - integral[ends_y, starts_x] + \
+            integral[starts_y, starts_x]
+        return (blacks * 2 > areas).astype(numpy.uint8)
+
+
+class ImageScanner(ArrayScanner):
+    def __init__(self, image, region=None, binarizer=global_threshold, sampling='center', hint=None, stats=None):
+        """
+        :type image: PIL.Image.Image
+        :param tuple[int, int, int, int] region: The left, top, right and bottom pixels of the part of the image
+            containing the QR code. Defaults to the whole image
+        :param binarizer: The function telling black pixels from white ones. See qreader.binarization
+        :param str sampling: How to tell the color of each block. One of SAMPLING_MODES
+        :param QRCodeInfo hint: The info of a code read from a similar image (e.g. the previous frame of a video). The
+            code is first read where the hint says it is, and only looked for if it can't be read there
+        :param qreader.instrumentation.ReadStats stats: Records the time spent reading the code, and the work done
+        """
+        stats = stats if stats is not None else NO_STATS
+        with stats.stage('load'):
+            # gray-scale it baby! (unless it already is, and has no transparency to care about)
+            self.image = image if image.mode == 'L' else image.convert('LA')
+            pixels = numpy.asarray(self.image)
+        super(ImageScanner, self).__init__(pixels, None, region, binarizer, sampling, hint, stats)
+
+
+def _to_array(pixels, shape=None):
+    """
+    Wraps an image's pixels with a numpy array, without copying them
+    :param pixels: A numpy array, or any object supporting the buffer protocol
+    :param tuple[int, int] shape: The shape to view the pixels in, if they're flat
+    :rtype: numpy.ndarray
+    """
+    if isinstance(pixels, numpy.ndarray):
+        array = pixels
+    elif isinstance(pixels, (bytes, bytearray)):
+        array = numpy.frombuffer(pixels, dtype=numpy.uint8)
+    else:
+        # a memoryview keeps the buffer's shape and item type
+        array = numpy.asarray(memoryview(pixels))
+    if shape is not None:
+        array = array.reshape(shape)
+    return array
+
+
+def _to_shades(pixels):
+    """
+    Converts RGB (or RGBA) pixels to gray-scale, with the same weights PIL uses. Transparent pixels are considered white
+    :param numpy.ndarray pixels: A height x width x channels array of pixels. An alpha channel is expected last
+    :rtype: numpy.ndarray
+    """
+    channels = pixels.shape[2]
+    if channels in (1, 2):
+        shades = pixels[:, :, 0]
+    elif channels in (3, 4):
+        shades = numpy.dot(pixels[:, :, :3], [0.299, 0.587, 0.114]).round().astype(numpy.uint8)
+    else:
+        raise ValueError('Expected 1-4 channels, got {0:d}'.format(channels))
+    if channels in (2, 4):
+        shades = numpy.where(pixels[:, :, -1] > 0, shades, 255).astype(numpy.uint8)
+    return shades
+
+
+def _to_bits(pixels):
+    """
+    :param numpy.ndarray pixels: Pixels or blocks, which are black where they're non-zero (or True)
+    :return: The pixels as a uint8 array of BLACK/WHITE, which is the array itself (or a view of it) if it already is
+    :rtype: numpy.ndarray
+    """
+    if pixels.dtype == numpy.uint8 and (not pixels.size or pixels.max() <= 1):
+        return pixels
+    if pixels.dtype == numpy.bool_:
+        return pixels.view(numpy.uint8)
+    return (pixels != 0).astype(numpy.uint8)
 
 
 class QrZigZagIterator(Iterator):
@@ -249,12 +757,21 @@ class QRCodeInfo(object):
     # the part of the image that contains the QR code
     canvas = (0, 0)
 
-    # the size of each block in pixels
+    # the width and height of the blocks at the center of the code, in pixels (may be fractional)
     block_size = (0, 0)
 
     # the amount of blocks at each side of the image (it's always a square)
     size = 0
 
+    # the angle of the code's rows, in degrees clockwise from the image's rows (0 for an upright code)
+    rotation = 0.0
+
+    # whether the code is seen mirrored (e.g. from behind glass)
+    mirrored = False
+
+    # the 3x3 matrix taking the code's block coordinates to the image's pixel coordinates. See qreader.geometry
+    transform = None
+
     def __str__(self):
         return '<version %s, ec %s, mask %s>' % \
                (self.version, self.error_correction_level, self.mask_id)
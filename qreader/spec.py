@@ -1,3 +1,4 @@
+import codecs
 from itertools import permutations
 from qreader.constants import MODE_SIZE_SMALL, MODE_SIZE_LARGE, ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q, \
     ERROR_CORRECT_H
@@ -10,6 +11,15 @@ __author__ = 'ewino'
 
 FORMAT_INFO_MASK = 0b101010000010010
 FORMAT_INFO_BCH_GENERATOR = 0b10100110111
+VERSION_INFO_BCH_GENERATOR = 0b1111100100101
+# the 18-bit version info codewords (the version's 6 bits followed by their 12 BCH bits) of versions 7-40, in order.
+# codes of the smaller versions have no version info
+VERSION_INFO_CODES = (
+    0x07C94, 0x085BC, 0x09A99, 0x0A4D3, 0x0BBF6, 0x0C762, 0x0D847, 0x0E60D, 0x0F928, 0x10B78, 0x1145D, 0x12A17,
+    0x13532, 0x149A6, 0x15683, 0x168C9, 0x177EC, 0x18EC4, 0x191E1, 0x1AFAB, 0x1B08E, 0x1CC1A, 0x1D33F, 0x1ED75,
+    0x1F250, 0x209D5, 0x216F0, 0x228BA, 0x2379F, 0x24B0B, 0x2542E, 0x26A64, 0x27541, 0x28C69,
+)
+MIN_VERSION_INFO_VERSION = 7
 
 ALIGNMENT_POSITIONS = [
     [],
@@ -99,6 +109,42 @@ DATA_BLOCKS_INFO = [
     ((30, 118, 19, 6), (28, 47, 18, 31), (30, 24, 34, 34), (30, 15, 20, 61)),  # v40
 ]
 
+# the character sets of the ECI assignments, as Python codec names (taken from the AIM ECI specification)
+ECI_CHARSETS = {
+    0: 'cp437', 1: 'iso-8859-1', 2: 'cp437', 3: 'iso-8859-1', 4: 'iso-8859-2', 5: 'iso-8859-3', 6: 'iso-8859-4',
+    7: 'iso-8859-5', 8: 'iso-8859-6', 9: 'iso-8859-7', 10: 'iso-8859-8', 11: 'iso-8859-9', 12: 'iso-8859-10',
+    13: 'iso-8859-11', 15: 'iso-8859-13', 16: 'iso-8859-14', 17: 'iso-8859-15', 18: 'iso-8859-16', 20: 'shift-jis',
+    21: 'cp1250', 22: 'cp1251', 23: 'cp1252', 24: 'cp1256', 25: 'utf-16-be', 26: 'utf-8', 27: 'ascii', 28: 'big5',
+    29: 'gb18030', 30: 'euc-kr', 170: 'ascii',
+}
+
+
+def _get_eci_codecs():
+    """
+    Resolves the ECI character sets to the codecs available in this Python, once, so the decoder doesn't look them up
+    for every message
+    :rtype: dict[int, codecs.CodecInfo]
+    """
+    eci_codecs = {}
+    for eci, charset in ECI_CHARSETS.items():
+        try:
+            eci_codecs[eci] = codecs.lookup(charset)
+        except LookupError:
+            pass
+    return eci_codecs
+
+
+_eci_codecs = _get_eci_codecs()
+
+
+def get_eci_codec(eci):
+    """
+    :param int eci: The ECI assignment number
+    :return: The codec of the assignment's character set, or None if it isn't a (known) character set
+    :rtype: codecs.CodecInfo
+    """
+    return _eci_codecs.get(eci)
+
 
 # taken from qrcode package
 def get_mask_func(mask_id):
@@ -158,13 +204,33 @@ def ec_level_from_format_info_code(info_ec_code):
     return levels[info_ec_code]
 
 
-def get_dead_zones(version):
-    size = size_by_version(version)
-    constant_zones = [
+def get_alignment_centers(version):
+    """
+    Returns the centers of the alignment patterns in a QR code of the given version
+    :param int version: The QR version (1-40)
+    :return: The x, y of the center block of each alignment pattern
+    :rtype: list[tuple[int, int]]
+    """
+    position_zones = _get_position_zones(size_by_version(version))
+    centers = list(permutations(ALIGNMENT_POSITIONS[version - 1], 2))
+    centers.extend((x, x) for x in ALIGNMENT_POSITIONS[version - 1])
+    # alignment patterns are only left out where they'd overlap the position patterns (they do cross the timing)
+    return [(x, y) for x, y in centers
+            if all(not is_rect_overlapping((x - 2, y - 2, x + 2, y + 2), zone) for zone in position_zones)]
+
+
+def _get_position_zones(size):
+    return [
         (0, 0, 8, 8),  # top left position + format-info
         (size - 8, 0, size - 1, 8),  # top right position + format-info
         (0, size - 8, 7, size - 1),  # bottom left position
-        (8, size - 7, 8, size - 1),  # bottom left format info
+    ]
+
+
+def get_dead_zones(version):
+    size = size_by_version(version)
+    constant_zones = _get_position_zones(size) + [
+        (8, size - 8, 8, size - 1),  # bottom left format info + the dark module
         (8, 6, size - 9, 6),  # top timing array
         (6, 8, 6, size - 9)  # left timing array
     ]
@@ -173,12 +239,6 @@ def get_dead_zones(version):
         constant_zones.append((size - 11, 0, size - 9, 5))  # top version info
         constant_zones.append((0, size - 11, 5, size - 9))  # bottom (left) version info
 
-    alignments_zones = []
-    alignment_centers = list(permutations(ALIGNMENT_POSITIONS[version - 1], 2))
-    alignment_centers.extend((x, x) for x in ALIGNMENT_POSITIONS[version - 1])
-
-    for center_x, center_y in alignment_centers:
-        alignment_zone = (center_x - 2, center_y - 2, center_x + 2, center_y + 2)
-        if all(not is_rect_overlapping(alignment_zone, dead_zone) for dead_zone in constant_zones):
-            alignments_zones.append(alignment_zone)
+    alignments_zones = [(center_x - 2, center_y - 2, center_x + 2, center_y + 2)
+                        for center_x, center_y in get_alignment_centers(version)]
     return constant_zones + alignments_zones
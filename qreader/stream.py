@@ -0,0 +1,83 @@
+import numpy
+import PIL.Image
+
+from qreader.binarization import global_threshold
+from qreader.decoder import QRDecoder
+from qreader.exceptions import QrReadingException, QrFormatError
+from qreader.scanner import ImageScanner, ArrayScanner
+
+__author__ = 'ewino'
+
+__all__ = ['FrameStreamReader']
+
+
+class FrameStreamReader(object):
+    """
+    Reads the QR code in each frame of a video stream. Consecutive frames usually hold the same code in about the same
+    place, so each frame is first read where the code was in the previous one (and only looked for if it's not there
+    anymore), and frames whose blocks are just the same as the previous one's aren't decoded again.
+    """
+
+    def __init__(self, frames, binarizer=global_threshold):
+        """
+        :param collections.Iterable frames: The frames to read, as PIL images or numpy arrays (of gray-scale, RGB or
+            RGBA pixels)
+        :param binarizer: The function telling black pixels from white ones. See qreader.binarization
+        """
+        self.frames = frames
+        self.binarizer = binarizer
+        # how many frames the code was looked for in, read where it was in the previous frame, and not decoded at all
+        self.frames_detected = 0
+        self.frames_hinted = 0
+        self.frames_skipped = 0
+        self._hint = None
+        self._grid = None
+        self._data = None
+
+    def __iter__(self):
+        """
+        :return: A generator of (frame, data or exception) tuples, like qreader.read_many
+        :rtype: collections.Iterator[tuple]
+        """
+        for frame in self.frames:
+            yield frame, self.read_frame(frame)
+
+    def read_frame(self, frame):
+        """
+        Reads the QR code in the next frame of the stream
+        :param PIL.Image.Image|numpy.ndarray frame: The frame
+        :return: The data encoded in the QR code, or the exception raised while reading it
+        """
+        scanner = _get_scanner(frame, self.binarizer, self._hint)
+        try:
+            scanner.read_info()
+            if scanner.hint is not None and numpy.array_equal(scanner.grid, self._grid):
+                self.frames_skipped += 1
+                return self._data
+            data = QRDecoder(scanner).get_first()
+        except (QrReadingException, QrFormatError) as e:
+            self.frames_detected += 1
+            self._hint, self._grid, self._data = None, None, None
+            return e
+
+        if scanner.hint is not None:
+            self.frames_hinted += 1
+        else:
+            self.frames_detected += 1
+        self._hint, self._grid, self._data = scanner.info, scanner.grid, data
+        return data
+
+
+def _get_scanner(frame, binarizer, hint):
+    """
+    :param PIL.Image.Image|numpy.ndarray frame: A video frame. Arrays are read as they are, without converting them to
+        PIL images
+    :param binarizer: The function telling black pixels from white ones
+    :param qreader.scanner.QRCodeInfo hint: The info of the code in the previous frame, if it was read
+    :rtype: ArrayScanner
+    """
+    if isinstance(frame, PIL.Image.Image):
+        return ImageScanner(frame, binarizer=binarizer, hint=hint)
+    if isinstance(frame, numpy.ndarray):
+        return ArrayScanner(frame, binarizer=binarizer, hint=hint)
+    raise TypeError('frames should be PIL images or numpy arrays')
@@ -0,0 +1,139 @@
+import time
+from collections import namedtuple, OrderedDict
+from functools import reduce
+
+import six
+
+from qreader.exceptions import QrCorruptError
+from qreader.payloads import parse_payload
+from qreader.utils import bytes_to_text
+
+__author__ = 'ewino'
+
+__all__ = ['StructuredAppendPart', 'StructuredAppendBuffer', 'join_parts']
+
+# A message can be split between up to 16 QR codes ("structured append"). Each code holds a part of the message, and
+# tells its index, the amount of parts and the parity (the XOR of all the bytes) of the whole message. The parts' data
+# is bytes for bytes messages and text for the other modes, as they're only interpreted once joined. A part mixing
+# bytes with other modes holds a tuple of both. The charset is the codec name of the character set declared for the
+# bytes by an ECI designator, if any
+StructuredAppendPart = namedtuple('StructuredAppendPart', 'index total parity data charset')
+
+
+def join_parts(parts, parse=True):
+    """
+    Joins the parts of a message that was split between several QR codes
+    :param collections.Iterable[StructuredAppendPart] parts: All the parts of the message, in any order
+    :param bool parse: Whether to parse payloads of known formats (e.g. vCards). See qreader.payloads
+    :raise QrCorruptError: in case parts are missing, or don't add up to the parity they carry
+    :return: The message
+    :rtype: str|unicode|object
+    """
+    parts = sorted(parts, key=lambda part: part.index)
+    if not parts or [part.index for part in parts] != list(range(parts[0].total)):
+        raise QrCorruptError('Structured append parts are missing')
+    chunks = [chunk for part in parts for chunk in _get_chunks(part.data)]
+    # the text of numeric, alphanumeric and kanji segments takes the same bytes in Shift-JIS as it did in the codes
+    raw = b''.join(chunk if isinstance(chunk, bytes) else chunk.encode('shift-jis') for chunk in chunks)
+    if reduce(lambda parity, byte: parity ^ byte, bytearray(raw), 0) != parts[0].parity:
+        raise QrCorruptError("Structured append parts don't match their parity")
+
+    texts = []
+    for chunk in chunks:
+        # consecutive bytes are decoded together, as a character's bytes may be split between parts
+        if isinstance(chunk, bytes) and texts and isinstance(texts[-1], bytes):
+            texts[-1] += chunk
+        else:
+            texts.append(chunk)
+    charset = next((part.charset for part in parts if part.charset), None)
+    message = u''.join(_bytes_to_text(text, charset) if isinstance(text, bytes) else six.text_type(text)
+                       for text in texts)
+    return parse_payload(message) if parse else message
+
+
+def _get_chunks(data):
+    """
+    :param str|unicode|bytes|tuple data: A structured append part's data
+    :return: The part's bytes and text, in order
+    :rtype: tuple
+    """
+    return data if isinstance(data, tuple) else (data,)
+
+
+def _bytes_to_text(raw, charset):
+    """
+    :param bytes raw: The bytes of joined parts
+    :param str charset: The character set declared for the bytes, if any
+    :rtype: str|unicode
+    """
+    if charset:
+        try:
+            return raw.decode(charset)
+        except UnicodeDecodeError:
+            pass
+    return bytes_to_text(raw)
+
+
+class StructuredAppendBuffer(object):
+    """
+    Collects the parts of messages split between several QR codes (which are usually read from different images, or
+    different frames of a video), and joins each message once all of its parts arrive.
+    The parts of a message are told apart from other messages' by their parity (and amount). Incomplete messages are
+    dropped when they're too old, or when there are too many of them (oldest first)
+    """
+
+    def __init__(self, max_age=60.0, max_messages=16, clock=time.time, parse=True):
+        """
+        :param float max_age: The amount of seconds after its first part arrived in which a message is dropped if it's
+            still incomplete. None to keep messages as long as there's room for them
+        :param int max_messages: The amount of incomplete messages kept at once
+        :param clock: A function returning the current time, in seconds
+        :param bool parse: Whether to parse the messages' payloads. See qreader.payloads
+        """
+        self.max_age = max_age
+        self.max_messages = max_messages
+        self.clock = clock
+        self.parse = parse
+        # the parts of each incomplete message (by index), and when its first part arrived, by parity and amount
+        self._messages = OrderedDict()
+
+    def __len__(self):
+        """ The amount of incomplete messages """
+        self.evict()
+        return len(self._messages)
+
+    def add(self, part):
+        """
+        Adds a part of a message
+        :param StructuredAppendPart part: The part, as read from a QR code
+        :raise QrCorruptError: in case the part's index is illegal, or the message was completed but its parts don't
+            add up to its parity
+        :return: The whole message, if this was its last missing part. Otherwise None
+        :rtype: str|unicode|object
+        """
+        if not 0 <= part.index < part.total:
+            raise QrCorruptError('Illegal structured append part index: {0:d} of {1:d}'.format(part.index, part.total))
+        self.evict()
+        key = part.parity, part.total
+        if key not in self._messages:
+            self._messages[key] = ({}, self.clock())
+            while len(self._messages) > self.max_messages:
+                self._messages.popitem(last=False)
+        parts = self._messages[key][0]
+        parts[part.index] = part
+        if len(parts) < part.total:
+            return None
+        del self._messages[key]
+        return join_parts(parts.values(), self.parse)
+
+    def evict(self):
+        """ Drops the incomplete messages which are too old """
+        if self.max_age is None:
+            return
+        oldest = self.clock() - self.max_age
+        # the messages are ordered by the time their first part arrived
+        while self._messages and next(iter(self._messages.values()))[1] < oldest:
+            self._messages.popitem(last=False)
+
+    def clear(self):
+        self._messages.clear()
@@ -22,3 +22,15 @@ def ints_to_bytes(ints):
         return bytes(ints)
     else:
         return ''.join(chr(x) for x in ints)
+
+
+def bytes_to_text(raw):
+    """
+    Decodes the bytes of a QR code's bytes message. They should be ISO-8859-1 by the spec, but most encoders use UTF-8
+    :param bytes raw: The message's bytes
+    :rtype: str|unicode
+    """
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('iso-8859-1')
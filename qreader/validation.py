@@ -1,12 +1,34 @@
+import threading
+
+import numpy
+from reedsolo import RSCodec, ReedSolomonError
+
 from qreader.exceptions import QrCorruptError
-from qreader.spec import FORMAT_INFO_BCH_GENERATOR, DATA_BLOCKS_INFO
-from reedsolo import RSCodec
+from qreader.instrumentation import NO_STATS
+from qreader.spec import FORMAT_INFO_BCH_GENERATOR, DATA_BLOCKS_INFO, VERSION_INFO_CODES, MIN_VERSION_INFO_VERSION
 
 __author__ = 'ewino'
 
 # Much of the credit goes to the author of the article at
 # https://en.wikiversity.org/wiki/Reed-Solomon_codes_for_coders
 
+# the version info codewords are at least 8 bits apart, so up to 3 wrong bits can be corrected in each copy
+MAX_VERSION_INFO_ERRORS = 3
+
+# the amount of bits in a format info sample
+FORMAT_INFO_BITS = 15
+
+# the Reed-Solomon codecs by the amount of error correction codewords. see get_codec
+_codecs = {}
+# the codewords' indexes of each block, by version and error correction level. see get_blocks_layout
+_blocks_layouts = {}
+# the amount of set bits in every 15-bit number, and the format each is corrected to (-1 if it's equally close to
+# several). see get_format_info_tables
+_format_info_tables = None
+# codes can be read in several threads at once, so the caches are filled under a lock. reading them doesn't need it,
+# as an entry is only added once it's complete
+_caches_lock = threading.Lock()
+
 
 def format_info_check(format_info):
     """ Returns 0 if given a complete format info code and it is valid.
@@ -23,6 +45,12 @@ def format_info_check(format_info):
     return format_info
 
 
+# the 15-bit format info codewords (with their error correction bits, before masking), by format
+FORMAT_INFO_CODES = tuple((info_format << 10) ^ format_info_check(info_format << 10) for info_format in range(32))
+_formats_by_code = dict((code, info_format) for info_format, code in enumerate(FORMAT_INFO_CODES))
+_format_info_codes = numpy.array(FORMAT_INFO_CODES)
+
+
 def hamming_diff(a, b):
     """ Calculates the hamming weight of the difference between two number (number of different bits)
     :param int a: A number to calculate the diff from
@@ -30,12 +58,33 @@ def hamming_diff(a, b):
     :return: The amount of different bits
     :rtype: int
     """
-    weight = 0
-    diff = a ^ b
-    while diff > 0:
-        weight += diff & 1
-        diff >>= 1
-    return weight
+    return bin(a ^ b).count('1')
+
+
+def get_format_info_tables():
+    """
+    Returns the lookup tables correcting format info samples. They're built once, the first time they're needed
+    :return: The amount of set bits in each 15-bit number, and the format each 15-bit sample is corrected to (the
+        one whose codeword it's closest to), or -1 if it's just as close to several of them. Both are read-only
+    :rtype: tuple[numpy.ndarray, numpy.ndarray]
+    """
+    global _format_info_tables
+    if _format_info_tables is None:
+        with _caches_lock:
+            if _format_info_tables is None:
+                samples = numpy.arange(1 << FORMAT_INFO_BITS)
+                bit_counts = numpy.zeros(len(samples), dtype=numpy.uint8)
+                for bit in range(FORMAT_INFO_BITS):
+                    bit_counts += ((samples >> bit) & 1).astype(numpy.uint8)
+                # each sample's distance from each codeword, by [sample, format]
+                distances = bit_counts[samples[:, numpy.newaxis] ^ numpy.array(FORMAT_INFO_CODES)]
+                closest = distances.min(axis=1)
+                ties = numpy.count_nonzero(distances == closest[:, numpy.newaxis], axis=1) > 1
+                corrections = numpy.where(ties, -1, distances.argmin(axis=1)).astype(numpy.int8)
+                bit_counts.flags.writeable = False
+                corrections.flags.writeable = False
+                _format_info_tables = bit_counts, corrections
+    return _format_info_tables
 
 
 def validate_format_info(format_info, second_format_info_sample=None):
@@ -50,27 +99,133 @@ def validate_format_info(format_info, second_format_info_sample=None):
     """
     if second_format_info_sample is None:
         second_format_info_sample = format_info
-    if format_info_check(format_info) == format_info_check(second_format_info_sample) == 0:
-        return format_info >> 10
-    format_info = (format_info << 15) + second_format_info_sample
-
-    best_format = None
-    max_distance = 29
-    for test_format in range(0, 32):
-        test_code = (test_format << 10) ^ format_info_check(test_format << 10)
-        test_dist = hamming_diff(format_info, test_code + (test_code << 15))
-
-        if test_dist < max_distance:
-            max_distance = test_dist
-            best_format = test_format
-        elif test_dist == max_distance:
-            best_format = None
-    if best_format is None:
+    if format_info in _formats_by_code and second_format_info_sample in _formats_by_code:
+        return _formats_by_code[format_info]
+
+    bit_counts, corrections = get_format_info_tables()
+    if format_info == second_format_info_sample:
+        # both samples are just as far from each codeword, so the closest one is looked up
+        best_format = int(corrections[format_info])
+    else:
+        distances = bit_counts[format_info ^ _format_info_codes] + \
+            bit_counts[second_format_info_sample ^ _format_info_codes]
+        best_format = int(distances.argmin())
+        # a tie can't be broken, and samples almost completely off every codeword aren't worth correcting
+        if numpy.count_nonzero(distances == distances[best_format]) > 1 or \
+                distances[best_format] >= 2 * FORMAT_INFO_BITS - 1:
+            best_format = -1
+    if best_format < 0:
         raise QrCorruptError('QR meta-info is too corrupt to read')
     return best_format
 
 
-def validate_data(data, version, ec_level):
-    # block_info = DATA_BLOCKS_INFO[version][ec_level]
-    # value = RSCodec().decode(data)
-    return data
+def validate_version_info(version_info, second_version_info_sample=None):
+    """
+    Receives one or two copies of a QR version info (which codes of version 7 and up have), and returns the version,
+    after error correction. Each copy is corrected on its own, and the one needing less correction is trusted
+    :param int version_info: The 18-bit version info, with its error correction bits
+    :param int second_version_info_sample: The 18-bit version info from the other version info block
+    :raise QrCorruptError: in case neither copy is close enough to a valid version info to correct it
+    :return: The version (7-40)
+    :rtype: int
+    """
+    best_version = None
+    min_distance = MAX_VERSION_INFO_ERRORS + 1
+    for sample in (version_info, second_version_info_sample):
+        if sample is None:
+            continue
+        for version, code in enumerate(VERSION_INFO_CODES, MIN_VERSION_INFO_VERSION):
+            distance = hamming_diff(sample, code)
+            if distance < min_distance:
+                min_distance = distance
+                best_version = version
+    if best_version is None:
+        raise QrCorruptError('QR version info is too corrupt to read')
+    return best_version
+
+
+def get_codec(ec_codewords):
+    """
+    Returns a Reed-Solomon codec for blocks with the given amount of error correction codewords.
+    Codecs (and their generator polynomials) are created once and reused.
+    Creating a codec rebuilds reedsolo's global Galois field tables, which breaks any decoding running at the same time
+    in another thread. So the codecs of all the amounts the spec uses are created together, the first time one is needed
+    :param int ec_codewords: The amount of error correction codewords in each block
+    :rtype: RSCodec
+    """
+    if ec_codewords not in _codecs:
+        with _caches_lock:
+            if not _codecs:
+                for amount in sorted({block_info[0] for version in DATA_BLOCKS_INFO for block_info in version}):
+                    _codecs[amount] = RSCodec(amount)
+            if ec_codewords not in _codecs:
+                _codecs[ec_codewords] = RSCodec(ec_codewords)
+    return _codecs[ec_codewords]
+
+
+def get_blocks_layout(version, ec_level):
+    """
+    Returns the way the codewords of a QR code are interleaved between its blocks.
+    The data codewords come first, taken from each block in turn (the larger blocks having one more codeword at the
+    end), and are followed by the error correction codewords, interleaved the same way.
+    :param int version: The QR version (1-40)
+    :param int ec_level: The error correction level (0-3)
+    :return: For each block, an array of its codewords' indexes in the code, and the amount of data codewords in it
+    :rtype: list[tuple[numpy.ndarray, int]]
+    """
+    key = (version, ec_level)
+    if key not in _blocks_layouts:
+        with _caches_lock:
+            if key not in _blocks_layouts:
+                block_info = DATA_BLOCKS_INFO[version - 1][ec_level]
+                ec_codewords, data_codewords, small_blocks = block_info[:3]
+                large_blocks = block_info[3] if len(block_info) > 3 else 0
+                data_sizes = [data_codewords] * small_blocks + [data_codewords + 1] * large_blocks
+                indexes = [[] for _ in data_sizes]
+                index = 0
+                for i in range(data_codewords + (1 if large_blocks else 0)):
+                    for block_indexes, data_size in zip(indexes, data_sizes):
+                        if i < data_size:
+                            block_indexes.append(index)
+                            index += 1
+                for _ in range(ec_codewords):
+                    for block_indexes in indexes:
+                        block_indexes.append(index)
+                        index += 1
+                _blocks_layouts[key] = [(numpy.array(block_indexes), data_size)
+                                        for block_indexes, data_size in zip(indexes, data_sizes)]
+    return _blocks_layouts[key]
+
+
+def validate_data(data, version, ec_level, stats=NO_STATS):
+    """
+    Splits the data bits read from a QR code to their blocks, corrects each block using its error correction
+    codewords, and returns just the data codewords
+    :param list[int] data: The data bits, in the order they were read from the code
+    :param int version: The QR version (1-40)
+    :param int ec_level: The error correction level (0-3)
+    :param qreader.instrumentation.ReadStats stats: Counts the codewords which were corrected
+    :raise QrCorruptError: in case the data is too corrupt to be corrected
+    :return: The data codewords of all the blocks
+    :rtype: bytearray
+    """
+    layout = get_blocks_layout(version, ec_level)
+    codewords_count = sum(len(block_indexes) for block_indexes, _ in layout)
+    if len(data) < codewords_count * 8:
+        raise QrCorruptError('QR data is too short ({0:d} bits instead of {1:d})'.format(
+            len(data), codewords_count * 8))
+    # any remainder bits after the last codeword are just padding
+    codewords = numpy.packbits(numpy.asarray(data[:codewords_count * 8], dtype=numpy.uint8))
+
+    result = bytearray()
+    for block_indexes, data_size in layout:
+        codec = get_codec(len(block_indexes) - data_size)
+        try:
+            corrected = codec.decode(bytearray(codewords[block_indexes]))
+        except ReedSolomonError:
+            raise QrCorruptError('QR data is too corrupt to correct')
+        if isinstance(corrected, tuple):  # newer reedsolo versions also return the ec codewords and errors' positions
+            stats.count('corrected_codewords', len(corrected[2]))
+            corrected = corrected[0]
+        result.extend(corrected[:data_size])
+    return result
@@ -1,4 +1,3 @@
-from datetime import datetime
 import re
 import dateutil.parser
 import six
@@ -9,8 +8,59 @@ __author__ = 'ewino'
 # A very small vCard parsing implementation, because vobject's looks quite very bloated.
 # Will probably be replaced by vobject or a lighter library (if I find one)
 
+# a property line: its name, its parameters (if any, e.g. "TYPE=WORK,VOICE" or just "WORK") and its value. the
+# parameters are kept without the name of the first one, so they come out as "WORK,VOICE" either way
+_LINE_PATTERN = re.compile(r'^([\w-]+)(?:;(?:[\w-]+=)?([^:]*))?:(.*)$')
+
+
+class _LazyDate(object):
+    """
+    A date property of a vCard. Parsing dates is by far the slowest part of parsing a vCard, so they're kept as text
+    and only parsed (once) when they're read
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.text_name = '_' + name + '_text'
+        self.date_name = '_' + name + '_date'
+
+    def __get__(self, card, owner):
+        """
+        :raise ValueError: in case the date can't be parsed
+        :rtype: datetime.datetime
+        """
+        if card is None:
+            return self
+        try:
+            return getattr(card, self.date_name)
+        except AttributeError:
+            text = getattr(card, self.text_name)
+            date = None if text is None else dateutil.parser.parse(text)
+            setattr(card, self.date_name, date)
+            return date
+
+    def __set__(self, card, value):
+        """
+        :param str|unicode|datetime.datetime value: The date, or its text (which is parsed when it's read)
+        """
+        if isinstance(value, six.string_types):
+            setattr(card, self.text_name, value)
+            if hasattr(card, self.date_name):
+                delattr(card, self.date_name)
+        else:
+            setattr(card, self.text_name, None)
+            setattr(card, self.date_name, value)
+
 
 class vCard(object):
+    __slots__ = ('addresses', 'agent', '_anniversary_text', '_anniversary_date', '_bday_text', '_bday_date',
+                 'categories', 'emails', 'formatted_name', 'gender', 'geo', 'impp', 'key', 'address_labels', 'lang',
+                 'logo', 'name', 'note', 'nickname', 'org', 'photo', '_rev_text', '_rev_date', 'role', 'phones',
+                 'title', 'tz', 'urls', 'extras')
+
+    anniversary = _LazyDate('anniversary')
+    bday = _LazyDate('bday')
+    rev = _LazyDate('rev')
 
     def __init__(self):
         self.addresses = []
@@ -35,73 +85,96 @@ class vCard(object):
         self.rev = None
         self.role = None
         self.phones = []
+        self.title = None
         self.tz = None
+        self.urls = []
+        # the properties this implementation doesn't support, by name. each has a list of values, like self.phones
+        self.extras = {}
 
     @classmethod
     def from_text(cls, txt):
+        """
+        :param str|unicode txt: The vCard's text
+        :raise ValueError: in case the text isn't a vCard
+        :rtype: vCard
+        """
         lines = txt.splitlines()
-        """ :type: list[str] """
-        if lines[0] == 'BEGIN:VCARD' and lines[-1] == 'END:VCARD':
+        if lines and lines[0] == 'BEGIN:VCARD' and lines[-1] == 'END:VCARD':
             lines = lines[1:-1]
         else:
             raise ValueError('Not a valid vCard format')
 
-        key_field_map = {
-            'ADR': 'addresses',
-            'AGENT': 'agent',
-            'ANNIVERSARY': ('anniversary', datetime),
-            'BDAY': ('bday', datetime),
-            'CATEGORIES': ('categories', list),
-            'EMAIL': 'emails',
-            'FN': 'formatted_name',
-            'GENDER': 'gender',
-            'GEO': 'geo',
-            'IMPP': 'impp',
-            'KEY': 'key',
-            'LABEL': 'address_labels',
-            'LANG': 'lang',
-            'LOGO': 'logo',
-            'N': 'name',
-            'NICKNAME': 'nickname',
-            'NOTE': 'note',
-            'ORG': 'org',
-            'PHOTO': 'photo',
-            'REV': ('rev', datetime),
-            'TEL': 'phones',
-            'ROLE': 'role',
-            'TZ': 'tz',
-        }
-        ignore_fields = {'VERSION'}
-
         card = cls()
-
         for line in lines:
             if not line.strip():
                 continue
-            key, val = line.split(':', 1)
-            if key in ignore_fields:
+            match = _LINE_PATTERN.match(line)
+            if not match:
+                raise ValueError('Not a valid vCard line: {0:s}'.format(line))
+            key, params, val = match.groups()
+            if key in _IGNORED_PROPERTIES:
                 continue
-            if ';' in key:
-                key, extra = re.findall('^(\w+);(?:\w+=)?(.+)$', key)[0]
-                val = '%s;%s' % (extra, val)
-            field = key_field_map.get(key)
-            if not field:
-                raise TypeError('Unknown vCard field: %s. This implementation only supports basic properties' % key)
-            if isinstance(field, tuple):
-                field, tpe = field
-                if tpe == datetime:
-                    val = dateutil.parser.parse(val)
-                elif tpe == list:
-                    val = val.split(',')
-            if isinstance(val, six.string_types) and ';' in val:
-                val = tuple(val.split(';'))
-
-            if isinstance(getattr(card, field), list):
-                prop = getattr(card, field)
-                if isinstance(val, list):
-                    prop.extend(val)
-                else:
-                    prop.append(val)
-            else:
-                setattr(card, field, val)
+            setter, field = _PROPERTIES.get(key, (_add_extra, key))
+            setter(card, field, params, val)
         return card
+
+
+def _split_value(params, val):
+    """
+    :return: The value (prefixed by its parameters, if any), split to its components if it has several
+    :rtype: str|unicode|tuple
+    """
+    if params:
+        val = '%s;%s' % (params, val)
+    return tuple(val.split(';')) if ';' in val else val
+
+
+def _set_value(card, field, params, val):
+    setattr(card, field, _split_value(params, val))
+
+
+def _append_value(card, field, params, val):
+    getattr(card, field).append(_split_value(params, val))
+
+
+def _extend_values(card, field, params, val):
+    getattr(card, field).extend(val.split(','))
+
+
+def _set_date(card, field, params, val):
+    setattr(card, field, val)  # parsed when it's read
+
+
+def _add_extra(card, field, params, val):
+    card.extras.setdefault(field, []).append(_split_value(params, val))
+
+
+# how to set each property on the card: its setter and the card's field
+_PROPERTIES = {
+    'ADR': (_append_value, 'addresses'),
+    'AGENT': (_set_value, 'agent'),
+    'ANNIVERSARY': (_set_date, 'anniversary'),
+    'BDAY': (_set_date, 'bday'),
+    'CATEGORIES': (_extend_values, 'categories'),
+    'EMAIL': (_append_value, 'emails'),
+    'FN': (_set_value, 'formatted_name'),
+    'GENDER': (_set_value, 'gender'),
+    'GEO': (_set_value, 'geo'),
+    'IMPP': (_append_value, 'impp'),
+    'KEY': (_set_value, 'key'),
+    'LABEL': (_append_value, 'address_labels'),
+    'LANG': (_set_value, 'lang'),
+    'LOGO': (_set_value, 'logo'),
+    'N': (_set_value, 'name'),
+    'NICKNAME': (_set_value, 'nickname'),
+    'NOTE': (_set_value, 'note'),
+    'ORG': (_set_value, 'org'),
+    'PHOTO': (_set_value, 'photo'),
+    'REV': (_set_date, 'rev'),
+    'TEL': (_append_value, 'phones'),
+    'ROLE': (_set_value, 'role'),
+    'TITLE': (_set_value, 'title'),
+    'TZ': (_set_value, 'tz'),
+    'URL': (_append_value, 'urls'),
+}
+_IGNORED_PROPERTIES = frozenset(['VERSION'])
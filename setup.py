@@ -1,5 +1,5 @@
 import glob, os
-from distutils.core import setup
+from setuptools import setup
 
 PACKAGE_NAME = "qreader"
 
@@ -11,9 +11,12 @@ setup(name=PACKAGE_NAME,
       maintainer="Ehud Winograd",
       long_description='A pure python reader for QR codes. Made to be compatible to Python 2.7 to 3.5+.',
       platforms=["Unix", "Windows"],
-      packages=['qreader'],
+      packages=['qreader', 'qreader.payloads'],
       data_files=[('', ['README.md'] + glob.glob('doc/*')),
                   (os.path.join('tests'), glob.glob('tests/*.py')),
                   (os.path.join('tests', 'resources', 'decoder'), glob.glob('tests/resources/decoder/*')),
                   (os.path.join('tests', 'resources', 'scanner'), glob.glob('tests/resources/scanner/*'))],
-      requires=['Pillow', 'six', 'python_dateutil', 'reedsolo'])
+      install_requires=['Pillow', 'six', 'python-dateutil', 'reedsolo', 'numpy', 'futures; python_version < "3.2"'],
+      entry_points={
+          'console_scripts': ['qreader = qreader.cli:main'],
+      })
@@ -0,0 +1,147 @@
+"""
+The tests of qreader.aio. They're written with coroutines, which are syntax errors before Python 3.6, so they're kept
+out of test discovery and imported by test_aio where the syntax works
+"""
+import asyncio
+import threading
+
+import six
+
+from qreader import aio
+from qreader.binarization import global_threshold
+from tests.helpers import TestCase, EXAMPLES
+
+__author__ = 'ewino'
+
+
+class ConcurrencyCounter(object):
+    """ A binarizer which counts how many reads run at once """
+
+    def __init__(self):
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, shades):
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            threading.Event().wait(0.02)
+            return global_threshold(shades)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+class AsyncTestCase(TestCase):
+    def setUp(self):
+        self.reader = aio.AsyncReader(workers=2)
+
+    def tearDown(self):
+        self.reader.close()
+
+    @staticmethod
+    def _run(coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+
+class TestAsyncRead(AsyncTestCase):
+    def test_read(self):
+        self.assertEqual('Ver1', self._run(aio.read(EXAMPLES.simple_1.img_res_path)))
+        self.assertEqual('HELLO WORLD', self._run(self.reader.read(EXAMPLES.alphanum.get_img_res())))
+
+    def test_errors(self):
+        self.assertRaises(TypeError, self._run, self.reader.read(None))
+        self.assertRaises(FileNotFoundError if six.PY3 else IOError, self._run,
+                          self.reader.read(EXAMPLES.simple_1.img_res_path.replace('.', '-')))
+
+    def test_concurrent_reads(self):
+        async def read_all():
+            return await asyncio.gather(*[self.reader.read(res.img_res_path) for res in sources])
+        sources = [EXAMPLES.simple_1, EXAMPLES.alphanum, EXAMPLES.numeric] * 3
+        self.assertEqual(['Ver1', 'HELLO WORLD', 1112223330020159990] * 3, self._run(read_all()))
+
+    def test_backpressure(self):
+        async def read_all():
+            return await asyncio.gather(*[reader.read(EXAMPLES.simple_1.img_res_path, binarizer=counter)
+                                          for _ in range(8)])
+        counter = ConcurrencyCounter()
+        with aio.AsyncReader(workers=4, max_pending=2) as reader:
+            self.assertEqual(['Ver1'] * 8, self._run(read_all()))
+        self.assertEqual(2, counter.max_running)
+
+    def test_cancel(self):
+        async def cancel_waiting():
+            blocking = asyncio.ensure_future(reader.read(EXAMPLES.simple_1.img_res_path, binarizer=counter))
+            waiting = asyncio.ensure_future(reader.read(EXAMPLES.simple_1.img_res_path, binarizer=counter))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            return await blocking, await asyncio.gather(waiting, return_exceptions=True)
+        counter = ConcurrencyCounter()
+        with aio.AsyncReader(workers=1, max_pending=1) as reader:
+            data, (error,) = self._run(cancel_waiting())
+        self.assertEqual('Ver1', data)
+        self.assertIsInstance(error, asyncio.CancelledError)
+
+    def test_bad_executor(self):
+        self.assertRaises(ValueError, aio.AsyncReader, executor='fiber')
+
+
+class TestAsyncReadMany(AsyncTestCase):
+    def _collect(self, results):
+        async def collect():
+            return [result async for result in results]
+        return self._run(collect())
+
+    def test_ordered(self):
+        sources = [EXAMPLES.simple_1.img_res_path, EXAMPLES.simple_2.img_res_path,
+                   EXAMPLES.simple_1.img_res_path.replace('.', '-'), EXAMPLES.numeric.img_res_path]
+        results = self._collect(self.reader.read_many(sources))
+        self.assertEqual(sources, [source for source, _ in results])
+        results = [result for _, result in results]
+        self.assertEqual(['Ver1', 'Version 2'], results[:2])
+        self.assertIsInstance(results[2], FileNotFoundError if six.PY3 else IOError)
+        self.assertEqual(1112223330020159990, results[3])
+
+    def test_unordered(self):
+        sources = [EXAMPLES.simple_1.img_res_path, EXAMPLES.simple_2.img_res_path] * 3
+        results = self._collect(aio.read_many(sources, ordered=False, reader=self.reader))
+        self.assertEqual(sorted(sources), sorted(source for source, _ in results))
+        self.assertEqual(3, sum(1 for _, result in results if result == 'Version 2'))
+
+    def test_async_sources(self):
+        async def sources():
+            for _ in range(5):
+                await asyncio.sleep(0)
+                yield EXAMPLES.simple_1.img_res_path
+        self.assertEqual(['Ver1'] * 5, [result for _, result in self._collect(self.reader.read_many(sources()))])
+
+    def test_no_sources(self):
+        self.assertEqual([], self._collect(self.reader.read_many([])))
+
+    def test_backpressure(self):
+        sources = (EXAMPLES.simple_1.img_res_path for _ in range(8))
+        counter = ConcurrencyCounter()
+        with aio.AsyncReader(workers=4, max_pending=3) as reader:
+            results = self._collect(reader.read_many(sources, binarizer=counter))
+        self.assertEqual(['Ver1'] * 8, [result for _, result in results])
+        self.assertLessEqual(counter.max_running, 3)
+
+    def test_close_early(self):
+        async def read_first():
+            results = reader.read_many((EXAMPLES.simple_1.img_res_path for _ in range(10)), binarizer=counter)
+            first = await results.__anext__()
+            await results.aclose()
+            return first
+        counter = ConcurrencyCounter()
+        with aio.AsyncReader(workers=1, max_pending=4) as reader:
+            self.assertEqual('Ver1', self._run(read_first())[1])
+        # the reads still waiting for a worker were cancelled
+        self.assertLess(counter.calls, 10)
@@ -58,10 +58,18 @@ class EXAMPLES:
     # TODO: vCard-L doesn't match it's text file (text file version preferred). Should regenerate it (ewino@2016-01-30)
     vcard = Example('Qr-8-vCard-L.jpg', 8, ERROR_CORRECT_L, mask=3, txt_name='vCard-L.txt')  # vCard
 
-    broken_pattern_1 = Example('Qr-1-broken-pattern-1.png', 1, ERROR_CORRECT_Q, mask=1)  # top-left noise
-    broken_pattern_2 = Example('Qr-1-broken-pattern-2.png', 1, ERROR_CORRECT_Q, mask=1)  # top-right noise
-    broken_pattern_3 = Example('Qr-1-broken-pattern-3.png', 1, ERROR_CORRECT_Q, mask=1)  # bottom-right noise
-    broken_too_light = Example('Qr-1-broken-too-light.png', 1, ERROR_CORRECT_Q, mask=1)  # code is in very light gray
+    # alphanumeric, numeric and bytes segments
+    mixed = Example('Qr-3-mixed.png', 3, ERROR_CORRECT_M, mask=7)  # HTTP://EXAMPLE.COM/ORDER/ 001234...890 Thanks!
+
+    # blocks of 4.34 pixels
+    scaled = Example('Qr-12-scaled.png', 12, ERROR_CORRECT_M, mask=5)  # Version 12 code, scanned at a fractional...
+    # the top edge is narrower than the bottom one, and the right edge is shorter than the left one
+    perspective = Example('Qr-20-perspective.png', 20, ERROR_CORRECT_L, mask=3)  # Version 20 code, photographed...
+
+    broken_pattern_1 = Example('Qr-1-broken-pattern-1.png', 1, ERROR_CORRECT_H, mask=1)  # top-left noise
+    broken_pattern_2 = Example('Qr-1-broken-pattern-2.png', 1, ERROR_CORRECT_H, mask=1)  # top-right noise
+    broken_pattern_3 = Example('Qr-1-broken-pattern-3.png', 1, ERROR_CORRECT_H, mask=1)  # bottom-right noise
+    broken_too_light = Example('Qr-1-broken-too-light.png', 1, ERROR_CORRECT_H, mask=1)  # code is in very light gray
 
     broken_message_mode = Example(None, 2, ERROR_CORRECT_Q, mask=4, txt_name='nums-malformed-H.txt')  # 1112223330...
 
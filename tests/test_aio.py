@@ -0,0 +1,31 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from qreader import scanner, validation
+from qreader.api import read
+from tests.helpers import TestCase, EXAMPLES
+
+if sys.version_info >= (3, 6):
+    from tests.aio_cases import TestAsyncRead, TestAsyncReadMany  # noqa: F401
+
+__author__ = 'ewino'
+
+
+class TestThreadSafety(TestCase):
+    def test_concurrent_cold_caches(self):
+        sources = [EXAMPLES.scaled, EXAMPLES.alphanum, EXAMPLES.numeric, EXAMPLES.url] * 4
+        images = [res.get_img_res() for res in sources]
+        expected = [read(image) for image in images[:4]] * 4
+        # every thread fills the caches at once
+        for cache in (scanner._data_positions, scanner._data_masks, validation._codecs, validation._blocks_layouts):
+            cache.clear()
+        with ThreadPoolExecutor(8) as pool:
+            self.assertEqual(expected, list(pool.map(read, images)))
+
+    def test_codecs_shared_by_threads(self):
+        validation._codecs.clear()
+        with ThreadPoolExecutor(4) as pool:
+            codecs = list(pool.map(validation.get_codec, [17] * 8))
+        self.assertTrue(all(codec is codecs[0] for codec in codecs))
+        # all the codecs the spec needs are created at once
+        self.assertIn(30, validation._codecs)
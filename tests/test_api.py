@@ -1,7 +1,14 @@
+import pickle
+from io import BytesIO
+
+import numpy
 import six
 from PIL import Image
 
-from qreader.api import read
+from qreader.api import read, read_with_info, read_all, read_many, read_array, read_matrix, _get_draft_scanner
+from qreader.constants import ERROR_CORRECT_H
+from qreader.exceptions import IllegalQrMessageModeId, QrReadingException
+from qreader.scanner import ImageScanner
 from tests.helpers import TestCase, EXAMPLES
 
 
@@ -23,3 +30,138 @@ class TestRead(TestCase):
     def test_with_wrong_path(self):
         exception_type = FileNotFoundError if six.PY3 else IOError
         self.assertRaises(exception_type, read, EXAMPLES.simple_1.img_res_path.replace('.', '-'))
+
+    def test_with_info(self):
+        data, info = read_with_info(EXAMPLES.simple_2.img_res_path)
+        self.assertEqual('Version 2', data)
+        self.assertEqual((2, ERROR_CORRECT_H, 2), (info.version, info.error_correction_level, info.mask_id))
+
+
+class TestDraftRead(TestCase):
+    @staticmethod
+    def _get_jpeg(res, scale):
+        image = res.get_img_res().convert('RGB')
+        f = BytesIO()
+        image.resize((image.width * scale, image.height * scale), Image.NEAREST).save(f, 'JPEG', quality=90)
+        f.seek(0)
+        return f
+
+    def test_smallest_scale(self):
+        # blocks are 7 * 8 = 56 pixels wide, so even an eighth of the size leaves them wide enough
+        f = self._get_jpeg(EXAMPLES.simple_1, 8)
+        scanner, image = _get_draft_scanner(f, 5)
+        self.assertIsNone(image)
+        self.assertEqual((220, 220), scanner.image.size)
+        self.assertEqual('L', scanner.image.mode)
+        f.seek(0)
+        self.assertEqual('Ver1', read(f, draft_module_size=5))
+
+    def test_larger_scale(self):
+        scanner, _ = _get_draft_scanner(self._get_jpeg(EXAMPLES.simple_1, 8), 12)
+        self.assertEqual((440, 440), scanner.image.size)
+
+    def test_full_scale_needed(self):
+        f = self._get_jpeg(EXAMPLES.simple_1, 8)
+        self.assertEqual((None, None), _get_draft_scanner(f, 50))
+        f.seek(0)
+        self.assertEqual('Ver1', read(f, draft_module_size=50))
+
+    def test_not_found_in_draft(self):
+        # blocks are only 1-2 pixels wide in an eighth of the size, so it falls back to the full resolution
+        self.assertEqual((None, None), _get_draft_scanner(EXAMPLES.simple_3.img_res_path, 4))
+        self.assertEqual('Hello!', read(EXAMPLES.simple_3.img_res_path, draft_module_size=4))
+
+    def test_not_jpeg(self):
+        scanner, image = _get_draft_scanner(EXAMPLES.simple_1.img_res_path, 4)
+        self.assertIsNone(scanner)
+        self.assertEqual('PNG', image.format)
+        # the image is only opened once
+        opened = []
+        original_open = Image.open
+        Image.open = lambda *args: opened.append(args) or original_open(*args)
+        try:
+            self.assertEqual('Ver1', read(EXAMPLES.simple_1.img_res_path, draft_module_size=4))
+        finally:
+            Image.open = original_open
+        self.assertEqual(1, len(opened))
+        self.assertEqual('Ver1', read(EXAMPLES.simple_1.get_img_res(), draft_module_size=4))
+
+
+class TestReadAll(TestCase):
+    def test_several_codes(self):
+        image = Image.new('RGB', (600, 400), 'white')
+        image.paste(EXAMPLES.numeric.get_img_res().convert('RGB'), (350, 200))
+        image.paste(EXAMPLES.simple_1.get_img_res(), (10, 10))
+        image.paste(EXAMPLES.alphanum.get_img_res().convert('RGB'), (300, 30))
+        self.assertEqual(['Ver1', 'HELLO WORLD', 1112223330020159990], read_all(image))
+
+    def test_single_code(self):
+        self.assertEqual(['Version 2'], read_all(EXAMPLES.simple_2.img_res_path))
+        self.assertEqual(['pi=3.14159265358979'], read_all(EXAMPLES.noborder_2.img_res_path))
+
+    def test_no_code(self):
+        self.assertRaises(QrReadingException, read_all, Image.new('RGB', (100, 100), 'white'))
+
+    def test_with_weird_values(self):
+        self.assertRaises(TypeError, read_all, None)
+
+
+class TestReadArray(TestCase):
+    def test_array(self):
+        shades = numpy.asarray(EXAMPLES.alphanum.get_img_res().convert('L'))
+        self.assertEqual('HELLO WORLD', read_array(shades))
+        self.assertEqual('HELLO WORLD', read_array(shades.tobytes(), shades.shape))
+        self.assertEqual('HELLO WORLD', read_array(shades < 128, binarizer=None))
+        self.assertEqual('HELLO WORLD', read_array((shades < 128).astype(numpy.uint8) * 255, binarizer=None))
+
+    def test_matrix(self):
+        scanner = ImageScanner(EXAMPLES.alphanum.get_img_res())
+        scanner.read_info()
+        self.assertEqual('HELLO WORLD', read_matrix(scanner.grid))
+        self.assertEqual('HELLO WORLD', read_matrix(scanner.grid.tolist(), parse=False))
+        self.assertEqual('HELLO WORLD', read_matrix(scanner.grid * 255))
+
+
+class TestReadMany(TestCase):
+    def _get_sources(self):
+        return [EXAMPLES.simple_1.img_res_path, EXAMPLES.simple_2.img_res_path,
+                EXAMPLES.simple_1.img_res_path.replace('.', '-'), EXAMPLES.numeric.img_res_path]
+
+    def _assert_results(self, sources, results):
+        self.assertEqual(sources, [source for source, _ in results])
+        results = [result for _, result in results]
+        self.assertEqual(['Ver1', 'Version 2'], results[:2])
+        self.assertIsInstance(results[2], FileNotFoundError if six.PY3 else IOError)
+        self.assertEqual(1112223330020159990, results[3])
+
+    def test_threads(self):
+        sources = self._get_sources()
+        self._assert_results(sources, list(read_many(sources, workers=2, executor='thread')))
+
+    def test_processes(self):
+        sources = self._get_sources()
+        self._assert_results(sources, list(read_many(sources, workers=2)))
+
+    def test_unordered(self):
+        sources = self._get_sources() * 3
+        results = list(read_many(sources, workers=3, executor='thread', ordered=False))
+        self.assertEqual(sorted(sources), sorted(source for source, _ in results))
+        self.assertEqual(3, sum(1 for _, result in results if result == 'Version 2'))
+
+    def test_images(self):
+        images = [EXAMPLES.alphanum.get_img_res(), EXAMPLES.url.get_img_res()]
+        self.assertEqual(['HELLO WORLD', 'http://google.co.tz'], [r for _, r in read_many(images, workers=2)])
+
+    def test_lazy_sources(self):
+        results = read_many((EXAMPLES.simple_1.img_res_path for _ in range(20)), workers=2, executor='thread')
+        self.assertEqual(['Ver1'] * 20, [result for _, result in results])
+
+    def test_no_sources(self):
+        self.assertEqual([], list(read_many([], executor='thread')))
+
+    def test_bad_executor(self):
+        self.assertRaises(ValueError, lambda: list(read_many([], executor='fiber')))
+
+    def test_exceptions_pickling(self):
+        error = pickle.loads(pickle.dumps(IllegalQrMessageModeId(15)))
+        self.assertEqual('Unknown mode ID: 15', error.args[0])
@@ -0,0 +1,67 @@
+import numpy
+from PIL import Image
+
+from qreader.binarization import global_threshold, otsu_binarize, get_otsu_threshold, adaptive_threshold
+from qreader.decoder import QRDecoder
+from qreader.scanner import ImageScanner
+from tests.helpers import TestCase, EXAMPLES
+
+__author__ = 'ewino'
+
+
+class TestGlobalThreshold(TestCase):
+    def test_threshold(self):
+        shades = numpy.array([[0, 127, 128, 255]], dtype=numpy.uint8)
+        self.assertEqual([[1, 1, 0, 0]], global_threshold(shades).tolist())
+        self.assertEqual([[1, 0, 0, 0]], global_threshold(shades, 100).tolist())
+
+
+class TestGetOtsuThreshold(TestCase):
+    def test_two_shades(self):
+        shades = numpy.array([[211, 255], [255, 211]], dtype=numpy.uint8)
+        threshold = get_otsu_threshold(shades)
+        self.assertTrue(211 < threshold <= 255)
+
+    def test_spread_shades(self):
+        shades = numpy.array([[10, 20, 30, 200, 210, 220]], dtype=numpy.uint8)
+        self.assertTrue(30 < get_otsu_threshold(shades) <= 200)
+
+    def test_single_shade(self):
+        self.assertIsInstance(get_otsu_threshold(numpy.full((5, 5), 255, dtype=numpy.uint8)), int)
+
+
+class TestOtsuBinarize(TestCase):
+    def test_too_light(self):
+        shades = numpy.asarray(EXAMPLES.broken_too_light.get_img_res().convert('L'))
+        self.assertEqual(0, global_threshold(shades).sum())
+        self.assertEqual((shades == 211).astype(numpy.uint8).tolist(), otsu_binarize(shades).tolist())
+
+
+class TestAdaptiveThreshold(TestCase):
+    def _get_shades(self, res):
+        return numpy.asarray(res.get_img_res().convert('L'))
+
+    def test_matches_global_on_clean_images(self):
+        shades = self._get_shades(EXAMPLES.simple_1)
+        self.assertEqual(global_threshold(shades).tolist(), adaptive_threshold(shades).tolist())
+
+    def test_too_light(self):
+        shades = self._get_shades(EXAMPLES.broken_too_light)
+        self.assertEqual((shades == 211).astype(numpy.uint8).tolist(), adaptive_threshold(shades).tolist())
+
+    def test_uneven_lighting(self):
+        shades = self._get_shades(EXAMPLES.simple_2).astype(numpy.float64)
+        # darken the image from nothing at the left to 40% at the right, and lift the blacks
+        gradient = numpy.linspace(1, 0.6, shades.shape[1])[None, :]
+        lit = (shades * 0.5 + 60) * gradient
+        lit = lit.astype(numpy.uint8)
+        self.assertNotEqual(global_threshold(shades).tolist(), global_threshold(lit).tolist())
+        scanner = ImageScanner(Image.fromarray(lit), binarizer=adaptive_threshold)
+        self.assertEqual('Version 2', QRDecoder(scanner).get_first())
+
+    def test_uniform(self):
+        self.assertEqual(0, adaptive_threshold(numpy.full((10, 10), 255, dtype=numpy.uint8)).sum())
+
+    def test_window_size(self):
+        shades = self._get_shades(EXAMPLES.simple_1)
+        self.assertEqual(shades.shape, adaptive_threshold(shades, window=3).shape)
@@ -0,0 +1,73 @@
+from qreader.bitstream import BitStream
+from qreader.exceptions import QrCorruptError
+from tests.helpers import TestCase
+
+__author__ = 'ewino'
+
+
+class TestReadInt(TestCase):
+
+    def test_fields(self):
+        stream = BitStream(bytearray([0b10110011, 0b01011100]))
+        self.assertEqual(0b1011, stream.read_int(4))
+        self.assertEqual(0b0011010, stream.read_int(7))
+        self.assertEqual(0b1, stream.read_int(1))
+        self.assertEqual(0b1100, stream.read_int(4))
+        self.assertEqual(0, stream.remaining)
+
+    def test_zero_bits(self):
+        stream = BitStream(b'\xff')
+        self.assertEqual(0, stream.read_int(0))
+        self.assertEqual(8, stream.remaining)
+
+    def test_past_the_end(self):
+        stream = BitStream(b'\xff\x00')
+        stream.read_int(10)
+        self.assertRaisesMsg(QrCorruptError, stream.read_int, 'QR data ended unexpectedly', 7)
+        self.assertEqual(0b000000, stream.read_int(6))
+
+    def test_empty(self):
+        stream = BitStream(b'')
+        self.assertEqual(0, stream.remaining)
+        self.assertRaises(QrCorruptError, stream.read_int, 1)
+
+    def test_reset(self):
+        stream = BitStream(b'\xa5')
+        self.assertEqual(0xa, stream.read_int(4))
+        stream.reset()
+        self.assertEqual(0xa5, stream.read_int(8))
+
+    def test_long_stream(self):
+        # fields crossing the edges of the bytes read at once, and fields longer than them
+        data = bytearray((i * 37 + 11) % 256 for i in range(500))
+        value = int(''.join('{0:08b}'.format(byte) for byte in data), 2)
+        stream = BitStream(data)
+        position = 0
+        for amount in [13, 7, 1, 300, 0, 11] * 10 + [stream.length - 3320]:
+            position += amount
+            self.assertEqual((value >> (stream.length - position)) & ((1 << amount) - 1), stream.read_int(amount))
+        self.assertEqual(0, stream.remaining)
+        stream.reset()
+        self.assertEqual(data[0], stream.read_int(8))
+
+
+class TestReadBytes(TestCase):
+
+    def test_aligned(self):
+        stream = BitStream(b'hello world')
+        self.assertEqual(b'hello', stream.read_bytes(5))
+        self.assertEqual(b' ', stream.read_bytes(1))
+        self.assertEqual(b'world', stream.read_bytes(5))
+        self.assertEqual(b'', stream.read_bytes(0))
+
+    def test_unaligned(self):
+        stream = BitStream(bytearray([0x46, 0x86, 0x97, 0x00]))  # 'hi' shifted by 4 bits
+        self.assertEqual(0x4, stream.read_int(4))
+        self.assertEqual(b'hi', stream.read_bytes(2))
+        self.assertEqual(12, stream.remaining)
+
+    def test_past_the_end(self):
+        self.assertRaises(QrCorruptError, BitStream(b'hi').read_bytes, 3)
+        stream = BitStream(b'hi')
+        stream.read_int(1)
+        self.assertRaises(QrCorruptError, stream.read_bytes, 2)
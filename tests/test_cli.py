@@ -0,0 +1,153 @@
+import json
+import os
+import sys
+
+import six
+
+from qreader import cli
+from tests.helpers import TestCase, EXAMPLES
+
+__author__ = 'ewino'
+
+SCANNER_RESOURCES = os.path.dirname(EXAMPLES.simple_1.img_res_path)
+BROKEN_PATH = os.path.join(SCANNER_RESOURCES, 'Qr-1-broken-too-light.png')
+
+
+class TestReadFile(TestCase):
+    def test_read(self):
+        result = cli.read_file(EXAMPLES.simple_2.img_res_path)
+        self.assertEqual('Version 2', result['payload'])
+        self.assertEqual((2, 'H', 2), (result['version'], result['ec_level'], result['mask']))
+        self.assertGreater(result['seconds'], 0)
+        self.assertEqual(result, json.loads(json.dumps(result)))
+
+    def test_numeric(self):
+        self.assertEqual(1112223330020159990, cli.read_file(EXAMPLES.numeric.img_res_path)['payload'])
+
+    def test_unparsed(self):
+        self.assertTrue(cli.read_file(EXAMPLES.vcard.img_res_path)['payload'].startswith('BEGIN:VCARD'))
+
+    def test_binarizers(self):
+        for binarizer in cli.BINARIZERS:
+            result = cli.read_file(EXAMPLES.simple_1.img_res_path, binarizer=binarizer)
+            self.assertEqual('Ver1', result.get('payload'), binarizer)
+
+    def test_failure(self):
+        result = cli.read_file(BROKEN_PATH)
+        self.assertEqual('QrImageRecognitionException', result['error'])
+        self.assertEqual('locate', result['failed_stage'])
+        self.assertNotIn('payload', result)
+
+    def test_missing_file(self):
+        result = cli.read_file(BROKEN_PATH + '-missing')
+        self.assertEqual('FileNotFoundError' if six.PY3 else 'IOError', result['error'])
+        self.assertEqual('load', result['failed_stage'])
+
+
+class TestIterPaths(TestCase):
+    def test_directory(self):
+        paths = list(cli.iter_paths([SCANNER_RESOURCES]))
+        self.assertIn(EXAMPLES.simple_1.img_res_path, paths)
+        self.assertEqual(sorted(paths), paths)
+        # only images are read
+        self.assertEqual([], list(cli.iter_paths([os.path.dirname(EXAMPLES.simple_2.txt_res_path)])))
+
+    def test_recursive(self):
+        resources = os.path.dirname(SCANNER_RESOURCES)
+        self.assertEqual([], list(cli.iter_paths([resources])))
+        self.assertEqual(list(cli.iter_paths([SCANNER_RESOURCES])), list(cli.iter_paths([resources], recursive=True)))
+
+    def test_glob(self):
+        paths = list(cli.iter_paths([os.path.join(SCANNER_RESOURCES, 'Qr-1-*.png')]))
+        self.assertIn(EXAMPLES.noborder_1.img_res_path, paths)
+        self.assertNotIn(EXAMPLES.simple_1.img_res_path, paths)
+
+    def test_files(self):
+        # missing files are kept, so they're reported
+        paths = [EXAMPLES.simple_2.img_res_path, 'missing.png']
+        self.assertEqual(paths, list(cli.iter_paths(paths)))
+
+
+class TestMain(TestCase):
+    def _run(self, args, stdin=''):
+        """
+        :return: The exit code, the results written to stdout and the text written to stderr
+        :rtype: (int, list[dict], str)
+        """
+        streams = sys.stdin, sys.stdout, sys.stderr
+        sys.stdin, sys.stdout, sys.stderr = six.StringIO(stdin), six.StringIO(), six.StringIO()
+        try:
+            exit_code = cli.main(['--executor', 'thread', '--workers', '2'] + args)
+            output, errors = sys.stdout.getvalue(), sys.stderr.getvalue()
+        finally:
+            sys.stdin, sys.stdout, sys.stderr = streams
+        return exit_code, [json.loads(line) for line in output.splitlines()], errors
+
+    def test_read(self):
+        paths = [EXAMPLES.simple_1.img_res_path, EXAMPLES.simple_2.img_res_path, EXAMPLES.numeric.img_res_path]
+        exit_code, results, errors = self._run(paths)
+        self.assertEqual(0, exit_code)
+        self.assertEqual(dict(zip(paths, ['Ver1', 'Version 2', 1112223330020159990])),
+                         {result['path']: result['payload'] for result in results})
+        self.assertEqual('', errors)
+
+    def test_continue(self):
+        paths = [BROKEN_PATH] + [EXAMPLES.simple_1.img_res_path] * 5
+        for args in ([], ['--continue']):
+            exit_code, results, _ = self._run(args + paths)
+            self.assertEqual(1, exit_code)
+            self.assertEqual(6, len(results))
+            self.assertEqual(1, len([result for result in results if 'error' in result]))
+
+    def test_fail_fast(self):
+        exit_code, results, _ = self._run(['--fail-fast', BROKEN_PATH] + [EXAMPLES.simple_1.img_res_path] * 20)
+        self.assertEqual(1, exit_code)
+        self.assertIn('error', results[-1])
+        self.assertLess(len(results), 21)
+
+    def test_stdin(self):
+        paths = [EXAMPLES.simple_1.img_res_path, EXAMPLES.simple_2.img_res_path]
+        exit_code, results, _ = self._run([], '\n'.join(paths) + '\n\n')
+        self.assertEqual(0, exit_code)
+        self.assertEqual(sorted(paths), sorted(result['path'] for result in results))
+        _, results, _ = self._run([EXAMPLES.numeric.img_res_path, '-'], paths[0])
+        self.assertEqual(2, len(results))
+
+    def test_binarizer(self):
+        for binarizer in cli.BINARIZERS:
+            exit_code, results, _ = self._run(['--binarizer', binarizer, EXAMPLES.simple_1.img_res_path])
+            self.assertEqual(0, exit_code, binarizer)
+            self.assertEqual('Ver1', results[0]['payload'])
+
+    def test_streams_stdin(self):
+        class Paths(object):
+            """ stdin, recording how many results were written before each of its lines was read """
+            def __init__(self, paths):
+                self.paths = paths
+                self.results_written = []
+
+            def __iter__(self):
+                for path in self.paths:
+                    self.results_written.append(len(sys.stdout.getvalue().splitlines()))
+                    yield path + '\n'
+
+        paths = Paths([EXAMPLES.simple_1.img_res_path] * 20)
+        streams = sys.stdin, sys.stdout
+        sys.stdin, sys.stdout = paths, six.StringIO()
+        try:
+            self.assertEqual(0, cli.main(['--executor', 'thread', '--workers', '2', '--no-progress']))
+        finally:
+            sys.stdin, sys.stdout = streams
+        # the reading started long before the last path came in
+        self.assertGreater(paths.results_written[-1], 0)
+
+    def test_progress(self):
+        _, _, errors = self._run(['--progress', EXAMPLES.simple_1.img_res_path, BROKEN_PATH])
+        self.assertIn('\r2/2 images, 1 failed, ', errors)
+        self.assertTrue(errors.endswith(' images/sec\n'))
+        # the total isn't known for paths read from stdin
+        _, _, errors = self._run(['--progress'], EXAMPLES.simple_1.img_res_path)
+        self.assertIn('\r1 images, 0 failed, ', errors)
+        self.assertTrue(errors.endswith(' images/sec\n'))
+        _, _, errors = self._run(['--no-progress', EXAMPLES.simple_1.img_res_path])
+        self.assertEqual('', errors)
@@ -1,10 +1,13 @@
 # encoding=utf-8
+import numpy
 
-from qreader.constants import MODE_ECI, MODE_STRUCTURED_APPEND, ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q, \
-    ERROR_CORRECT_H
+from qreader.bitstream import BitStream
+from qreader.constants import MODE_NUMBER, MODE_ALPHA_NUM, MODE_BYTES, MODE_ECI, ERROR_CORRECT_L, ERROR_CORRECT_M, \
+    ERROR_CORRECT_Q, ERROR_CORRECT_H
 from qreader.decoder import QRDecoder
-from qreader.exceptions import IllegalQrMessageModeId
-from qreader.scanner import QRCodeInfo, Scanner
+from qreader.exceptions import IllegalQrMessageModeId, IllegalQrEciDesignator
+from qreader.scanner import QRCodeInfo, Scanner, ImageScanner
+from qreader.structured_append import StructuredAppendPart, join_parts
 from qreader.vcard import vCard
 from tests.helpers import TestCase, EXAMPLES
 
@@ -23,11 +26,43 @@ class TextFileScanner(Scanner):
         self.info.version = self._version
         self.info.error_correction_level = self._ec_level
 
+    def read(self):
+        # the resource files hold the bit streams as the decoder should see them, so there's nothing to correct
+        self._was_read = True
+        self.read_info()
+        self.data = bytes(numpy.packbits(self._read_all_data()))
+        self._stream = BitStream(self.data)
+
     def _read_all_data(self):
         with open(self._data_path, 'r') as f:
             return [int(x) for x in f.read()]
 
 
+class BitsScanner(Scanner):
+    """ Reads the data of a code from a string of bits """
+    def __init__(self, bits, version=1):
+        self._bits = bits.replace(' ', '')
+        self._version = version
+        super(BitsScanner, self).__init__()
+
+    def read_info(self):
+        self._info = QRCodeInfo()
+        self.info.version = self._version
+
+    def read(self):
+        self._was_read = True
+        self.read_info()
+        bits = self._bits + '0' * (-len(self._bits) % 8)
+        self.data = bytes(bytearray(int(bits[i:i + 8], 2) for i in range(0, len(bits), 8)))
+        self._stream = BitStream(self.data)
+
+
+def bytes_message(raw, version=1):
+    """ The bits of a bytes message """
+    length_bits = 8 if version < 10 else 16
+    return '0100 {0:0{1:d}b} {2:s}'.format(len(raw), length_bits, ' '.join('{0:08b}'.format(b) for b in bytearray(raw)))
+
+
 class TestDecoder(TestCase):
     def _get_decoder(self, res):
         """
@@ -57,11 +92,65 @@ class TestDecoder(TestCase):
                              'Unknown mode ID: 15')
 
     def test_eci(self):
-        self.assertRaises(NotImplementedError, lambda: self._get_decoder(EXAMPLES.kanji)._decode_message(MODE_ECI))
-
-    def test_multi(self):
-        self.assertRaises(NotImplementedError,
-                          lambda: self._get_decoder(EXAMPLES.kanji)._decode_message(MODE_STRUCTURED_APPEND))
+        # ECI 7 (ISO-8859-5) and 22 (windows-1251) are Cyrillic, 20 is Shift JIS
+        text = u'Привет'
+        for eci, charset in ((7, 'iso-8859-5'), (22, 'cp1251')):
+            bits = '0111 {0:08b} '.format(eci) + bytes_message(text.encode(charset))
+            self.assertEqual(text, QRDecoder(BitsScanner(bits, version=2)).get_first())
+        bits = '0111 00010100 ' + bytes_message(u'新高'.encode('shift-jis'))
+        self.assertEqual(u'新高', QRDecoder(BitsScanner(bits)).get_first())
+
+    def test_eci_designator_lengths(self):
+        # 26 (UTF-8) can be written in any of the longer forms too
+        for designator in ('00011010', '10000000 00011010', '11000000 00000000 00011010'):
+            decoder = QRDecoder(BitsScanner(designator))
+            self.assertEqual(26, decoder._read_eci_designator())
+        decoder = QRDecoder(BitsScanner('10111111 11111111 11011111 11111111 11111111'))
+        self.assertEqual(16383, decoder._read_eci_designator())
+        self.assertEqual(0x1fffff, decoder._read_eci_designator())
+        self.assertRaisesMsg(IllegalQrEciDesignator, QRDecoder(BitsScanner('0111 11100000')).get_first,
+                             'Illegal ECI designator: 0b11100000')
+
+    def test_unknown_eci(self):
+        # an ECI which isn't a character set leaves the bytes to be guessed
+        bits = '0111 10000011 11100111 ' + bytes_message(u'û'.encode('utf-8'))
+        self.assertEqual(u'û', QRDecoder(BitsScanner(bits)).get_first())
+
+    def test_wrong_eci(self):
+        # the bytes aren't UTF-8 after all
+        bits = '0111 00011010 ' + bytes_message(u'û'.encode('iso-8859-1'))
+        self.assertEqual(u'û', QRDecoder(BitsScanner(bits)).get_first())
+
+    def test_structured_append_eci(self):
+        bits = '0011 0000 0001 00000000 0111 00010110 ' + bytes_message(u'При'.encode('cp1251'))
+        part = QRDecoder(BitsScanner(bits)).get_first()
+        self.assertEqual((u'При'.encode('cp1251'), 'cp1251'), (part.data, part.charset))
+
+    def test_structured_append(self):
+        # part 2 of 3, parity 0x5a, followed by the bytes message 'ab'
+        part = QRDecoder(BitsScanner('0011 0001 0010 01011010 0100 00000010 01100001 01100010 0000')).get_first()
+        self.assertEqual(StructuredAppendPart(1, 3, 0x5a, b'ab', None), part)
+        # numbers keep their leading zeros, as they're only a part of the message
+        part = QRDecoder(BitsScanner('0011 0000 0001 00000000 0001 0000000011 0000000111 0000')).get_first()
+        self.assertEqual(StructuredAppendPart(0, 2, 0, '007', None), part)
+        part = QRDecoder(BitsScanner('0011 0000 0001 00000000 0010 000000010 00111001101 0000')).get_first()
+        self.assertEqual(StructuredAppendPart(0, 2, 0, 'AB', None), part)
+
+    def test_structured_append_mixed(self):
+        # 'AB' and UTF-8 bytes in one part keep the bytes as they are, so the parity holds once the parts are joined
+        for text in (u'café', u'Да'):
+            raw = b'AB' + text.encode('utf-8')
+            parity = 0
+            for byte in bytearray(raw):
+                parity ^= byte
+            bits = '0011 0000 0000 {0:08b} 0010 000000010 00111001101 {1:s} 0000'.format(
+                parity, bytes_message(text.encode('utf-8')))
+            part = QRDecoder(BitsScanner(bits)).get_first()
+            self.assertEqual(('AB', text.encode('utf-8')), part.data)
+            self.assertEqual(u'AB' + text, join_parts([part]))
+
+    def test_nested_structured_append(self):
+        self.assertRaises(IllegalQrMessageModeId, QRDecoder(BitsScanner('0011 0000 0001 00000000 0011')).get_first)
 
     def test_vcard(self):
         card = self._get_decoder(EXAMPLES.vcard).get_first()
@@ -69,6 +158,58 @@ class TestDecoder(TestCase):
         self.assertEqual(('Blabla', 'Bla Bla'), card.name)
         self.assertEqual(('CELL', '123456789'), card.phones[0])
 
+    def test_segments(self):
+        decoder = QRDecoder(ImageScanner(EXAMPLES.mixed.get_img_res()))
+        self.assertEqual([(MODE_ALPHA_NUM, 'HTTP://EXAMPLE.COM/ORDER/ ', 0),
+                          (MODE_NUMBER, '0012345678901234567890', 156),
+                          (MODE_BYTES, ' Thanks!', 244)], list(decoder.iter_segments()))
+        self.assertEqual('HTTP://EXAMPLE.COM/ORDER/ 0012345678901234567890 Thanks!', decoder.get_first())
+        self.assertEqual(['HTTP://EXAMPLE.COM/ORDER/ ', '0012345678901234567890', ' Thanks!'], decoder.get_all())
+
+    def test_segments_are_lazy(self):
+        decoder = QRDecoder(ImageScanner(EXAMPLES.mixed.get_img_res()))
+        mode, value, _ = next(decoder.iter_segments())
+        self.assertEqual((MODE_ALPHA_NUM, 'HTTP://EXAMPLE.COM/ORDER/ '), (mode, value))
+        # only the first segment was read
+        self.assertEqual(156, decoder.stream.position)
+
+    def test_segments_of_scanned_vcard(self):
+        # the vCard in the image is split to alphanumeric and bytes segments
+        decoder = QRDecoder(ImageScanner(EXAMPLES.vcard.get_img_res()))
+        segments = list(decoder.iter_segments())
+        self.assertEqual(12, len(segments))
+        self.assertEqual([(MODE_ALPHA_NUM, 'BEGIN:VCARD', 0), (MODE_BYTES, '\n', 74)], segments[:2])
+        text = ''.join(value for _, value, _ in segments)
+        self.assertTrue(text.startswith('BEGIN:VCARD\nVERSION:3.0\nN:Test2;Test\n'))
+        self.assertTrue(text.endswith('\nEND:VCARD\n'))
+
+    def test_eci_segments(self):
+        # an ECI designator applies to the bytes segments following it, until the next one
+        bits = '0111 00010110 {0:s} 0111 00000111 {1:s} 0000'.format(bytes_message(u'Да'.encode('cp1251')),
+                                                                     bytes_message(u'Нет'.encode('iso-8859-5')))
+        decoder = QRDecoder(BitsScanner(bits, version=2))
+        self.assertEqual([(MODE_ECI, 22, 0), (MODE_BYTES, u'Да', 12), (MODE_ECI, 7, 40), (MODE_BYTES, u'Нет', 52)],
+                         list(decoder.iter_segments()))
+        self.assertEqual(u'ДаНет', decoder.get_first())
+
+    def test_terminator(self):
+        # '1' then the terminator, followed by padding. without the terminator the padding would be read as a mode
+        self.assertEqual(1, QRDecoder(BitsScanner('0001 0000000001 0001 0000 11101100')).get_first())
+        # no room for a full terminator
+        self.assertEqual('A', QRDecoder(BitsScanner('0010 000000001 001010 000')).get_first())
+        self.assertEqual('', QRDecoder(BitsScanner('0000 11101100')).get_first())
+
+    def test_numeric_leading_zeros(self):
+        # a number on its own is returned as a number, but a number in a longer message keeps its zeros
+        self.assertEqual(7, QRDecoder(BitsScanner('0001 0000000011 0000000111 0000')).get_first())
+        bits = '0001 0000000011 0000000111 0010 000000001 001010 0000'
+        self.assertEqual('007A', QRDecoder(BitsScanner(bits)).get_first())
+        self.assertEqual(['007', 'A'], QRDecoder(BitsScanner(bits)).get_all())
+
+    def test_empty_numeric(self):
+        self.assertEqual('', QRDecoder(BitsScanner('0001 0000000000 0000')).get_first())
+        self.assertEqual([''], QRDecoder(BitsScanner('0001 0000000000 0000')).get_all())
+
     def test_iteration(self):
         messages = self._get_decoder(EXAMPLES.alphanum).get_all()
         messages2 = []
@@ -0,0 +1,88 @@
+from PIL import Image
+
+from qreader.detector import find_finder_patterns, group_finder_patterns, get_code_region, FinderPattern, \
+    _cluster_candidates
+from qreader.scanner import ImageScanner
+from tests.helpers import TestCase, EXAMPLES
+
+__author__ = 'ewino'
+
+
+class TestFindFinderPatterns(TestCase):
+
+    def _find(self, image):
+        return sorted(find_finder_patterns(ImageScanner(image).bitmap), key=lambda p: (p.y, p.x))
+
+    def test_simple(self):
+        # a version 1 code with 7 pixel blocks, starting at (36, 36)
+        self.assertEqual([FinderPattern(60.5, 60.5, 7.0), FinderPattern(158.5, 60.5, 7.0),
+                          FinderPattern(60.5, 158.5, 7.0)], self._find(EXAMPLES.simple_1.get_img_res()))
+
+    def test_no_border(self):
+        patterns = self._find(EXAMPLES.noborder_2.get_img_res())
+        for pattern in (FinderPattern(28, 28, 8), FinderPattern(172, 28, 8), FinderPattern(28, 172, 8)):
+            self.assertIn(pattern, patterns)
+
+    def test_dense_code(self):
+        # blocks in large codes often look like position patterns from the rows and columns crossing them
+        patterns = self._find(EXAMPLES.perspective.get_img_res())
+        self.assertEqual(4, len(patterns))  # the bottom-right alignment pattern looks just like a small one
+        self.assertEqual(1, len(group_finder_patterns(patterns)))
+
+    def test_nothing_to_find(self):
+        self.assertEqual([], self._find(Image.new('L', (50, 50), 255)))
+        self.assertEqual([], self._find(Image.new('L', (50, 50), 0)))
+
+
+class TestClusterCandidates(TestCase):
+
+    def test_across_cells(self):
+        # crossings on both sides of a cell's edge (cells of 3 pixel blocks are 16 pixels wide)
+        crossings = [(15.5, 10.5, 3), (16.5, 11.5, 3), (15.5, 12.5, 3)]
+        self.assertEqual([(15.5 + 1 / 3.0, 11.5, 3)], _cluster_candidates(crossings))
+
+    def test_far_apart(self):
+        crossings = [(10.5, 10.5, 3), (40.5, 10.5, 3), (10.5, 11.5, 3), (10.5, 40.5, 3), (40.5, 11.5, 3)]
+        self.assertEqual([(10.5, 11, 3), (40.5, 11, 3), (10.5, 40.5, 3)], _cluster_candidates(crossings))
+
+    def test_different_sizes(self):
+        # a crossing joins the first cluster it's near to, no matter the size of its blocks
+        crossings = [(10.5, 10.5, 12), (30.5, 10.5, 3), (12.5, 11.5, 3)]
+        self.assertEqual([(11.5, 11, 7.5), (30.5, 10.5, 3)], _cluster_candidates(crossings))
+
+
+class TestGroupFinderPatterns(TestCase):
+
+    def test_upright(self):
+        top_left, top_right, bottom_left = FinderPattern(10, 10, 2), FinderPattern(50, 10, 2), FinderPattern(10, 50, 2)
+        self.assertEqual([(top_left, top_right, bottom_left)],
+                         group_finder_patterns([bottom_left, top_right, top_left]))
+
+    def test_rotated(self):
+        # rotated by 90 degrees clockwise, so the top-left pattern is at the top-right
+        top_left, top_right, bottom_left = FinderPattern(50, 10, 2), FinderPattern(50, 50, 2), FinderPattern(10, 10, 2)
+        self.assertEqual([(top_left, top_right, bottom_left)],
+                         group_finder_patterns([top_right, bottom_left, top_left]))
+
+    def test_not_a_right_angle(self):
+        self.assertEqual([], group_finder_patterns([FinderPattern(10, 10, 2), FinderPattern(50, 10, 2),
+                                                    FinderPattern(30, 50, 2)]))
+
+    def test_different_sizes(self):
+        self.assertEqual([], group_finder_patterns([FinderPattern(10, 10, 2), FinderPattern(50, 10, 2),
+                                                    FinderPattern(10, 50, 4)]))
+
+    def test_too_close(self):
+        self.assertEqual([], group_finder_patterns([FinderPattern(10, 10, 2), FinderPattern(20, 10, 2),
+                                                    FinderPattern(10, 20, 2)]))
+
+    def test_two_codes(self):
+        first = (FinderPattern(10, 10, 2), FinderPattern(50, 10, 2), FinderPattern(10, 50, 2))
+        second = (FinderPattern(110, 10, 3), FinderPattern(170, 10, 3), FinderPattern(110, 70, 3))
+        triples = group_finder_patterns(list(second + first))
+        self.assertEqual({first, second}, set(triples))
+
+    def test_code_region(self):
+        triple = (FinderPattern(10, 10, 2), FinderPattern(50, 10, 2), FinderPattern(10, 50, 2))
+        self.assertEqual((1, 1, 59, 59), get_code_region(triple))
+        self.assertEqual((3, 3, 57, 57), get_code_region(triple, margin=0))
@@ -0,0 +1,88 @@
+import numpy
+
+from qreader.detector import FinderPattern
+from qreader.geometry import get_transform, project, get_block_vectors, estimate_size, find_alignment_pattern, \
+    fit_grid
+from qreader.scanner import ImageScanner
+from tests.helpers import TestCase, EXAMPLES
+
+__author__ = 'ewino'
+
+
+class GeometryTestCase(TestCase):
+    def assertPointsAlmostEqual(self, expected, actual, delta=1e-6):
+        self.assertTrue(numpy.allclose(numpy.array(expected, dtype=numpy.float64), actual, rtol=0, atol=delta), actual)
+
+
+class TestTransform(GeometryTestCase):
+    def test_affine(self):
+        # 2.5 pixels per block, starting at (10, 20)
+        transform = get_transform([(3.5, 3.5), (17.5, 3.5), (3.5, 17.5)], [(18.75, 28.75), (53.75, 28.75),
+                                                                           (18.75, 63.75)])
+        self.assertPointsAlmostEqual([[10, 60.5], [20, 20]], project(transform, [0, 20.2], [0, 0]))
+        right, down = get_block_vectors(transform, 5, 5)
+        self.assertPointsAlmostEqual([2.5, 0], right)
+        self.assertPointsAlmostEqual([0, 2.5], down)
+
+    def test_rotated(self):
+        # the x axis points down, and the y axis points left
+        transform = get_transform([(0, 0), (10, 0), (0, 10)], [(100, 0), (100, 10), (90, 0)])
+        self.assertPointsAlmostEqual([[95], [5]], project(transform, [5], [5]))
+
+    def test_perspective(self):
+        blocks = [(0, 0), (10, 0), (0, 10), (10, 10)]
+        pixels = [(10, 10), (90, 12), (0, 100), (100, 100)]
+        transform = get_transform(blocks, pixels)
+        xs, ys = zip(*blocks)
+        self.assertPointsAlmostEqual(list(zip(*pixels)), project(transform, xs, ys))
+        # lines stay straight
+        mid_xs, mid_ys = project(transform, [5, 5, 5], [0, 5, 10])
+        self.assertAlmostEqual(0, (mid_xs[1] - mid_xs[0]) * (mid_ys[2] - mid_ys[0]) -
+                               (mid_ys[1] - mid_ys[0]) * (mid_xs[2] - mid_xs[0]))
+
+    def test_least_squares(self):
+        blocks = [(0, 0), (10, 0), (0, 10), (10, 10), (5, 5)]
+        pixels = [(0, 0), (20, 0), (0, 20), (20, 20), (10.2, 9.8)]
+        transform = get_transform(blocks, pixels)
+        self.assertPointsAlmostEqual([[10], [10]], numpy.round(project(transform, [5], [5]), 0))
+
+
+class TestFitGrid(GeometryTestCase):
+    def _get_bitmap(self, res):
+        return ImageScanner(res.get_img_res()).bitmap
+
+    def test_estimate_size(self):
+        bitmap = self._get_bitmap(EXAMPLES.simple_1)
+        patterns = FinderPattern(60.5, 60.5, 7.0), FinderPattern(158.5, 60.5, 7.0), FinderPattern(60.5, 158.5, 7.0)
+        self.assertEqual(21, estimate_size(bitmap, patterns))
+
+    def test_estimate_size_by_distance(self):
+        # there's no timing pattern in a blank image, so the size is estimated by the distance between the patterns
+        bitmap = numpy.zeros((300, 300), dtype=numpy.uint8)
+        patterns = FinderPattern(20, 20, 3.0), FinderPattern(200, 20, 3.0), FinderPattern(20, 200, 3.0)
+        self.assertEqual(65, estimate_size(bitmap, patterns))
+
+    def test_find_alignment_pattern(self):
+        # version 8, 10 pixels per block, starting at (40, 40). the bottom-right alignment pattern is at block (42, 42)
+        bitmap = self._get_bitmap(EXAMPLES.vcard)
+        # a bit off, as the transform is when it's only fit to the position patterns
+        transform = get_transform([(3.5, 3.5), (45.5, 3.5), (3.5, 45.5)], [(77, 76), (497, 76), (77, 496)])
+        found = find_alignment_pattern(bitmap, transform, 42.5, 42.5)
+        self.assertPointsAlmostEqual([465, 465], found, delta=1)
+        # nothing like an alignment pattern in the position pattern
+        self.assertIsNone(find_alignment_pattern(bitmap, transform, 3.5, 3.5, radius=1))
+
+    def test_fit_grid(self):
+        bitmap = self._get_bitmap(EXAMPLES.vcard)
+        patterns = FinderPattern(75, 75, 10.0), FinderPattern(495, 75, 10.0), FinderPattern(75, 495, 10.0)
+        size, transform = fit_grid(bitmap, patterns)
+        self.assertEqual(49, size)
+        self.assertPointsAlmostEqual([[40, 530], [40, 530]], project(transform, [0, 49], [0, 49]), delta=1)
+
+    def test_fit_grid_to_size(self):
+        bitmap = self._get_bitmap(EXAMPLES.vcard)
+        patterns = FinderPattern(75, 75, 10.0), FinderPattern(495, 75, 10.0), FinderPattern(75, 495, 10.0)
+        size, transform = fit_grid(bitmap, patterns, 53)
+        self.assertEqual(53, size)
+        # the transform is fit to the position patterns, whatever the size
+        self.assertPointsAlmostEqual([[75, 495], [75, 75]], project(transform, [3.5, 49.5], [3.5, 3.5]), delta=1)
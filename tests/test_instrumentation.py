@@ -0,0 +1,88 @@
+from PIL import Image, ImageDraw, ImageOps
+
+from qreader.api import read, read_all, read_matrix
+from qreader.exceptions import QrImageRecognitionException
+from qreader.instrumentation import ReadStats, NO_STATS, STAGES
+from qreader.scanner import ImageScanner
+from tests.helpers import TestCase, EXAMPLES
+
+__author__ = 'ewino'
+
+
+class TestReadStats(TestCase):
+    def test_stages(self):
+        stats = ReadStats()
+        self.assertEqual('Version 2', read(EXAMPLES.simple_2.img_res_path, stats=stats))
+        self.assertEqual(set(STAGES), set(stats.timings))
+        self.assertTrue(all(seconds >= 0 for seconds in stats.timings.values()))
+        self.assertGreaterEqual(stats.timings['total'], stats.timings['locate'] + stats.timings['decode'])
+        self.assertEqual(1, stats.counters['reads'])
+        self.assertEqual(359, stats.counters['bits_read'])
+        self.assertGreater(stats.counters['pixels_sampled'], 0)
+        self.assertEqual(0, stats.counters['corrected_codewords'])
+        self.assertIsNone(stats.failed_stage)
+
+    def test_adds_up(self):
+        stats = ReadStats()
+        read(EXAMPLES.simple_1.img_res_path, stats=stats)
+        total = stats.timings['total']
+        read(EXAMPLES.simple_1.img_res_path, stats=stats)
+        self.assertEqual(2, stats.counters['reads'])
+        self.assertEqual(208 * 2, stats.counters['bits_read'])
+        self.assertGreater(stats.timings['total'], total)
+
+    def test_corrections(self):
+        image = EXAMPLES.simple_2.get_img_res().convert('L')
+        ImageDraw.Draw(image).rectangle((120, 120, 135, 135), fill=255)
+        stats = ReadStats()
+        self.assertEqual('Version 2', read(image, stats=stats))
+        self.assertGreater(stats.counters['corrected_codewords'], 0)
+
+    def test_retries(self):
+        stats = ReadStats()
+        read(ImageOps.mirror(EXAMPLES.simple_2.get_img_res().convert('L')), stats=stats)
+        self.assertEqual(1, stats.counters['mirror_retries'])
+        # the failed attempt isn't the read's failure
+        self.assertIsNone(stats.failed_stage)
+        self.assertIsNone(stats.error)
+
+        hint = ImageScanner(EXAMPLES.alphanum.get_img_res()).info
+        scanner = ImageScanner(EXAMPLES.simple_2.get_img_res(), hint=hint, stats=stats)
+        scanner.read()
+        self.assertEqual(1, stats.counters['hint_misses'])
+
+    def test_failure(self):
+        stats = ReadStats()
+        self.assertRaises(QrImageRecognitionException, read, Image.new('L', (100, 100), 255), stats=stats)
+        self.assertEqual('locate', stats.failed_stage)
+        self.assertIsInstance(stats.error, QrImageRecognitionException)
+        self.assertNotIn('decode', stats.timings)
+        # a successful read forgets it
+        read(EXAMPLES.simple_1.img_res_path, stats=stats)
+        self.assertIsNone(stats.failed_stage)
+
+    def test_read_all_and_matrix(self):
+        stats = ReadStats()
+        read_all(EXAMPLES.simple_1.img_res_path, stats=stats)
+        self.assertEqual(208, stats.counters['bits_read'])
+        scanner = ImageScanner(EXAMPLES.simple_1.get_img_res())
+        scanner.read()
+        read_matrix(scanner.grid, stats=stats)
+        self.assertEqual(2, stats.counters['reads'])
+        self.assertEqual(208 * 2, stats.counters['bits_read'])
+
+    def test_to_dict(self):
+        stats = ReadStats()
+        self.assertRaises(QrImageRecognitionException, read, Image.new('L', (100, 100), 255), stats=stats)
+        result = stats.to_dict()
+        self.assertEqual({'reads': 1}, result['counters'])
+        self.assertEqual('locate', result['failed_stage'])
+        self.assertEqual('QrImageRecognitionException', result['error'])
+        self.assertEqual(set(stats.timings), set(result['timings']))
+
+    def test_disabled(self):
+        self.assertFalse(NO_STATS.enabled)
+        self.assertIs(NO_STATS.stage('load'), NO_STATS.stage('decode'))
+        NO_STATS.count('reads')
+        scanner = ImageScanner(EXAMPLES.simple_1.get_img_res())
+        self.assertIs(NO_STATS, scanner.stats)
@@ -0,0 +1,144 @@
+# encoding=utf-8
+import sys
+from decimal import Decimal
+
+from qreader import payloads
+from qreader.decoder import QRDecoder
+from qreader.payloads import parse_payload, register_parser, unregister_parser, get_parser
+from qreader.payloads.epc import EpcPayment, parse_epc
+from qreader.payloads.geo import GeoLocation, parse_geo
+from qreader.payloads.mecard import MeCard, parse_mecard, split_escaped, unescape
+from qreader.payloads.sms import SmsMessage, parse_smsto
+from qreader.payloads.wifi import WifiNetwork, parse_wifi
+from qreader.scanner import ImageScanner
+from qreader.vcard import vCard
+from tests.helpers import TestCase, EXAMPLES
+
+__author__ = 'ewino'
+
+
+class TestRegistry(TestCase):
+    def setUp(self):
+        self._parsers = dict(payloads._parsers)
+
+    def tearDown(self):
+        payloads._parsers.clear()
+        payloads._parsers.update(self._parsers)
+
+    def test_builtin_parsers(self):
+        self.assertIsInstance(parse_payload('BEGIN:VCARD\nN:Bla;Bla\nEND:VCARD'), vCard)
+        self.assertIsInstance(parse_payload('MECARD:N:Bla;;'), MeCard)
+        self.assertIsInstance(parse_payload('WIFI:S:bla;;'), WifiNetwork)
+        self.assertIsInstance(parse_payload('geo:1,2'), GeoLocation)
+        self.assertIsInstance(parse_payload('SMSTO:123:bla'), SmsMessage)
+        self.assertIsInstance(parse_payload('BCD\n002\n1\nSCT\n\nBla\nDE02100100109307118603'), EpcPayment)
+
+    def test_text(self):
+        for text in ('', 'bla', 'http://bla.com', 'BEGIN:VCALENDAR\nEND:VCALENDAR', 'WIFI:T:WPA;;', 'geo:bla',
+                     'a' * 100 + ':bla'):
+            self.assertEqual(text, parse_payload(text))
+
+    def test_case_insensitive(self):
+        self.assertEqual(GeoLocation(1, 2, None, None), parse_payload('GEO:1,2'))
+        self.assertIs(get_parser('wifi'), get_parser('WIFI'))
+
+    def test_lazy_import(self):
+        payloads._parsers['SMSTO'] = 'qreader.payloads.sms:parse_smsto'
+        sys.modules.pop('qreader.payloads.sms', None)
+        self.assertNotIn('qreader.payloads.sms', sys.modules)
+        self.assertEqual(SmsMessage('123', 'bla'), parse_payload('SMSTO:123:bla'))
+        self.assertIn('qreader.payloads.sms', sys.modules)
+        # imported once
+        self.assertTrue(callable(payloads._parsers['SMSTO']))
+
+    def test_register(self):
+        register_parser('tel', lambda text: ('phone', text[4:]))
+        self.assertEqual(('phone', '123'), parse_payload('TEL:123'))
+        register_parser('wifi', 'qreader.payloads.sms:parse_smsto')
+        self.assertEqual('WIFI:S:bla;;', parse_payload('WIFI:S:bla;;'))
+
+    def test_unregister(self):
+        unregister_parser('begin')
+        unregister_parser('ewino')
+        self.assertEqual('BEGIN:VCARD\nEND:VCARD', parse_payload('BEGIN:VCARD\nEND:VCARD'))
+
+    def test_no_parsing(self):
+        text = 'BEGIN:VCARD\nVERSION:3.0\nN:Test2;Test\n'
+        decoder = QRDecoder(ImageScanner(EXAMPLES.vcard.get_img_res()), parse=False)
+        self.assertTrue(decoder.get_first().startswith(text))
+
+
+class TestMeCard(TestCase):
+    def test_parse(self):
+        card = parse_mecard('MECARD:N:Doe,John;SOUND:doe,jon;TEL:13035551212;TEL:123;EMAIL:john@example.com;'
+                            'ADR:,,1 Main St,Springfield,,,USA;BDAY:19800203;NOTE:Hi\\; there;X-BLA:bla;;')
+        self.assertEqual(('Doe', 'John'), card.name)
+        self.assertEqual(('doe', 'jon'), card.reading)
+        self.assertEqual(['13035551212', '123'], card.phones)
+        self.assertEqual(['john@example.com'], card.emails)
+        self.assertEqual(('', '', '1 Main St', 'Springfield', '', '', 'USA'), card.address)
+        self.assertEqual('19800203', card.bday)
+        self.assertEqual('Hi; there', card.note)
+        self.assertEqual({'X-BLA': ['bla']}, card.extras)
+
+    def test_escaped_commas(self):
+        self.assertEqual('Doe, John', parse_mecard('MECARD:N:Doe\\, John;;').name)
+        self.assertEqual('http://bla.com', parse_mecard('MECARD:URL:http://bla.com;;').urls[0])
+
+    def test_bad(self):
+        self.assertRaises(ValueError, parse_mecard, 'MECARD:bla;;')
+        self.assertRaises(ValueError, parse_mecard, 'WIFI:S:bla;;')
+
+    def test_split_escaped(self):
+        self.assertEqual(['a', 'b\\;c', 'd\\\\', ''], split_escaped('a;b\\;c;d\\\\;', ';'))
+        self.assertEqual(['a', 'b:c'], split_escaped('a:b:c', ':', 1))
+        self.assertEqual('b;c\\', unescape('b\\;c\\\\'))
+
+
+class TestWifi(TestCase):
+    def test_parse(self):
+        self.assertEqual(WifiNetwork('my;net', 'p:ss', 'WPA', False), parse_wifi('WIFI:T:WPA;S:my\\;net;P:p\\:ss;;'))
+        self.assertEqual(WifiNetwork('bla', None, None, True), parse_wifi('WIFI:S:bla;T:nopass;H:true;;'))
+
+    def test_no_ssid(self):
+        self.assertRaisesMsg(ValueError, parse_wifi, 'WiFi network has no SSID', 'WIFI:T:WEP;P:bla;;')
+
+
+class TestGeo(TestCase):
+    def test_parse(self):
+        self.assertEqual(GeoLocation(37.786971, -122.399677, None, None), parse_geo('geo:37.786971,-122.399677'))
+        self.assertEqual(GeoLocation(1.5, 2, 30, None), parse_geo('geo:1.5,2,30;u=35'))
+        self.assertEqual(GeoLocation(0, 0, None, 'Eiffel Tower'), parse_geo('geo:0,0?q=Eiffel+Tower&z=3'))
+
+    def test_bad(self):
+        for text in ('geo:1', 'geo:1,2,3,4', 'geo:north,south', 'geography:1,2'):
+            self.assertRaises(ValueError, parse_geo, text)
+
+
+class TestSms(TestCase):
+    def test_parse(self):
+        self.assertEqual(SmsMessage('+15551234567', 'See you at 10:30'),
+                         parse_smsto('SMSTO:+15551234567:See you at 10:30'))
+        self.assertEqual(SmsMessage('123', ''), parse_smsto('smsto:123'))
+
+    def test_no_number(self):
+        self.assertRaises(ValueError, parse_smsto, 'SMSTO::bla')
+
+
+class TestEpc(TestCase):
+    def test_parse(self):
+        payment = parse_epc('BCD\n001\n1\nSCT\nBHBLDEHHXXX\nFranz Mustermänn\nDE71 1100 0000 0123 4567 89\n'
+                            'EUR12.3\nGDDS\nRF18539007547034\n\nThanks')
+        self.assertEqual(EpcPayment(1, 'BHBLDEHHXXX', u'Franz Mustermänn', 'DE71110000000123456789', 'EUR',
+                                    Decimal('12.3'), 'GDDS', 'RF18539007547034', None, 'Thanks'), payment)
+
+    def test_short(self):
+        # the last lines may be left out, and the BIC too since version 2
+        payment = parse_epc('BCD\r\n002\r\n1\r\nSCT\r\n\r\nBla\r\nDE02100100109307118603')
+        self.assertEqual(EpcPayment(2, None, 'Bla', 'DE02100100109307118603', None, None, None, None, None, None),
+                         payment)
+
+    def test_bad(self):
+        for text in ('BCD\n003\n1\nSCT\nBIC\nBla\nIBAN', 'BCD\n001\n1\nSCT\n\nBla\nIBAN', 'BCD\n002\n1\nSCT\nBIC\nBla',
+                     'BCD\n002\n1\nINST\nBIC\nBla\nIBAN', 'BCD\n002\n1\nSCT\n\nBla\nIBAN\nEURbla'):
+            self.assertRaises(ValueError, parse_epc, text)
@@ -1,5 +1,13 @@
-from qreader.exceptions import QrImageRecognitionException
-from qreader.scanner import ImageScanner, Scanner
+import numpy
+from PIL import Image, ImageOps
+
+from qreader import geometry
+from qreader.binarization import adaptive_threshold
+from qreader.detector import FinderPattern
+from qreader.exceptions import QrImageRecognitionException, IllegalQrVersionError, QrFormatError, QrCorruptError
+from qreader.scanner import ImageScanner, ArrayScanner, MatrixScanner, Scanner, QrZigZagIterator, \
+    get_data_positions, get_data_mask, get_version_info_positions
+from qreader.spec import get_dead_zones, size_by_version, get_mask_func
 from tests.helpers import TestCase, EXAMPLES
 
 __author__ = 'ewino'
@@ -28,15 +36,21 @@ class TestScanner(TestCase):
         self.assertEqual((14, 14, 235, 235), self._get_res_scanner(EXAMPLES.transparent_border).info.canvas)
 
     def test_broken_canvas_sizes(self):
-        self.assertRaisesMsg(QrImageRecognitionException, self._get_res_scanner(EXAMPLES.broken_pattern_1).read,
-                             'Top-left position pattern not aligned with the top-right one')
-        self.assertRaisesMsg(QrImageRecognitionException, self._get_res_scanner(EXAMPLES.broken_pattern_2).read,
-                             'Top-left position pattern not aligned with the top-right one')
-        self.assertRaisesMsg(QrImageRecognitionException, self._get_res_scanner(EXAMPLES.broken_pattern_3).read,
-                             'Top-left position pattern not aligned with the bottom-left one')
+        # the code's edges are looked for from the image's corners only when its position patterns can't be found
+        self.assertRaisesMsg(QrImageRecognitionException, self._get_res_scanner(EXAMPLES.broken_pattern_1).
+                             get_image_borders, 'Top-left position pattern not aligned with the top-right one')
+        self.assertRaisesMsg(QrImageRecognitionException, self._get_res_scanner(EXAMPLES.broken_pattern_2).
+                             get_image_borders, 'Top-left position pattern not aligned with the top-right one')
+        self.assertRaisesMsg(QrImageRecognitionException, self._get_res_scanner(EXAMPLES.broken_pattern_3).
+                             get_image_borders, 'Top-left position pattern not aligned with the bottom-left one')
         self.assertRaisesMsg(QrImageRecognitionException, self._get_res_scanner(EXAMPLES.broken_too_light).read,
                              "Couldn't find one of the edges (top-left)")
 
+    def test_noise_around_code(self):
+        for res in (EXAMPLES.broken_pattern_1, EXAMPLES.broken_pattern_2, EXAMPLES.broken_pattern_3):
+            self._assert_info(res)
+            self.assertEqual((36, 36, 182, 182), self._get_res_scanner(res).info.canvas)
+
     def test_info(self):
         self._assert_info(EXAMPLES.simple_1)
         self._assert_info(EXAMPLES.simple_2)
@@ -55,12 +69,128 @@ class TestScanner(TestCase):
     def test_gif(self):
         self._assert_info(EXAMPLES.numeric_2)
 
+    def test_fractional_block_size(self):
+        scanner = self._get_res_scanner(EXAMPLES.scaled)
+        self._assert_info(EXAMPLES.scaled)
+        self.assertAlmostEqual(4.345, scanner.info.block_size[0], places=2)
+        self.assertAlmostEqual(4.345, scanner.info.block_size[1], places=2)
+        self.assertEqual(290 * 8, len(list(scanner)))
+
+    def test_perspective(self):
+        self._assert_info(EXAMPLES.perspective)
+        self.assertEqual(861 * 8, len(list(self._get_res_scanner(EXAMPLES.perspective))))
+
+    def test_rotated(self):
+        for res in (EXAMPLES.simple_2, EXAMPLES.vcard, EXAMPLES.scaled):
+            upright = self._get_res_scanner(res)
+            image = res.get_img_res().convert('L')
+            for angle in (0, 90, 180, 270, 30):
+                # PIL rotates counter-clockwise
+                scanner = ImageScanner(image.rotate(angle, expand=True, fillcolor=255, resample=Image.BILINEAR))
+                self.assertEqual(upright.data, scanner.data)
+                self.assertAlmostEqual(0, (scanner.info.rotation + angle + 180) % 360 - 180, delta=1)
+                self.assertFalse(scanner.info.mirrored)
+
+    def test_mirrored(self):
+        for res in (EXAMPLES.simple_2, EXAMPLES.kanji, EXAMPLES.vcard, EXAMPLES.perspective):
+            upright = self._get_res_scanner(res)
+            for image in (ImageOps.mirror(res.get_img_res().convert('L')),
+                          ImageOps.flip(res.get_img_res().convert('L').rotate(90, expand=True))):
+                scanner = ImageScanner(image)
+                self.assertEqual(upright.data, scanner.data)
+                self.assertTrue(scanner.info.mirrored)
+                self.assertEqual(res.mask, scanner.info.mask_id)
+
+    def test_hint(self):
+        hint = self._get_res_scanner(EXAMPLES.alphanum).info
+        scanner = ImageScanner(EXAMPLES.numeric.get_img_res(), hint=hint)
+        self.assertEqual(EXAMPLES.numeric.mask, scanner.info.mask_id)
+        self.assertIs(hint, scanner.hint)
+        # a hint which doesn't fit is dropped, and the code is looked for from scratch
+        scanner = ImageScanner(EXAMPLES.simple_2.get_img_res(), hint=hint)
+        self.assertEqual(EXAMPLES.simple_2.mask, scanner.info.mask_id)
+        self.assertEqual((35, 35, 184, 184), scanner.info.canvas)
+        self.assertIsNone(scanner.hint)
+
     def test_size(self):
-        self.assertEqual(209, len(list(self._get_res_scanner(EXAMPLES.simple_1))))
-        self.assertEqual(209, len(list(self._get_res_scanner(EXAMPLES.noborder_1))))
-        self.assertEqual(360, len(list(self._get_res_scanner(EXAMPLES.simple_2))))
-        self.assertEqual(360, len(list(self._get_res_scanner(EXAMPLES.noborder_2))))
-        # TODO: Add check for version >= 7 (ewino@2015-08-30)
+        # only the data codewords are left after error correction
+        self.assertEqual(9 * 8, len(list(self._get_res_scanner(EXAMPLES.simple_1))))
+        self.assertEqual(9 * 8, len(list(self._get_res_scanner(EXAMPLES.noborder_1))))
+        self.assertEqual(16 * 8, len(list(self._get_res_scanner(EXAMPLES.simple_2))))
+        self.assertEqual(34 * 8, len(list(self._get_res_scanner(EXAMPLES.noborder_2))))
+        self.assertEqual(194 * 8, len(list(self._get_res_scanner(EXAMPLES.vcard))))
+
+    def test_raw_size(self):
+        for res, bits_count in ((EXAMPLES.simple_1, 208), (EXAMPLES.simple_2, 359), (EXAMPLES.vcard, 1936)):
+            scanner = self._get_res_scanner(res)
+            scanner.read_info()
+            self.assertEqual(bits_count, len(scanner._read_all_data()))
+
+    def test_region(self):
+        image = Image.new('RGB', (500, 300), 'white')
+        image.paste(EXAMPLES.simple_2.get_img_res(), (260, 40))
+        image.paste(EXAMPLES.simple_1.get_img_res(), (0, 0))
+        scanner = ImageScanner(image, region=(260, 40, 479, 259))
+        self.assertEqual((295, 75, 444, 224), scanner.info.canvas)
+        self.assertEqual(2, scanner.info.version)
+
+    def test_find_codes(self):
+        image = Image.new('RGB', (500, 300), 'white')
+        image.paste(EXAMPLES.simple_2.get_img_res(), (260, 40))
+        image.paste(EXAMPLES.simple_1.get_img_res(), (0, 0))
+        scanners = ImageScanner(image).find_codes()
+        self.assertEqual([1, 2], [scanner.info.version for scanner in scanners])
+        self.assertEqual([(36, 36, 182, 182), (295, 75, 444, 224)], [scanner.info.canvas for scanner in scanners])
+        self.assertIs(scanners[0].bitmap, scanners[1].bitmap)
+
+    def test_find_no_codes(self):
+        scanner = ImageScanner(Image.new('RGB', (100, 100), 'white'))
+        self.assertEqual([scanner], scanner.find_codes())
+
+    def test_adaptive_binarization(self):
+        scanner = ImageScanner(EXAMPLES.broken_too_light.get_img_res(), binarizer=adaptive_threshold)
+        self.assertEqual((36, 36, 182, 182), scanner.info.canvas)
+        self.assertEqual(EXAMPLES.broken_too_light.mask, scanner.info.mask_id)
+
+    def test_sampling_modes(self):
+        for res in (EXAMPLES.simple_1, EXAMPLES.vcard, EXAMPLES.url):
+            corners = ImageScanner(res.get_img_res(), sampling='corner')
+            centers = ImageScanner(res.get_img_res(), sampling='center')
+            corners.read_info()
+            centers.read_info()
+            self.assertEqual(corners.grid.tolist(), centers.grid.tolist())
+        self.assertRaises(ValueError, ImageScanner, EXAMPLES.simple_1.get_img_res(), sampling='edge')
+
+    def test_center_sampling_ignores_stray_pixels(self):
+        image = EXAMPLES.simple_2.get_img_res().convert('L')
+        # flip the top-left pixel of every block in the rows between the position patterns (blocks are 6 pixels wide)
+        pixels = numpy.array(image)
+        corners = numpy.ix_(numpy.arange(35 + 9 * 6, 185 - 9 * 6, 6), numpy.arange(35, 185, 6))
+        pixels[corners] = 255 - pixels[corners]
+        image = Image.fromarray(pixels)
+        self.assertRaises(QrCorruptError, ImageScanner(image, sampling='corner').read)
+        scanner = ImageScanner(image, sampling='center')
+        self.assertEqual(16 * 8, len(list(scanner)))
+
+    def test_version_info(self):
+        scanner = self._get_res_scanner(EXAMPLES.vcard)
+        patterns = FinderPattern(75, 75, 10.0), FinderPattern(495, 75, 10.0), FinderPattern(75, 495, 10.0)
+        self.assertEqual(8, scanner._read_version_info(49, geometry.fit_position_patterns(patterns, 49)))
+        self.assertEqual(8, scanner._read_version_info(49, geometry.fit_position_patterns(patterns, 49), True))
+        self.assertIsNone(scanner._read_version_info(41, geometry.fit_position_patterns(patterns, 41)))
+        # the version info confirms the right size only
+        for size in (45, 49, 53):
+            self.assertEqual(49, scanner._check_size(size, patterns))
+        self.assertEqual(41, scanner._check_size(41, patterns))
+
+    def test_wrong_size_estimate(self):
+        estimate_size = geometry.estimate_size
+        self.addCleanup(setattr, geometry, 'estimate_size', estimate_size)
+        for wrong_size in (45, 53):
+            geometry.estimate_size = lambda bitmap, patterns: wrong_size
+            scanner = self._get_res_scanner(EXAMPLES.vcard)
+            self.assertEqual(8, scanner.info.version)
+            self.assertEqual(194 * 8, len(list(scanner)))
 
     def test_info_str(self):
         for res in (EXAMPLES.noborder_1, EXAMPLES.simple_2):
@@ -68,6 +198,156 @@ class TestScanner(TestCase):
                              str(self._get_res_scanner(res).info))
 
 
+def _read(scanner):
+    scanner.read()
+    return scanner
+
+
+class TestArrayScanner(TestCase):
+
+    def _get_shades(self, res):
+        return numpy.asarray(res.get_img_res().convert('L'))
+
+    def test_array(self):
+        scanner = _read(ArrayScanner(self._get_shades(EXAMPLES.simple_2)))
+        self.assertEqual(_read(ImageScanner(EXAMPLES.simple_2.get_img_res())).data, scanner.data)
+        self.assertEqual((35, 35, 184, 184), scanner.info.canvas)
+
+    def test_buffers(self):
+        shades = self._get_shades(EXAMPLES.simple_1)
+        expected = _read(ArrayScanner(shades)).data
+        self.assertEqual(expected, _read(ArrayScanner(shades.tobytes(), shades.shape)).data)
+        self.assertEqual(expected, _read(ArrayScanner(bytearray(shades.tobytes()), shades.shape)).data)
+        self.assertEqual(expected, _read(ArrayScanner(memoryview(shades))).data)
+        self.assertEqual(expected, _read(ArrayScanner(memoryview(shades.tobytes()), shades.shape)).data)
+
+    def test_binarized(self):
+        shades = self._get_shades(EXAMPLES.simple_1)
+        bitmap = (shades < 128).astype(numpy.uint8)
+        scanner = _read(ArrayScanner(bitmap, binarizer=None))
+        self.assertEqual(_read(ArrayScanner(shades)).data, scanner.data)
+        # the pixels aren't copied
+        self.assertIs(bitmap, scanner.bitmap)
+        self.assertEqual(scanner.data, _read(ArrayScanner(shades < 128, binarizer=None)).data)
+        # any non-zero pixel is black, in uint8 arrays too
+        self.assertEqual(scanner.data, _read(ArrayScanner(bitmap * 255, binarizer=None)).data)
+
+    def test_channels(self):
+        image = EXAMPLES.transparent_border.get_img_res()
+        expected = _read(ImageScanner(image)).data
+        self.assertEqual(expected, _read(ArrayScanner(numpy.asarray(image.convert('RGBA')))).data)
+        self.assertEqual(expected, _read(ArrayScanner(numpy.asarray(image.convert('LA')))).data)
+        shades = self._get_shades(EXAMPLES.simple_2)
+        self.assertEqual(_read(ArrayScanner(shades)).data, _read(ArrayScanner(numpy.stack([shades] * 3, axis=2))).data)
+
+    def test_region(self):
+        shades = numpy.full((300, 500), 255, dtype=numpy.uint8)
+        simple_2 = self._get_shades(EXAMPLES.simple_2)
+        shades[40:40 + simple_2.shape[0], 260:260 + simple_2.shape[1]] = simple_2
+        scanner = ArrayScanner(shades, region=(260, 40, 600, 600))
+        self.assertEqual((260, 40, 499, 299), scanner.region)
+        self.assertEqual(16 * 8, len(list(scanner)))
+
+    def test_bad_arrays(self):
+        self.assertRaises(ValueError, ArrayScanner, numpy.zeros((2, 2, 2, 2), dtype=numpy.uint8))
+        self.assertRaises(ValueError, ArrayScanner, numpy.zeros((2, 2, 5), dtype=numpy.uint8))
+        self.assertRaises(ValueError, ArrayScanner, b'\x00' * 10, (3, 3))
+        self.assertRaises(TypeError, ArrayScanner, None)
+
+
+class TestMatrixScanner(TestCase):
+
+    def _get_grid(self, res):
+        return _read(ImageScanner(res.get_img_res()))
+
+    def test_matrix(self):
+        for res in (EXAMPLES.simple_1, EXAMPLES.kanji, EXAMPLES.vcard):
+            image_scanner = self._get_grid(res)
+            scanner = _read(MatrixScanner(image_scanner.grid.copy()))
+            self.assertEqual(image_scanner.data, scanner.data)
+            self.assertEqual(res.version, scanner.info.version)
+            self.assertEqual(res.mask, scanner.info.mask_id)
+            self.assertFalse(scanner.info.mirrored)
+
+    def test_mirrored(self):
+        image_scanner = self._get_grid(EXAMPLES.simple_2)
+        scanner = _read(MatrixScanner(image_scanner.grid.T))
+        self.assertEqual(image_scanner.data, scanner.data)
+        self.assertTrue(scanner.info.mirrored)
+
+    def test_matrix_types(self):
+        image_scanner = self._get_grid(EXAMPLES.simple_1)
+        grid = image_scanner.grid.copy()
+        self.assertIs(grid, MatrixScanner(grid).grid)
+        for matrix in (grid.astype(bool), grid.astype(int) * 255, grid * 255, grid.tolist()):
+            self.assertEqual(image_scanner.data, _read(MatrixScanner(matrix)).data)
+
+    def test_version_info_positions(self):
+        xs, ys = get_version_info_positions(45)
+        self.assertEqual([(34, 0), (35, 0), (36, 0), (34, 1)], list(zip(xs[:4], ys[:4])))
+        self.assertEqual([(0, 34), (0, 35), (0, 36), (1, 34)], list(zip(xs[18:22], ys[18:22])))
+        self.assertEqual((36, 5), (xs[17], ys[17]))
+
+    def test_version_info_mismatch(self):
+        grid = self._get_grid(EXAMPLES.vcard).grid.copy()
+        xs, ys = get_version_info_positions(49)
+        # version 9's version info, in both copies
+        grid[ys, xs] = [(0x09A99 >> bit) & 1 for bit in range(18)] * 2
+        self.assertRaisesMsg(QrCorruptError, MatrixScanner(grid).read,
+                             "The code's version info (9) doesn't match its size (49)")
+        # too corrupt to read, so only the size counts
+        grid[ys, xs] = 0
+        self.assertEqual(8, _read(MatrixScanner(grid)).info.version)
+
+    def test_bad_matrices(self):
+        self.assertRaises(ValueError, MatrixScanner, numpy.zeros((21, 25)))
+        self.assertRaises(ValueError, MatrixScanner, numpy.zeros(21))
+        self.assertRaises(IllegalQrVersionError, MatrixScanner(numpy.zeros((23, 23))).read)
+        self.assertRaises(IllegalQrVersionError, MatrixScanner(numpy.zeros((181, 181))).read)
+        self.assertRaises(QrCorruptError, MatrixScanner(numpy.zeros((21, 21))).read)
+
+
+class TestDataPositions(TestCase):
+
+    def test_matches_zigzag_iterator(self):
+        for version in (1, 2, 7, 14, 40):
+            xs, ys = get_data_positions(version)
+            expected = list(QrZigZagIterator(size_by_version(version), get_dead_zones(version)))
+            self.assertEqual(expected, list(zip(xs.tolist(), ys.tolist())))
+
+    def test_cached(self):
+        self.assertIs(get_data_positions(3), get_data_positions(3))
+
+    def test_read_only(self):
+        xs, ys = get_data_positions(1)
+        self.assertRaises(ValueError, xs.__setitem__, 0, 5)
+        self.assertRaises(ValueError, ys.__setitem__, 0, 5)
+
+    def test_illegal_versions(self):
+        self.assertRaises(IllegalQrVersionError, get_data_positions, 0)
+        self.assertRaises(IllegalQrVersionError, get_data_positions, 41)
+
+
+class TestDataMasks(TestCase):
+
+    def test_matches_mask_funcs(self):
+        for version in (1, 7, 40):
+            xs, ys = get_data_positions(version)
+            for mask_id in range(8):
+                mask_func = get_mask_func(mask_id)
+                expected = [1 if mask_func(y, x) else 0 for x, y in zip(xs.tolist(), ys.tolist())]
+                self.assertEqual(expected, get_data_mask(version, mask_id).tolist())
+
+    def test_cached(self):
+        self.assertIs(get_data_mask(2, 5), get_data_mask(2, 5))
+
+    def test_read_only(self):
+        self.assertRaises(ValueError, get_data_mask(1, 0).__setitem__, 0, 1)
+
+    def test_nonexistent_masks(self):
+        self.assertRaises(QrFormatError, get_data_mask, 1, 8)
+
+
 class TestAbstractScanner(TestCase):
     """ Made mostly to appease the coverage runner :P """
     def test_that_its_abstract(self):
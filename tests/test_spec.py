@@ -1,7 +1,9 @@
 from qreader.constants import MODE_SIZE_SMALL, MODE_SIZE_MEDIUM, MODE_SIZE_LARGE, MODE_KANJI, MODE_ALPHA_NUM, \
     MODE_NUMBER, MODE_BYTES
 from qreader.exceptions import IllegalQrVersionError, QrFormatError
-from qreader.spec import get_mask_func, mode_sizes_for_version, bits_for_length, get_dead_zones, DATA_BLOCKS_INFO
+from qreader.spec import get_mask_func, mode_sizes_for_version, bits_for_length, get_dead_zones, DATA_BLOCKS_INFO, \
+    size_by_version, get_alignment_centers, get_eci_codec, VERSION_INFO_CODES, VERSION_INFO_BCH_GENERATOR
+from qreader.validation import hamming_diff
 from tests.helpers import TestCase
 
 __author__ = 'ewino'
@@ -109,13 +111,26 @@ class TestDeadZones(TestCase):
     def test_normal_dead_zones(self):
         self.assertEqual(self.REGULAR_ZONES_COUNT, len(get_dead_zones(1)))
 
+    def test_dark_module(self):
+        for version in (1, 7, 40):
+            size = size_by_version(version)
+            self.assertTrue(any(zone[0] <= 8 <= zone[2] and zone[1] <= size - 8 <= zone[3]
+                                for zone in get_dead_zones(version)))
+
     def test_alignment_patterns_amount(self):
-        amounts = sum(([p**2] * x for p, x in enumerate([1, 5, 7, 7, 7, 7, 6])), [])  # 1*0, 5*1, 7*9, 7*16, 7*25...
+        # all alignment patterns except the three overlapping the position patterns: 1*0, 5*1, 7*6, 7*13, 7*22...
+        amounts = sum(([max(p ** 2 - 3, 0)] * x for p, x in zip([0, 2, 3, 4, 5, 6, 7], [1, 5, 7, 7, 7, 7, 6])), [])
         self.assertEqual(40, len(amounts))
         for version, amount in enumerate(amounts, start=1):
             regular_zones_count = self.REGULAR_ZONES_COUNT + (2 if version >= 7 else 0)
             self.assertEqual(amount, len(get_dead_zones(version)) - regular_zones_count)
 
+    def test_alignment_centers(self):
+        self.assertEqual([], get_alignment_centers(1))
+        self.assertEqual([(18, 18)], get_alignment_centers(2))
+        self.assertEqual(sorted([(6, 22), (22, 6), (22, 22), (22, 38), (38, 22), (38, 38)]),
+                         sorted(get_alignment_centers(7)))
+
     def test_illegal_versions(self):
         self.assertRaises(IllegalQrVersionError, lambda: get_dead_zones(-1))
         self.assertRaises(IllegalQrVersionError, lambda: get_dead_zones(0))
@@ -144,3 +159,33 @@ class TestBlockInfo(TestCase):
                     amount += (level_info[0] + level_info[1] + 1) * level_info[3]
                 data_amounts.add(amount)
             self.assertEqual(1, len(data_amounts))
+
+
+class TestVersionInfo(TestCase):
+    def test_codes(self):
+        self.assertEqual(34, len(VERSION_INFO_CODES))
+        for version, code in enumerate(VERSION_INFO_CODES, 7):
+            self.assertEqual(version, code >> 12)
+            # the error correction bits are the remainder of dividing by the generator polynomial
+            remainder = code
+            for i in range(5, -1, -1):
+                if remainder & (1 << (i + 12)):
+                    remainder ^= VERSION_INFO_BCH_GENERATOR << i
+            self.assertEqual(0, remainder)
+
+    def test_distance(self):
+        for i, code in enumerate(VERSION_INFO_CODES):
+            for other in VERSION_INFO_CODES[i + 1:]:
+                self.assertGreaterEqual(hamming_diff(code, other), 8)
+
+
+class TestEci(TestCase):
+    def test_charsets(self):
+        self.assertEqual('iso8859-5', get_eci_codec(7).name)
+        self.assertEqual('shift_jis', get_eci_codec(20).name)
+        self.assertEqual('utf-8', get_eci_codec(26).name)
+        self.assertIs(get_eci_codec(26), get_eci_codec(26))
+
+    def test_unknown(self):
+        self.assertIsNone(get_eci_codec(14))
+        self.assertIsNone(get_eci_codec(999))
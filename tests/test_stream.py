@@ -0,0 +1,56 @@
+import numpy
+from PIL import Image
+
+from qreader.exceptions import QrReadingException
+from qreader.stream import FrameStreamReader
+from tests.helpers import TestCase, EXAMPLES
+
+__author__ = 'ewino'
+
+
+class TestFrameStreamReader(TestCase):
+    def _moved(self, res, x, y):
+        frame = Image.new('L', (200, 200), 255)
+        frame.paste(res.get_img_res().convert('L'), (x, y))
+        return frame
+
+    def test_same_frames(self):
+        frames = [EXAMPLES.alphanum.get_img_res()] * 3
+        reader = FrameStreamReader(frames)
+        self.assertEqual(['HELLO WORLD'] * 3, [data for _, data in reader])
+        self.assertEqual((1, 0, 2), (reader.frames_detected, reader.frames_hinted, reader.frames_skipped))
+
+    def test_hint(self):
+        # both codes are of the same version and in the same place, so the second is read where the first was
+        frames = [EXAMPLES.alphanum.get_img_res(), EXAMPLES.numeric.get_img_res()]
+        reader = FrameStreamReader(frames)
+        self.assertEqual(['HELLO WORLD', 1112223330020159990], [data for _, data in reader])
+        self.assertEqual((1, 1, 0), (reader.frames_detected, reader.frames_hinted, reader.frames_skipped))
+
+    def test_moved(self):
+        frames = [self._moved(EXAMPLES.numeric, 0, 0), self._moved(EXAMPLES.numeric, 1, 1),
+                  self._moved(EXAMPLES.numeric, 40, 30)]
+        reader = FrameStreamReader(frames)
+        self.assertEqual([1112223330020159990] * 3, [data for _, data in reader])
+        # a pixel doesn't matter, but the code can't be read where it was after moving a few blocks away
+        self.assertEqual((2, 0, 1), (reader.frames_detected, reader.frames_hinted, reader.frames_skipped))
+
+    def test_lost_code(self):
+        frames = [EXAMPLES.alphanum.get_img_res(), Image.new('L', (148, 148), 255), EXAMPLES.alphanum.get_img_res()]
+        results = [data for _, data in FrameStreamReader(frames)]
+        self.assertEqual('HELLO WORLD', results[0])
+        self.assertIsInstance(results[1], QrReadingException)
+        self.assertEqual('HELLO WORLD', results[2])
+
+    def test_arrays(self):
+        frame = numpy.asarray(EXAMPLES.simple_2.get_img_res().convert('L'))
+        reader = FrameStreamReader(iter([frame, frame.copy(), numpy.stack([frame] * 3, axis=2)]))
+        self.assertEqual(['Version 2'] * 3, [data for _, data in reader])
+        self.assertEqual(2, reader.frames_skipped)
+
+    def test_frames_returned(self):
+        frames = [EXAMPLES.simple_1.get_img_res()]
+        self.assertIs(frames[0], next(iter(FrameStreamReader(frames)))[0])
+
+    def test_bad_frames(self):
+        self.assertRaises(TypeError, FrameStreamReader([None]).read_frame, None)
@@ -0,0 +1,117 @@
+# encoding=utf-8
+from functools import reduce
+
+from qreader.exceptions import QrCorruptError
+from qreader.structured_append import StructuredAppendPart, StructuredAppendBuffer, join_parts
+from qreader.vcard import vCard
+from tests.helpers import TestCase
+
+__author__ = 'ewino'
+
+
+def split(data, charset=None):
+    """ Makes the structured append parts of a message split to the given chunks """
+    chunks = [chunk for part_data in data for chunk in (part_data if isinstance(part_data, tuple) else (part_data,))]
+    raw = b''.join(chunk if isinstance(chunk, bytes) else chunk.encode('shift-jis') for chunk in chunks)
+    parity = reduce(lambda p, byte: p ^ byte, bytearray(raw), 0)
+    return [StructuredAppendPart(i, len(data), parity, chunk, charset) for i, chunk in enumerate(data)]
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestJoinParts(TestCase):
+    def test_join(self):
+        self.assertEqual('HELLO WORLD 0042', join_parts(split(['HELLO', b' WORLD ', '0042'])))
+
+    def test_any_order(self):
+        self.assertEqual('HELLO WORLD', join_parts(reversed(split(['HELLO', b' WORLD']))))
+
+    def test_split_characters(self):
+        # the UTF-8 bytes of a character split between two parts
+        raw = u'ûü'.encode('utf-8')
+        self.assertEqual(u'ûü', join_parts(split([raw[:1], raw[1:3], raw[3:]])))
+
+    def test_mixed_parts(self):
+        # bytes mixed with other modes in a part are kept as bytes, so they're never encoded as Shift-JIS
+        self.assertEqual(u'ABcafé!', join_parts(split([('AB', u'café'.encode('utf-8')), '!'])))
+        self.assertEqual(u'ABДа', join_parts(split([('AB', u'Да'.encode('utf-8'))])))
+        # and a character's bytes may still be split between a mixed part and the next one
+        raw = u'Да'.encode('utf-8')
+        self.assertEqual(u'ABДа', join_parts(split([('AB', raw[:3]), raw[3:]])))
+
+    def test_charset(self):
+        raw = u'Привет'.encode('cp1251')
+        self.assertEqual(u'Привет', join_parts(split([raw[:2], raw[2:]], charset='cp1251')))
+
+    def test_vcard(self):
+        card = join_parts(split([b'BEGIN:VCARD\nN:Bla;Bla\n', b'END:VCARD']))
+        self.assertIsInstance(card, vCard)
+
+    def test_missing_parts(self):
+        parts = split(['HELLO', ' WORLD', '!'])
+        self.assertRaisesMsg(QrCorruptError, lambda: join_parts(parts[:2]), 'Structured append parts are missing')
+        self.assertRaises(QrCorruptError, join_parts, [])
+
+    def test_wrong_parity(self):
+        parts = split(['HELLO', ' WORLD'])
+        parts[1] = parts[1]._replace(data=' WORLE')
+        self.assertRaisesMsg(QrCorruptError, lambda: join_parts(parts),
+                             "Structured append parts don't match their parity")
+
+
+class TestStructuredAppendBuffer(TestCase):
+    def test_complete(self):
+        buf = StructuredAppendBuffer()
+        first, second, third = split(['A', 'B', 'C'])
+        self.assertIsNone(buf.add(third))
+        self.assertIsNone(buf.add(first))
+        # parts read again (e.g. in the next frames) don't count twice
+        self.assertIsNone(buf.add(first))
+        self.assertEqual(1, len(buf))
+        self.assertEqual('ABC', buf.add(second))
+        self.assertEqual(0, len(buf))
+
+    def test_interleaved_messages(self):
+        buf = StructuredAppendBuffer()
+        hello, world = split(['HELLO', ' WORLD']), split(['GOOD', 'BYE'])
+        self.assertIsNone(buf.add(hello[0]))
+        self.assertIsNone(buf.add(world[1]))
+        self.assertEqual(2, len(buf))
+        self.assertEqual('GOODBYE', buf.add(world[0]))
+        self.assertEqual('HELLO WORLD', buf.add(hello[1]))
+
+    def test_evict_old(self):
+        clock = Clock()
+        buf = StructuredAppendBuffer(max_age=10, clock=clock)
+        first, second = split(['A', 'B'])
+        buf.add(first)
+        clock.now += 11
+        self.assertEqual(0, len(buf))
+        self.assertIsNone(buf.add(second))
+        clock.now += 5
+        self.assertEqual('AB', buf.add(first))
+
+    def test_evict_when_full(self):
+        buf = StructuredAppendBuffer(max_messages=2)
+        messages = [split(['A', 'B']), split(['C', 'E']), split(['AA', 'BBB'])]
+        for parts in messages:
+            buf.add(parts[0])
+        self.assertEqual(2, len(buf))
+        # the oldest message was dropped
+        self.assertIsNone(buf.add(messages[0][1]))
+        self.assertEqual('AABBB', buf.add(messages[2][1]))
+
+    def test_illegal_index(self):
+        self.assertRaises(QrCorruptError, StructuredAppendBuffer().add, StructuredAppendPart(3, 2, 0, 'A', None))
+
+    def test_clear(self):
+        buf = StructuredAppendBuffer()
+        buf.add(split(['A', 'B'])[0])
+        buf.clear()
+        self.assertEqual(0, len(buf))
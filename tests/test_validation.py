@@ -1,6 +1,9 @@
+from qreader.constants import ERROR_CORRECT_Q
 from qreader.exceptions import QrCorruptError
-from qreader.validation import validate_format_info, format_info_check
-from tests.helpers import TestCase
+from qreader.scanner import ImageScanner
+from qreader.validation import validate_format_info, format_info_check, validate_data, get_codec, get_blocks_layout, \
+    validate_version_info, get_format_info_tables, hamming_diff, FORMAT_INFO_CODES
+from tests.helpers import TestCase, EXAMPLES
 
 __author__ = 'ewino'
 
@@ -115,3 +118,110 @@ class TestFormatInfoErrorCorrection(TestCase):
         for sample in samples:
             self.assertEqual(sample >> 10, validate_format_info(sample, sample))
             self.assertEqual(sample >> 10, validate_format_info(sample ^ 0b111100000000000, sample ^ 0b000100000011101))
+
+    def test_matches_exhaustive_search(self):
+        def search(first, second):
+            distances = [hamming_diff(first, code) + hamming_diff(second, code) for code in FORMAT_INFO_CODES]
+            best = min(distances)
+            return distances.index(best) if distances.count(best) == 1 else None
+
+        for sample in range(0, 1 << 15, 7):
+            for second in (sample, sample ^ 0b100000100000001, 0b101010000010010):
+                expected = search(sample, second)
+                if expected is None:
+                    self.assertRaises(QrCorruptError, validate_format_info, sample, second)
+                else:
+                    self.assertEqual(expected, validate_format_info(sample, second))
+
+    def test_tables(self):
+        bit_counts, corrections = get_format_info_tables()
+        self.assertIs(bit_counts, get_format_info_tables()[0])
+        self.assertEqual((1 << 15,), corrections.shape)
+        self.assertEqual([0, 1, 1, 2, 15], [bit_counts[word] for word in (0, 1, 4, 5, (1 << 15) - 1)])
+        for info_format, code in enumerate(FORMAT_INFO_CODES):
+            self.assertEqual(info_format, corrections[code])
+        self.assertFalse(corrections.flags.writeable)
+        self.assertFalse(bit_counts.flags.writeable)
+
+
+class TestVersionInfoErrorCorrection(TestCase):
+    def test_valid_version_info(self):
+        self.assertEqual(7, validate_version_info(0x07C94))
+        self.assertEqual(8, validate_version_info(0x085BC, 0x085BC))
+        self.assertEqual(40, validate_version_info(0x28C69))
+
+    def test_erroneous_version_info(self):
+        self.assertEqual(7, validate_version_info(0x07C94 ^ 0b100000000001000001))
+        self.assertEqual(21, validate_version_info(0x15683 ^ 0b111))
+
+    def test_one_copy_too_corrupt(self):
+        self.assertEqual(8, validate_version_info(0x085BC ^ 0b1111, 0x085BC ^ 0b1))
+        self.assertEqual(8, validate_version_info(0x085BC ^ 0b1, 0x085BC ^ 0b1111))
+        # the copy needing less correction wins
+        self.assertEqual(9, validate_version_info(0x085BC ^ 0b111, 0x09A99))
+
+    def test_too_corrupt(self):
+        self.assertRaisesMsg(QrCorruptError, validate_version_info, 'QR version info is too corrupt to read',
+                             0x085BC ^ 0b1111, 0x085BC ^ 0b111100000)
+        self.assertRaises(QrCorruptError, validate_version_info, 0)
+
+
+class TestDataErrorCorrection(TestCase):
+    def _get_raw_data(self, res):
+        """
+        :type res: tests.helpers.Example
+        :rtype: list[int]
+        """
+        scanner = ImageScanner(res.get_img_res())
+        scanner.read_info()
+        return scanner._read_all_data()
+
+    @staticmethod
+    def _flip_codewords(data, indexes):
+        data = list(data)
+        for index in indexes:
+            for bit in range(index * 8, index * 8 + 8):
+                data[bit] ^= 1
+        return data
+
+    def test_valid_data(self):
+        data = validate_data(self._get_raw_data(EXAMPLES.simple_1), 1, EXAMPLES.simple_1.ec_mode)
+        self.assertEqual(9, len(data))
+        self.assertEqual(bytearray([0x40, 0x45, 0x66, 0x57, 0x23, 0x10, 0xec, 0x11, 0xec]), data)
+
+    def test_blocks_layout(self):
+        # version 5-Q has 2 blocks of 15 data codewords and 2 of 16, each with 18 error correction codewords
+        layout = get_blocks_layout(5, ERROR_CORRECT_Q)
+        self.assertEqual([15, 15, 16, 16], [data_size for _, data_size in layout])
+        self.assertEqual([0, 4, 8], layout[0][0][:3].tolist())
+        self.assertEqual([3, 7], layout[3][0][:2].tolist())
+        self.assertEqual([58, 60], layout[2][0][14:16].tolist())
+        self.assertEqual(list(range(62, 62 + 4 * 18)), sorted(sum((block[-18:].tolist() for block, _ in layout), [])))
+
+    def test_correctable_data(self):
+        raw = self._get_raw_data(EXAMPLES.simple_1)
+        expected = validate_data(raw, 1, EXAMPLES.simple_1.ec_mode)
+        # version 1-H has 17 error correction codewords, so it can fix up to 8 errors
+        broken = self._flip_codewords(raw, [0, 3, 5, 8, 12, 17, 21, 25])
+        self.assertEqual(expected, validate_data(broken, 1, EXAMPLES.simple_1.ec_mode))
+
+    def test_correctable_multi_block_data(self):
+        raw = self._get_raw_data(EXAMPLES.transparent_border)
+        expected = validate_data(raw, 5, EXAMPLES.transparent_border.ec_mode)
+        self.assertEqual(46, len(expected))
+        # 4 blocks of 22 error correction codewords each: 11 errors can be fixed in each
+        broken = self._flip_codewords(raw, range(0, 4 * 11))
+        self.assertEqual(expected, validate_data(broken, 5, EXAMPLES.transparent_border.ec_mode))
+
+    def test_too_corrupt_data(self):
+        broken = self._flip_codewords(self._get_raw_data(EXAMPLES.simple_1), range(10))
+        self.assertRaisesMsg(QrCorruptError, validate_data, 'QR data is too corrupt to correct',
+                             broken, 1, EXAMPLES.simple_1.ec_mode)
+
+    def test_too_short_data(self):
+        self.assertRaisesMsg(QrCorruptError, validate_data, 'QR data is too short (100 bits instead of 208)',
+                             [0] * 100, 1, EXAMPLES.simple_1.ec_mode)
+
+    def test_codecs_reused(self):
+        self.assertIs(get_codec(17), get_codec(17))
+        self.assertIsNot(get_codec(17), get_codec(10))
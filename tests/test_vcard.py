@@ -1,9 +1,12 @@
+import pickle
 from datetime import datetime
 
 from dateutil.tz import tzutc
 
+from qreader.decoder import QRDecoder
+from qreader.scanner import ImageScanner
 from qreader.vcard import vCard
-from tests.helpers import TestCase
+from tests.helpers import TestCase, EXAMPLES
 
 # The things we do to increase test coverage...
 # and it's a temporary module too!
@@ -20,17 +23,42 @@ class TestVCardFromText(TestCase):
         self.assertRaises(ValueError, lambda: vCard.from_text('Welcome to Jamaica, Have a good day'))
 
     def test_weird_field(self):
-        field_name, field_val = 'EWINO', 'BLA'
-        self.assertRaisesMsg(TypeError, vCard.from_text,
-                             ('Unknown vCard field: {0}. '
-                              'This implementation only supports basic properties').format(field_name),
-                             'BEGIN:VCARD\n{0}:{1}\nEND:VCARD'.format(field_name, field_val))
-        vCard.from_text('BEGIN:VCARD\nVERSION:4\nEND:VCARD')
+        card = vCard.from_text('BEGIN:VCARD\nEWINO:BLA\nX-SOCIAL;TYPE=twitter:ewino\nEWINO:BLA;BLA\nEND:VCARD')
+        self.assertEqual({'EWINO': ['BLA', ('BLA', 'BLA')], 'X-SOCIAL': [('twitter', 'ewino')]}, card.extras)
+        self.assertEqual({}, vCard.from_text('BEGIN:VCARD\nVERSION:4\nEND:VCARD').extras)
+
+    def test_bad_line(self):
+        self.assertRaisesMsg(ValueError, vCard.from_text, 'Not a valid vCard line: EWINO',
+                             'BEGIN:VCARD\nEWINO\nEND:VCARD')
 
     def test_date_fields(self):
         self.assertEqual(datetime(2015, 8, 28, tzinfo=tzutc()),
                          vCard.from_text('BEGIN:VCARD\nANNIVERSARY:20150828T000000Z\nEND:VCARD').anniversary)
 
+    def test_lazy_dates(self):
+        card = vCard.from_text('BEGIN:VCARD\nBDAY:not a date\nREV:20150828T000000Z\nEND:VCARD')
+        self.assertIsNone(card.anniversary)
+        # dates are only parsed when they're read
+        self.assertRaises(ValueError, lambda: card.bday)
+        self.assertEqual(datetime(2015, 8, 28, tzinfo=tzutc()), card.rev)
+        self.assertIs(card.rev, card.rev)
+        card.bday = '2000-01-02'
+        self.assertEqual(datetime(2000, 1, 2), card.bday)
+        card.bday = datetime(2000, 1, 3)
+        self.assertEqual(datetime(2000, 1, 3), card.bday)
+
+    def test_pickling(self):
+        card = vCard.from_text('BEGIN:VCARD\nN:Bla;Bla\nBDAY:2000-01-02\nREV:2000-01-03\nEWINO:BLA\nEND:VCARD')
+        self.assertEqual(datetime(2000, 1, 3), card.rev)
+        card = pickle.loads(pickle.dumps(card, 2))
+        self.assertEqual(('Bla', 'Bla'), card.name)
+        self.assertEqual(datetime(2000, 1, 2), card.bday)
+        self.assertEqual(datetime(2000, 1, 3), card.rev)
+        self.assertEqual({'EWINO': ['BLA']}, card.extras)
+
+    def test_slots(self):
+        self.assertRaises(AttributeError, setattr, vCard(), 'ewino', 'bla')
+
     def test_complex_fields(self):
         card = vCard.from_text('BEGIN:VCARD\n'
                                'TEL;TYPE=WORK,VOICE:(111) 555-1212\n'
@@ -44,3 +72,14 @@ class TestVCardFromText(TestCase):
                          card.addresses[0])
         self.assertEqual(2, len(card.categories))
         self.assertEqual(['swimmer', 'biker'], card.categories)
+
+
+class TestScannedVCard(TestCase):
+    def test_scanned(self):
+        card = QRDecoder(ImageScanner(EXAMPLES.vcard.get_img_res())).get_first()
+        self.assertEqual(('Test2', 'Test'), card.name)
+        self.assertEqual('Blabber', card.title)
+        self.assertEqual(['ww'], card.urls)
+        self.assertEqual([('WORK', 'VOICE', 'ph'), ('CELL', 'mb'), ('FAX', 'fx')], card.phones)
+        # the birthday is just "bd", which isn't a date
+        self.assertRaises(ValueError, lambda: card.bday)